@@ -1,8 +1,28 @@
 # /adapt_mas_project/adapt_mas/agent.py
 
+import json
+import logging
+import re
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List
 
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def _defined_with_review(cls: type, name: str) -> bool:
+    """方法 name 是否与 review 定义在同一个类中 (子类只重写了 review 时，继承来的批量实现不再与之一致)"""
+    def owner(attribute):
+        return next(klass for klass in cls.__mro__ if attribute in vars(klass))
+    return owner(name) is owner("review")
+
+
+def _item_contribution(item: Dict[str, Any]) -> Dict[str, Any]:
+    """批量评审条目对应的单条贡献 (以第一个作者为作者)"""
+    return {'agent_id': item['agent_ids'][0], 'content': item['content'], 'round': item.get('round')}
+
 
 class BaseAgent(ABC):
     """智能体基类"""
@@ -25,6 +45,54 @@ class BaseAgent(ABC):
         """对其他智能体的贡献进行评分"""
         pass
 
+    @classmethod
+    def review_matrix(cls, reviewers: List['BaseAgent'], contributions: List[Dict[str, Any]],
+                      all_agents: List['BaseAgent'] = None) -> np.ndarray:
+        """
+        批量评审 (队列模式): 返回 len(reviewers) × len(contributions) 的评分矩阵，
+        第 i 行第 j 列与 reviewers[i].review(contributions[j], all_agents) 相同
+        reviewers 均为本类的实例；默认逐个调用 review，规则型智能体重写为向量运算
+        """
+        all_agents = reviewers if all_agents is None else all_agents
+        return np.array([[reviewer.review(contribution, all_agents) for contribution in contributions]
+                         for reviewer in reviewers], dtype=np.float64).reshape(len(reviewers), len(contributions))
+
+    @classmethod
+    def supports_review_matrix(cls) -> bool:
+        """
+        是否有专门的 review_matrix 实现 (与 review 定义在同一个类中)
+        队列模式只对这些类调用 review_matrix，其余智能体 (如LLM智能体) 留给逐个/并发评审
+        """
+        return _defined_with_review(cls, "review_matrix")
+
+    def review_batch(self, items: List[Dict[str, Any]], all_agents: List['BaseAgent']) -> List[float]:
+        """
+        批量评审 (评审规划): 一次评审多条 (已按内容去重的) 贡献，返回与 items 对齐的评分
+        每个条目为 {'agent_ids': [内容相同的作者], 'content': 内容, 'round': 轮次}
+        默认以每个条目的第一个作者逐个调用 review，因此只适用于评分只取决于贡献内容的智能体
+        """
+        return [self.review(_item_contribution(item), all_agents) for item in items]
+
+    async def areview_batch(self, items: List[Dict[str, Any]], all_agents: List['BaseAgent']) -> List[float]:
+        """review_batch 的异步版本 (默认逐个调用 areview)"""
+        return [await self.areview(_item_contribution(item), all_agents) for item in items]
+
+    @classmethod
+    def supports_review_batch(cls) -> bool:
+        """
+        是否有专门的 review_batch 实现 (与 review 定义在同一个类中，如LLM智能体的单次调用批量评审)
+        评审规划只对这些类去重打包，其余智能体逐个评审 (评分可能取决于作者)
+        """
+        return _defined_with_review(cls, "review_batch")
+
+    async def aact(self, task_prompt: str, current_round: int) -> str:
+        """act 的异步版本 (规则型智能体直接同步计算)"""
+        return self.act(task_prompt, current_round)
+
+    async def areview(self, contribution: Dict[str, Any], all_agents: List['BaseAgent']) -> float:
+        """review 的异步版本 (规则型智能体直接同步计算)"""
+        return self.review(contribution, all_agents)
+
 
 class HonestAgent(BaseAgent):
     """忠诚智能体"""
@@ -41,6 +109,11 @@ class HonestAgent(BaseAgent):
         # 忠诚智能体进行公正的评价 (简化为返回一个中性高分)
         return 0.8
 
+    @classmethod
+    def review_matrix(cls, reviewers: List[BaseAgent], contributions: List[Dict[str, Any]],
+                      all_agents: List[BaseAgent] = None) -> np.ndarray:
+        return np.full((len(reviewers), len(contributions)), 0.8)
+
 
 class SleeperAgent(BaseAgent):
     """卧底智能体"""
@@ -66,6 +139,13 @@ class SleeperAgent(BaseAgent):
             # 攻击时可能会给出随机或恶意的评价
             return -0.5
 
+    @classmethod
+    def review_matrix(cls, reviewers: List[BaseAgent], contributions: List[Dict[str, Any]],
+                      all_agents: List[BaseAgent] = None) -> np.ndarray:
+        latent_periods = np.array([reviewer.params['latent_period'] for reviewer in reviewers])
+        rounds = np.array([contribution.get('round', 999) for contribution in contributions])
+        return np.where(rounds[None, :] <= latent_periods[:, None], 0.8, -0.5)
+
 
 class ColludingAgent(BaseAgent):
     """合谋智能体"""
@@ -87,6 +167,22 @@ class ColludingAgent(BaseAgent):
             # 打压团伙外成员
             return -1.0
 
+    @classmethod
+    def review_matrix(cls, reviewers: List[BaseAgent], contributions: List[Dict[str, Any]],
+                      all_agents: List[BaseAgent] = None) -> np.ndarray:
+        reviewee_ids = np.array([contribution['agent_id'] for contribution in contributions])
+        # 共享同一个团伙列表的成员共用一次成员判断
+        groups: Dict[int, List[int]] = {}
+        rows_by_group: Dict[int, List[int]] = {}
+        for row, reviewer in enumerate(reviewers):
+            group = reviewer.params['colluding_group']
+            groups[id(group)] = group
+            rows_by_group.setdefault(id(group), []).append(row)
+        block = np.empty((len(reviewers), len(contributions)))
+        for key, rows in rows_by_group.items():
+            block[rows] = np.where(np.isin(reviewee_ids, groups[key]), 1.0, -1.0)
+        return block
+
 
 class CamouflageAgent(BaseAgent):
     """伪装智能体"""
@@ -100,4 +196,91 @@ class CamouflageAgent(BaseAgent):
 
     def review(self, contribution: Dict[str, Any], all_agents: List['BaseAgent']) -> float:
         # 伪装智能体的评价可能更具欺骗性
-        return 0.6  # 给出看似合理但可能不准确的评分
\ No newline at end of file
+        return 0.6  # 给出看似合理但可能不准确的评分
+
+    @classmethod
+    def review_matrix(cls, reviewers: List[BaseAgent], contributions: List[Dict[str, Any]],
+                      all_agents: List[BaseAgent] = None) -> np.ndarray:
+        return np.full((len(reviewers), len(contributions)), 0.6)
+
+
+class LLMAgent(BaseAgent):
+    """由聊天模型驱动的忠诚智能体 (llm 为 utils.llm_clients.get_llm_client 返回的客户端)"""
+
+    def __init__(self, agent_id: int, llm: Any, role: str = "Analyst"):
+        super().__init__(agent_id, role)
+        self.llm = llm
+
+    def _act_prompt(self, task_prompt: str, current_round: int) -> str:
+        return f"You are agent {self.id}, acting as a {self.role}. Round {current_round}.\n{task_prompt}"
+
+    def _review_prompt(self, contribution: Dict[str, Any]) -> str:
+        return (
+            f"You are agent {self.id}, acting as a {self.role}. "
+            f"Rate the following contribution from agent {contribution['agent_id']} "
+            f"with a single number between -1 (harmful) and 1 (excellent). Reply with the number only.\n\n"
+            f"{contribution['content']}"
+        )
+
+    def _review_batch_prompt(self, items: List[Dict[str, Any]]) -> str:
+        sections = [
+            f"[{key}] from agent{'s' if len(item['agent_ids']) > 1 else ''} "
+            f"{', '.join(str(agent_id) for agent_id in item['agent_ids'])}:\n{item['content']}"
+            for key, item in enumerate(items, start=1)
+        ]
+        example = ", ".join(f'"{key}": 0.0' for key in range(1, min(len(items), 2) + 1))
+        return (
+            f"You are agent {self.id}, acting as a {self.role}. "
+            f"Rate each of the following {len(items)} contributions with a number between -1 (harmful) "
+            f"and 1 (excellent). Reply with a JSON object mapping each contribution number to its score, "
+            f"e.g. {{{example}}}, and nothing else.\n\n" + "\n\n".join(sections)
+        )
+
+    @staticmethod
+    def parse_scores(text: str, count: int) -> List[float]:
+        """从批量评审的JSON回复中解析 count 个评分，缺失或无法解析的评分记为中性分 0.0"""
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        parsed = {}
+        if match is not None:
+            try:
+                parsed = json.loads(match.group())
+            except ValueError:
+                parsed = {}
+        if not isinstance(parsed, dict):
+            parsed = {}
+        scores, missing = [], 0
+        for key in range(1, count + 1):
+            try:
+                scores.append(max(-1.0, min(1.0, float(parsed[str(key)]))))
+            except (KeyError, TypeError, ValueError):
+                scores.append(0.0)
+                missing += 1
+        if missing:
+            logger.warning("Batched review reply is missing %d of %d scores, scored 0.0", missing, count)
+        return scores
+
+    @staticmethod
+    def parse_score(text: str) -> float:
+        """从模型回复中解析评分，无法解析时返回中性分 0.0"""
+        match = re.search(r"-?\d+(?:\.\d+)?", text)
+        if match is None:
+            return 0.0
+        return max(-1.0, min(1.0, float(match.group())))
+
+    def act(self, task_prompt: str, current_round: int) -> str:
+        return self.llm.invoke(self._act_prompt(task_prompt, current_round)).content
+
+    def review(self, contribution: Dict[str, Any], all_agents: List['BaseAgent']) -> float:
+        return self.parse_score(self.llm.invoke(self._review_prompt(contribution)).content)
+
+    def review_batch(self, items: List[Dict[str, Any]], all_agents: List['BaseAgent']) -> List[float]:
+        return self.parse_scores(self.llm.invoke(self._review_batch_prompt(items)).content, len(items))
+
+    async def aact(self, task_prompt: str, current_round: int) -> str:
+        return (await self.llm.ainvoke(self._act_prompt(task_prompt, current_round))).content
+
+    async def areview(self, contribution: Dict[str, Any], all_agents: List['BaseAgent']) -> float:
+        return self.parse_score((await self.llm.ainvoke(self._review_prompt(contribution))).content)
+
+    async def areview_batch(self, items: List[Dict[str, Any]], all_agents: List['BaseAgent']) -> List[float]:
+        return self.parse_scores((await self.llm.ainvoke(self._review_batch_prompt(items))).content, len(items))
@@ -0,0 +1,160 @@
+# /adapt_mas_project/adapt_mas/aggregation.py
+
+import heapq
+import re
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+
+NO_CONSENSUS = "No consensus reached due to low trust."
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数 (约4个字符一个token)，用于预算裁剪与模型未返回用量时的统计"""
+    return (len(text) + 3) // 4
+
+
+def _normalize(text: str) -> str:
+    """去重用的规范化文本: 忽略大小写与空白差异"""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class AggregationEngine:
+    """
+    信任加权的聚合引擎，只考虑信任度 > 0 的贡献
+    'top1': 线性扫描取信任度最高的贡献 (并列时取先提交者)
+    'topk': 用堆选出信任度最高的 k 个贡献，按信任度从高到低拼接
+    'synthesis': 去重后按信任度从高到低选取贡献直至 token_budget，由裁判模型生成信任加权的综合报告；
+                 stream=True 时流式读取模型输出，on_token 可接收每个片段
+    每次聚合的耗时与token用量按策略累计在 stats 中
+    """
+
+    STRATEGIES = ("top1", "topk", "synthesis")
+
+    def __init__(self, strategy: str = "top1", k: int = 3, llm: Any = None, token_budget: int = 2000,
+                 stream: bool = True, on_token: Callable[[str], None] = None):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown aggregation strategy: {strategy}")
+        if strategy == "synthesis" and llm is None:
+            raise ValueError("synthesis aggregation requires an llm")
+        self.strategy = strategy
+        self.k = k
+        self.llm = llm
+        self.token_budget = token_budget
+        self.stream = stream
+        self.on_token = on_token
+        self.stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def aggregate(self, contributions: List[Dict], trust_scores: Sequence[float], task_prompt: str = "") -> Dict[str, Any]:
+        """
+        contributions 与 trust_scores 一一对应
+        返回 {"output", "strategy", "latency", "prompt_tokens", "completion_tokens", "contributions_used"}
+        """
+        started = time.perf_counter()
+        trust = np.asarray(trust_scores, dtype=np.float64)
+        candidates = np.flatnonzero(trust > 0)
+        prompt_tokens = completion_tokens = 0
+        if not len(candidates):
+            output, used = NO_CONSENSUS, 0
+        elif self.strategy == "top1":
+            output, used = contributions[candidates[np.argmax(trust[candidates])]]['content'], 1
+        elif self.strategy == "topk":
+            top = self._top(candidates, trust, self.k)
+            output, used = "\n\n".join(contributions[i]['content'] for i in top), len(top)
+        else:
+            selected = self._select_within_budget(contributions, candidates, trust)
+            prompt = self._synthesis_prompt(task_prompt, selected)
+            output, prompt_tokens, completion_tokens = self._call_llm(prompt)
+            used = len(selected)
+
+        result = {
+            "output": output,
+            "strategy": self.strategy,
+            "latency": time.perf_counter() - started,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "contributions_used": used,
+        }
+        stats = self.stats[self.strategy]
+        stats["calls"] += 1
+        for key in ("latency", "prompt_tokens", "completion_tokens", "contributions_used"):
+            stats[key] += result[key]
+        return result
+
+    @staticmethod
+    def _top(candidates: np.ndarray, trust: np.ndarray, k: int) -> List[int]:
+        """信任度最高的 k 个贡献下标 (heapq.nlargest 在并列时保持原顺序)"""
+        return heapq.nlargest(k, candidates.tolist(), key=lambda i: trust[i])
+
+    def _select_within_budget(self, contributions: List[Dict], candidates: np.ndarray,
+                              trust: np.ndarray) -> List[tuple]:
+        """
+        按信任度从高到低选取贡献直至 token 预算用尽 (最后一个贡献可能被截断)
+        内容相同的贡献只保留一份，其信任度累加作为权重
+        返回 [(content, weight), ...]
+        """
+        merged: Dict[str, List] = {}
+        for i in self._top(candidates, trust, len(candidates)):
+            content = contributions[i]['content']
+            key = _normalize(content)
+            if key in merged:
+                merged[key][1] += trust[i]
+            else:
+                merged[key] = [content, trust[i]]
+
+        selected, remaining = [], self.token_budget
+        for content, weight in merged.values():
+            if remaining <= 0:
+                break
+            tokens = estimate_tokens(content)
+            if tokens > remaining:
+                content = content[:remaining * 4]
+                tokens = remaining
+            selected.append((content, float(weight)))
+            remaining -= tokens
+        return selected
+
+    @staticmethod
+    def _synthesis_prompt(task_prompt: str, selected: List[tuple]) -> str:
+        total = sum(weight for _, weight in selected) or 1.0
+        parts = [f"[Contribution {n} | trust weight {weight / total:.2f}]\n{content}"
+                 for n, (content, weight) in enumerate(selected, 1)]
+        return (
+            "You are the judge of a multi-agent system. Synthesize a single final answer to the task below "
+            "from the agents' contributions. Give more weight to contributions with higher trust weight "
+            "and ignore claims that conflict with higher-trust contributions.\n\n"
+            f"Task: {task_prompt}\n\n" + "\n\n".join(parts)
+        )
+
+    def _call_llm(self, prompt: str):
+        """调用裁判模型，返回 (输出, prompt_tokens, completion_tokens)；模型未报告用量时按字符数估计"""
+        if self.stream and hasattr(self.llm, "stream"):
+            message = None
+            for chunk in self.llm.stream(prompt):
+                if self.on_token is not None and chunk.content:
+                    self.on_token(chunk.content)
+                message = chunk if message is None else message + chunk
+            content = message.content if message is not None else ""
+        else:
+            message = self.llm.invoke(prompt)
+            content = message.content
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            return content, usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        return content, estimate_tokens(prompt), estimate_tokens(content)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """按策略汇总: 调用次数、平均耗时与平均token用量"""
+        summary = {}
+        for strategy, stats in self.stats.items():
+            calls = stats["calls"] or 1
+            summary[strategy] = {
+                **stats,
+                "mean_latency": stats["latency"] / calls,
+                "mean_prompt_tokens": stats["prompt_tokens"] / calls,
+                "mean_completion_tokens": stats["completion_tokens"] / calls,
+            }
+        return summary
@@ -0,0 +1,76 @@
+# /adapt_mas_project/adapt_mas/analysis_scheduler.py
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .reviews import ReviewBatch
+
+
+class AnalysisScheduler:
+    """
+    自适应的分析调度: 每轮都做CIS更新，完整的图分析 (Louvain合谋检测与团伙惩罚) 只在以下情况执行
+    - 该上下文第一次分析 ('first')
+    - 距该上下文上次完整分析已有 interval 轮 ('interval')
+    - 廉价信号相对上次完整分析时的取值变化超过阈值 (阈值为 None 表示不使用该信号):
+        'score_variance':   本轮评分方差的变化量
+        'trust_drift':      信任分的最大绝对变化
+        'negative_reviews': 负面评审占比的上升量
+    参考值按上下文分别保存，在每次完整分析时更新
+    """
+
+    SIGNALS = ("score_variance", "trust_drift", "negative_reviews")
+
+    def __init__(self, agent_ids: List[int], interval: int = None, score_variance: float = None,
+                 trust_drift: float = None, negative_reviews: float = None):
+        self.agent_ids = [int(agent_id) for agent_id in agent_ids]
+        self.interval = interval
+        self.thresholds = {"score_variance": score_variance, "trust_drift": trust_drift,
+                           "negative_reviews": negative_reviews}
+        # {context: {"round", "score_variance", "negative_share", "trust"}}: 上次完整分析时的参考值
+        self._reference: Dict[str, Dict[str, Any]] = {}
+        self.last_signals: Dict[str, float] = {}
+
+    def plan(self, round_number: int, context: str, reviews: ReviewBatch, trust_manager) -> Optional[str]:
+        """
+        决定本轮是否执行完整分析: 返回触发原因，或 None 表示只做CIS更新
+        (返回触发原因时即以本轮的取值作为新的参考值)
+        """
+        thresholds = self.thresholds
+        scores = reviews.scores.astype(np.float64)
+        current = {
+            "score_variance": float(scores.var()) if len(scores) else 0.0,
+            "negative_share": float((scores < 0).mean()) if len(scores) else 0.0,
+            "trust": trust_manager.get_trust_scores(self.agent_ids, context)
+            if thresholds["trust_drift"] is not None else None,
+        }
+        reference = self._reference.get(context)
+
+        trigger = None
+        self.last_signals = {}
+        if reference is None:
+            trigger = "first"
+        else:
+            signals = {
+                "score_variance": abs(current["score_variance"] - reference["score_variance"]),
+                "negative_reviews": current["negative_share"] - reference["negative_share"],
+            }
+            if current["trust"] is not None:
+                signals["trust_drift"] = float(np.abs(current["trust"] - reference["trust"]).max(initial=0.0))
+            self.last_signals = signals
+            if self.interval and round_number - reference["round"] >= self.interval:
+                trigger = "interval"
+            else:
+                trigger = next((name for name in self.SIGNALS
+                                if thresholds[name] is not None and signals[name] > thresholds[name]), None)
+
+        if trigger is not None:
+            self._reference[context] = {"round": round_number, **current}
+        return trigger
+
+    def state_dict(self) -> Dict:
+        """可序列化的状态 (用于检查点)"""
+        return {"reference": {context: dict(reference) for context, reference in self._reference.items()}}
+
+    def load_state_dict(self, state: Dict):
+        self._reference = {context: dict(reference) for context, reference in state["reference"].items()}
@@ -0,0 +1,52 @@
+# /adapt_mas_project/adapt_mas/checkpoint.py
+
+import pickle
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+
+class SessionCheckpointer:
+    """
+    会话检查点存储 (本地SQLite)
+    每个检查点对应一个已完成的轮次，内容为会话的 state_dict 及调用方附加的元数据 (如日志游标)，
+    以 pickle 序列化后经 zlib 压缩保存；NumPy 数组按原始字节保存，恢复后逐位一致
+    keep_last: 只保留最近的若干个检查点
+    """
+
+    def __init__(self, path: str, keep_last: int = 3):
+        self.path = path
+        self.keep_last = keep_last
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "round INTEGER PRIMARY KEY, created REAL NOT NULL, payload BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def save(self, round_number: int, state: Dict[str, Any]):
+        """写入 round_number 轮结束时的检查点，并清理较旧的检查点 (单个事务内完成)"""
+        payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+                               (round_number, time.time(), payload))
+            if self.keep_last:
+                self._conn.execute(
+                    "DELETE FROM checkpoints WHERE round NOT IN "
+                    "(SELECT round FROM checkpoints ORDER BY round DESC LIMIT ?)", (self.keep_last,))
+
+    def load(self, round_number: int = None) -> Optional[Dict[str, Any]]:
+        """读取指定轮次 (缺省为最新) 的检查点，不存在时返回 None"""
+        if round_number is None:
+            row = self._conn.execute("SELECT payload FROM checkpoints ORDER BY round DESC LIMIT 1").fetchone()
+        else:
+            row = self._conn.execute("SELECT payload FROM checkpoints WHERE round = ?", (round_number,)).fetchone()
+        return pickle.loads(zlib.decompress(row[0])) if row else None
+
+    def latest_round(self) -> Optional[int]:
+        row = self._conn.execute("SELECT MAX(round) FROM checkpoints").fetchone()
+        return row[0]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,70 @@
+# /adapt_mas_project/adapt_mas/concurrency.py
+
+import asyncio
+import sys
+from typing import Any, Awaitable, Callable, List
+
+# 视为瞬时错误的HTTP状态码: 请求超时、冲突、限流与服务端错误
+TRANSIENT_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    是否为可重试的瞬时错误: 超时、连接错误、限流与服务端过载
+    其他错误 (如回放模式下的 CacheMissError、请求参数错误) 重试也不会成功
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # openai / httpx 的异常类型只在库已加载时检查 (抛出这些异常的库必然已加载)
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(error, (openai.APIConnectionError, openai.RateLimitError,
+                                                 openai.InternalServerError)):
+        return True
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    return getattr(error, "status_code", None) in TRANSIENT_STATUS_CODES
+
+
+async def call_with_retry(
+        factory: Callable[[], Awaitable[Any]],
+        timeout: float = None,
+        max_retries: int = 0,
+        backoff: float = 1.0,
+        semaphore: asyncio.Semaphore = None
+) -> Any:
+    """
+    执行一次异步调用，带超时与指数退避重试
+    factory: 每次重试都会重新调用以生成新的协程
+    只重试瞬时错误 (见 is_transient)，其他异常立即抛出
+    第 n 次重试前等待 backoff * 2 ** (n - 1) 秒；重试耗尽后抛出最后一次的异常
+    semaphore: 每次尝试期间占用的并发名额，退避等待时释放
+    """
+    attempt = 0
+    while True:
+        try:
+            if semaphore is None:
+                return await asyncio.wait_for(factory(), timeout)
+            async with semaphore:
+                return await asyncio.wait_for(factory(), timeout)
+        except Exception as error:
+            if attempt >= max_retries or not is_transient(error):
+                raise
+        await asyncio.sleep(backoff * 2 ** attempt)
+        attempt += 1
+
+
+async def gather_with_limit(
+        factories: List[Callable[[], Awaitable[Any]]],
+        limit: int,
+        timeout: float = None,
+        max_retries: int = 0,
+        backoff: float = 1.0
+) -> List[Any]:
+    """
+    以最多 limit 个并发执行一组异步调用 (退避等待中的调用不占用并发名额)
+    返回结果的顺序与 factories 一致，与完成顺序无关，保证日志可复现
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+    return await asyncio.gather(*(call_with_retry(factory, timeout, max_retries, backoff, semaphore)
+                                  for factory in factories))
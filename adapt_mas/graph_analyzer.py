@@ -1,91 +1,297 @@
 # /adapt_mas_project/adapt_mas/graph_analyzer.py
 
-import networkx as nx
-from community import community_louvain
+import numpy as np
 from collections import defaultdict
-from typing import List, Dict, Tuple
+from typing import TYPE_CHECKING, List, Dict, Tuple, Union
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+from .reviews import ReviewBatch, as_review_batch
 
 
 class GraphAnalyzer:
     """实现社交图谱分析，检测合谋团体"""
 
-    def __init__(self, suspicion_threshold: float = 0.7):
+    # 增量模式下，衰减后绝对值低于该值的边被移除
+    EDGE_EPSILON = 1e-4
+
+    def __init__(self, suspicion_threshold: float = 0.7, incremental: bool = False,
+                 decay: float = 0.0, repartition_delta: float = 0.0, random_state: int = None,
+                 sparse_reviews: bool = False):
+        """
+        incremental: 是否跨轮次保留图与社群划分 (增量模式)
+        decay: 增量模式下历史评审的衰减系数，边权为 decay * 旧权重 + (1 - decay) * 本轮评分；
+               0 表示图只反映本轮评审
+        repartition_delta: 增量模式下，若所有边权变化都小于该值且节点集合不变，则沿用上一轮的社群划分
+        random_state: Louvain算法的随机种子，用于复现实验
+        sparse_reviews: 评审为采样拓扑时设为 True；增量模式下本轮未被抽中的边不代表评价消失，
+                        保留其最近一次观测到的权重而不衰减
+        """
         self.suspicion_threshold = suspicion_threshold
+        self.incremental = incremental
+        self.decay = decay
+        self.repartition_delta = repartition_delta
+        self.random_state = random_state
+        self.sparse_reviews = sparse_reviews
+
+        # --- 增量模式的跨轮次状态 ---
+        self._graph = None
+        self._partition = None
+        self._nodes_changed = True
+        self._max_weight_change = 0.0  # 自上次划分以来边权变化的累积上界
+        self._dirty_nodes = set()  # 出边发生变化的节点
+        self._suspicion_cache: Dict[frozenset, float] = {}
+        self.last_run_stats = {}
 
-    def build_graph(self, interactions: List[Tuple[int, int, float]]):
+    def build_graph(self, interactions: Union[ReviewBatch, List[Tuple[int, int, float]]]):
         """
         构建有向加权图
-        interactions: a list of (reviewer_id, reviewee_id, score)
+        interactions: a ReviewBatch, or a list of (reviewer_id, reviewee_id, score)
+        增量模式下，本轮评审会被合并进跨轮次保留的图中并返回该图
         """
-        G = nx.DiGraph()
-        for u, v, w in interactions:
+        import networkx as nx  # networkx 导入较慢，只在首次建图时加载
+
+        reviews = as_review_batch(interactions)
+        edges = zip(reviews.reviewers.tolist(), reviews.reviewees.tolist(), reviews.scores.tolist())
+        if not self.incremental:
+            G = nx.DiGraph()
+            G.add_weighted_edges_from(edges)
+            return G
+        return self._merge_into_graph(edges)
+
+    def _merge_into_graph(self, edges) -> "nx.DiGraph":
+        """将本轮评审按指数衰减合并进保留的图，并记录边权变化"""
+        import networkx as nx
+
+        if self._graph is None:
+            self._graph = nx.DiGraph()
+        G = self._graph
+        new_weights = {(u, v): w for u, v, w in edges}
+        old_nodes = set(G.nodes)
+
+        max_change = 0.0
+        dirty_nodes = set()
+        stale_edges = []
+        for u, v, data in G.edges(data=True):
+            old = data['weight']
+            if (u, v) in new_weights:
+                updated = self.decay * old + (1 - self.decay) * new_weights.pop((u, v))
+            elif self.sparse_reviews:
+                continue
+            else:
+                updated = self.decay * old
+            if abs(updated) < self.EDGE_EPSILON:
+                stale_edges.append((u, v))
+                updated = 0.0
+            else:
+                data['weight'] = updated
+            change = abs(updated - old)
+            if change > 0:
+                dirty_nodes.add(u)
+                max_change = max(max_change, change)
+        G.remove_edges_from(stale_edges)
+
+        # 首次出现的边没有历史，直接取本轮评分
+        for (u, v), w in new_weights.items():
             G.add_edge(u, v, weight=w)
+            dirty_nodes.add(u)
+            max_change = max(max_change, abs(w))
+
+        # 累积自上次划分以来的变化，避免小幅变化逐轮叠加而始终不触发重新划分
+        self._nodes_changed = self._nodes_changed or set(G.nodes) != old_nodes
+        self._max_weight_change += max_change
+        self._dirty_nodes |= dirty_nodes
         return G
 
-    def detect_collusion(self, G: nx.DiGraph) -> List[List[int]]:
+    def state_dict(self) -> Dict:
+        """增量模式的跨轮次状态 (用于检查点)，边以三个平行数组保存"""
+        state = {
+            "graph": None,
+            "partition": self._partition,
+            "nodes_changed": self._nodes_changed,
+            "max_weight_change": self._max_weight_change,
+            "dirty_nodes": set(self._dirty_nodes),
+            "suspicion_cache": dict(self._suspicion_cache),
+            "last_run_stats": dict(self.last_run_stats),
+        }
+        if self._graph is not None:
+            state["graph"] = {"nodes": list(self._graph.nodes), "edges": self._edge_arrays(self._graph)}
+        return state
+
+    def load_state_dict(self, state: Dict):
+        import networkx as nx
+
+        self._graph = None
+        if state["graph"] is not None:
+            # 按原顺序恢复节点与边，保证Louvain的遍历顺序与中断前一致
+            self._graph = nx.DiGraph()
+            self._graph.add_nodes_from(state["graph"]["nodes"])
+            sources, targets, weights = state["graph"]["edges"]
+            self._graph.add_weighted_edges_from(zip(sources.tolist(), targets.tolist(), weights.tolist()))
+        self._partition = state["partition"]
+        self._nodes_changed = state["nodes_changed"]
+        self._max_weight_change = state["max_weight_change"]
+        self._dirty_nodes = set(state["dirty_nodes"])
+        self._suspicion_cache = dict(state["suspicion_cache"])
+        self.last_run_stats = dict(state["last_run_stats"])
+
+    def _partition_graph(self, G: "nx.DiGraph", initial_partition: Dict[int, int] = None) -> Dict[int, int]:
+        """
+        Louvain算法需要无向图，且节点加权度不能为负；
+        负面评价不代表社群关系，因此划分时只保留正权重的边
+        """
+        from community import community_louvain
+
+        undirected = G.to_undirected()
+        undirected.remove_edges_from([(u, v) for u, v, w in undirected.edges(data='weight') if w <= 0])
+        return community_louvain.best_partition(undirected, partition=initial_partition,
+                                                random_state=self.random_state)
+
+    def _warm_start_partition(self, G: "nx.DiGraph") -> Dict[int, int]:
+        """用上一轮的社群划分作为初始划分，新节点各自成为独立社群"""
+        next_label = max(self._partition.values(), default=-1) + 1
+        initial = {}
+        for node in G.nodes:
+            if node in self._partition:
+                initial[node] = self._partition[node]
+            else:
+                initial[node] = next_label
+                next_label += 1
+        return initial
+
+    def detect_collusion(self, G: "nx.DiGraph", reviews: Union[ReviewBatch, List[Tuple[int, int, float]]] = None) -> List[List[int]]:
         """
         使用Louvain算法检测社群并计算可疑度
         返回一个列表，每个元素是一个被识别为合谋的团伙
+        增量模式下 G 应为 build_graph 返回的保留图
+        reviews: 可选，非增量模式下直接用本轮评审计算可疑分，无需再从 G 中提取边
         """
         if G.number_of_nodes() == 0:
             return []
 
-        # Louvain算法需要无向图
-        partition = community_louvain.best_partition(G.to_undirected())
+        repartitioned = True
+        if not self.incremental or self._partition is None:
+            partition = self._partition_graph(G)
+        elif not self._nodes_changed and self._max_weight_change < self.repartition_delta:
+            # 图几乎未变化，沿用上一轮的划分
+            partition = self._partition
+            repartitioned = False
+        else:
+            partition = self._partition_graph(G, self._warm_start_partition(G))
+
         communities = defaultdict(list)
         for agent_id, community_id in partition.items():
             communities[community_id].append(agent_id)
 
+        # 只考虑2人及以上的团体；增量模式下，只有成员或边发生变化的社群才重新计算可疑分
+        candidates = {community_id: frozenset(members) for community_id, members in communities.items()
+                      if len(members) > 1}
+        to_score = [community_id for community_id, key in candidates.items()
+                    if not (self.incremental and key in self._suspicion_cache and self._dirty_nodes.isdisjoint(key))]
+
+        if reviews is not None and not self.incremental:
+            reviews = as_review_batch(reviews)
+            edges = (reviews.reviewers, reviews.reviewees, reviews.scores.astype(np.float64))
+        else:
+            edges = self._edge_arrays(G)
+        fresh_scores = self.score_communities(*edges, partition, to_score) if to_score else {}
+
         colluding_groups = []
-        for community_id, members in communities.items():
-            if len(members) > 1:  # 只考虑2人及以上的团体
-                suspicion_score = self._calculate_suspicion_score(G, members)
-                if suspicion_score > self.suspicion_threshold:
-                    colluding_groups.append(members)
+        suspicion_cache = {}
+        for community_id, key in candidates.items():
+            suspicion_score = fresh_scores[community_id] if community_id in fresh_scores else self._suspicion_cache[key]
+            suspicion_cache[key] = suspicion_score
+            if suspicion_score > self.suspicion_threshold:
+                colluding_groups.append(communities[community_id])
 
+        if self.incremental:
+            if repartitioned:
+                self._nodes_changed = False
+                self._max_weight_change = 0.0
+            self._partition = partition
+            self._suspicion_cache = suspicion_cache
+            # 本轮的变化已被处理
+            self._dirty_nodes = set()
+        self.last_run_stats = {"repartitioned": repartitioned, "communities_rescored": len(to_score)}
         return colluding_groups
 
-    def _calculate_suspicion_score(self, G: nx.DiGraph, members: List[int]) -> float:
+    @staticmethod
+    def _edge_arrays(G: "nx.DiGraph") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """将图的边导出为 (源节点, 目标节点, 权重) 三个平行数组"""
+        num_edges = G.number_of_edges()
+        edges = list(G.edges(data='weight', default=0.0))
+        sources = np.fromiter((u for u, _, _ in edges), dtype=np.int64, count=num_edges)
+        targets = np.fromiter((v for _, v, _ in edges), dtype=np.int64, count=num_edges)
+        weights = np.fromiter((w for _, _, w in edges), dtype=np.float64, count=num_edges)
+        return sources, targets, weights
+
+    @staticmethod
+    def score_communities(
+            reviewers: np.ndarray,
+            reviewees: np.ndarray,
+            weights: np.ndarray,
+            partition: Dict[int, int],
+            community_ids: List[int] = None
+    ) -> Dict[int, float]:
         """
-        根据内部凝聚度、外部隔离度、评价偏差度计算社群可疑分
+        根据内部凝聚度、外部隔离度、评价偏差度，一次性计算所有社群的可疑分
+        reviewers / reviewees / weights: 有向边的三个平行数组 (可直接使用 ReviewBatch 的列)
+        partition: {agent_id: community_id}
+        community_ids: 只计算这些社群，缺省时计算全部
+        返回 {community_id: suspicion_score}
         """
-        internal_edges = 0
-        internal_weight = 0.0
-        external_edges = 0
-        external_weight = 0.0
-
-        internal_eval_scores = []
-        external_eval_scores = []
-
-        for u in members:
-            if u not in G: continue
-            for v, data in G[u].items():
-                weight = data.get('weight', 0.0)
-                if v in members:
-                    internal_edges += 1
-                    internal_weight += weight
-                    internal_eval_scores.append(weight)
-                else:
-                    external_edges += 1
-                    external_weight += weight
-                    external_eval_scores.append(weight)
-
-        # 1. 内部凝聚度 (简化为平均内部评价)
-        avg_internal_cohesion = (internal_weight / internal_edges) if internal_edges > 0 else 0
-
-        # 2. 外部隔离度 (简化为内外部边数比)
-        total_edges = internal_edges + external_edges
-        external_isolation_ratio = (internal_edges / total_edges) if total_edges > 0 else 1.0
-
-        # 3. 评价偏差度
-        avg_external_eval = (sum(external_eval_scores) / len(external_eval_scores)) if external_eval_scores else 0
+        reviewers = np.asarray(reviewers, dtype=np.int64)
+        reviewees = np.asarray(reviewees, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+
+        # 社群标签向量: labels[agent_id] = 紧凑的社群下标，不在划分中的智能体为 -1
+        nodes = np.fromiter(partition.keys(), dtype=np.int64, count=len(partition))
+        community_of_node = np.fromiter(partition.values(), dtype=np.int64, count=len(partition))
+        community_keys, compact = np.unique(community_of_node, return_inverse=True)
+        size = int(max(nodes.max(initial=-1), reviewers.max(initial=-1), reviewees.max(initial=-1))) + 1
+        labels = np.full(size, -1, dtype=np.int64)
+        labels[nodes] = compact
+        num_communities = len(community_keys)
+
+        # 每条边按源节点所属社群归类为内部边或外部边
+        source_label = labels[reviewers]
+        target_label = labels[reviewees]
+        selected = source_label >= 0
+        if community_ids is not None:
+            wanted = np.zeros(num_communities, dtype=bool)
+            wanted[np.searchsorted(community_keys, community_ids)] = True
+            selected &= wanted[np.maximum(source_label, 0)]
+        internal = selected & (source_label == target_label)
+        external = selected & ~internal
+
+        internal_edges = np.bincount(source_label[internal], minlength=num_communities)
+        internal_weight = np.bincount(source_label[internal], weights=weights[internal], minlength=num_communities)
+        external_edges = np.bincount(source_label[external], minlength=num_communities)
+        external_weight = np.bincount(source_label[external], weights=weights[external], minlength=num_communities)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 1. 内部凝聚度 (简化为平均内部评价)
+            avg_internal_cohesion = np.where(internal_edges > 0, internal_weight / internal_edges, 0.0)
+
+            # 2. 外部隔离度 (简化为内外部边数比)
+            total_edges = internal_edges + external_edges
+            external_isolation_ratio = np.where(total_edges > 0, internal_edges / total_edges, 1.0)
+
+            # 3. 评价偏差度
+            avg_external_eval = np.where(external_edges > 0, external_weight / external_edges, 0.0)
         eval_bias = avg_internal_cohesion - avg_external_eval
 
         # 组合成最终可疑分 (这是一个简化的加权，可以根据实验调优)
         # 内部评价越高、越孤立、内外评价差异越大，则越可疑
-        suspicion_score = (
+        suspicion_scores = (
                 0.5 * external_isolation_ratio +
                 0.3 * (avg_internal_cohesion / 1.0) +  # 假设最高分为1.0
                 0.2 * (eval_bias / 2.0)  # 假设最大偏差为2.0 (1 - (-1))
         )
-        return max(0.0, min(1.0, suspicion_score))
\ No newline at end of file
+        suspicion_scores = np.clip(suspicion_scores, 0.0, 1.0)
+
+        if community_ids is None:
+            community_ids = community_keys.tolist()
+        return {community_id: float(suspicion_scores[np.searchsorted(community_keys, community_id)])
+                for community_id in community_ids}
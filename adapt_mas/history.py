@@ -0,0 +1,260 @@
+# /adapt_mas_project/adapt_mas/history.py
+
+import os
+from typing import Dict, Iterator, List, Sequence
+
+import numpy as np
+
+from .reviews import ReviewBatch
+from .verifier import cis_by_reviewee, reviewer_weights
+
+# 数据文件: 文件头 (magic、版本号、智能体数、agent_ids) 之后逐条追加记录，每条记录 (对应一个 (轮次, 上下文)) 依次为
+#   cis float64[N] | trust_before float64[N] | trust float64[N] | reviewers int32[R] | reviewees int32[R] | scores float32[R]
+# 并补齐到8字节对齐。索引文件 ({path}.idx) 为定长条目数组，每条记录一个条目，按记录号 O(1) 定位
+_MAGIC = b"AMASHIST"
+_VERSION = 1
+_INDEX_DTYPE = np.dtype([("round", "<i8"), ("offset", "<i8"), ("num_reviews", "<i8"), ("context", "S56")])
+
+
+def _index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def _header_size(num_agents: int) -> int:
+    return len(_MAGIC) + 8 + 8 * num_agents
+
+
+def _record_size(num_agents: int, num_reviews: int) -> int:
+    size = 24 * num_agents + 12 * num_reviews
+    return size + (-size) % 8
+
+
+def _read_header(path: str) -> np.ndarray:
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{path} is not a trust history file")
+        version, num_agents = np.frombuffer(f.read(8), dtype="<u4")
+        if version != _VERSION:
+            raise ValueError(f"Unsupported trust history version {version} in {path}")
+        return np.frombuffer(f.read(8 * int(num_agents)), dtype="<i8").astype(np.int64)
+
+
+class HistoryWriter:
+    """
+    追加写入的信任历史: 每个 (轮次, 上下文) 记录本轮的评审 (COO格式)、各智能体收到的CIS、
+    计算CIS时使用的信任分 (合谋惩罚之后、EMA更新之前) 与分析结束时的信任分
+    每条记录先写数据再写索引，并立即刷新，运行中的实验也可以用 HistoryReader 读取已完成的轮次
+    """
+
+    def __init__(self, path: str, agent_ids: Sequence[int], keep_records: int = None):
+        """
+        keep_records: 断点续跑时使用，保留已有历史的前 keep_records 条记录 (检查点记录的游标) 后继续追加；
+                      None 表示新建
+        """
+        self.path = path
+        self.agent_ids = np.asarray(agent_ids, dtype=np.int64)
+        self._row_of = {int(agent_id): row for row, agent_id in enumerate(self.agent_ids)}
+        num_agents = len(self.agent_ids)
+
+        if keep_records is None:
+            with open(path, "wb") as f:
+                f.write(_MAGIC)
+                f.write(np.array([_VERSION, num_agents], dtype="<u4").tobytes())
+                f.write(self.agent_ids.astype("<i8").tobytes())
+            open(_index_path(path), "wb").close()
+            self.records_written = 0
+        else:
+            if not np.array_equal(_read_header(path), self.agent_ids):
+                raise ValueError(f"History {path} was written for different agents")
+            index = np.fromfile(_index_path(path), dtype=_INDEX_DTYPE)
+            if len(index) < keep_records:
+                raise ValueError(f"History {path} has {len(index)} records, checkpoint expects {keep_records}")
+            end = _header_size(num_agents)
+            if keep_records:
+                last = index[keep_records - 1]
+                end = int(last["offset"]) + _record_size(num_agents, int(last["num_reviews"]))
+            # 丢弃检查点之后 (或崩溃时写了一半) 的记录
+            os.truncate(path, end)
+            os.truncate(_index_path(path), keep_records * _INDEX_DTYPE.itemsize)
+            self.records_written = keep_records
+
+        self._data = open(path, "ab")
+        self._index = open(_index_path(path), "ab")
+
+    def append(self, round_number: int, context: str, reviews: ReviewBatch, cis: Dict[int, float],
+               trust_before: Sequence[float], trust: Sequence[float]):
+        """
+        追加一条记录
+        cis: {agent_id: cis}，未收到评价的智能体记为 NaN
+        trust_before / trust: 与 agent_ids 对齐的信任分向量
+        """
+        encoded_context = context.encode("utf-8")
+        if len(encoded_context) > _INDEX_DTYPE["context"].itemsize:
+            raise ValueError(f"Context name too long for the history index: {context}")
+        num_agents = len(self.agent_ids)
+        cis_vector = np.full(num_agents, np.nan)
+        if cis:
+            rows = np.fromiter((self._row_of[agent_id] for agent_id in cis), dtype=np.int64, count=len(cis))
+            cis_vector[rows] = np.fromiter(cis.values(), dtype=np.float64, count=len(cis))
+
+        offset = self._data.tell()
+        size = _record_size(num_agents, len(reviews))
+        for array, dtype in ((cis_vector, "<f8"), (trust_before, "<f8"), (trust, "<f8"), (reviews.reviewers, "<i4"),
+                             (reviews.reviewees, "<i4"), (reviews.scores, "<f4")):
+            self._data.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        self._data.write(b"\0" * (offset + size - self._data.tell()))
+        self._data.flush()
+
+        entry = np.array([(round_number, offset, len(reviews), encoded_context)], dtype=_INDEX_DTYPE)
+        self._index.write(entry.tobytes())
+        self._index.flush()
+        self.records_written += 1
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class HistoryRecord:
+    """一条历史记录，数组均为内存映射文件上的只读视图 (按 agent_ids 的顺序排列)"""
+    __slots__ = ("round", "context", "reviews", "cis", "trust_before", "trust")
+
+    def __init__(self, round_number: int, context: str, reviews: ReviewBatch, cis: np.ndarray,
+                 trust_before: np.ndarray, trust: np.ndarray):
+        self.round = round_number
+        self.context = context
+        self.reviews = reviews
+        self.cis = cis
+        self.trust_before = trust_before
+        self.trust = trust
+
+    def __repr__(self) -> str:
+        return f"HistoryRecord(round={self.round}, context={self.context!r}, reviews={len(self.reviews)})"
+
+
+class HistoryReader:
+    """
+    以内存映射方式读取信任历史，不加载整个文件；任意记录的访问为 O(1)
+    用于离线回放与重新打分，例如:
+        history = HistoryReader("experiment_log_sleeper_0.3.parquet.history")
+        record = history.round(50)
+        history.rescore(history.find(50), reviewer_trust=np.ones(len(history.agent_ids)))
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.agent_ids = _read_header(path)
+        self._row_of = np.full(int(self.agent_ids.max(initial=-1)) + 1, -1, dtype=np.int64)
+        self._row_of[self.agent_ids] = np.arange(len(self.agent_ids))
+        self.refresh()
+
+    def refresh(self):
+        """重新映射文件，使读取器看到此后追加的记录 (用于读取仍在运行的实验)"""
+        self.index = np.fromfile(_index_path(self.path), dtype=_INDEX_DTYPE)
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r")
+        self.contexts: List[str] = [context.decode("utf-8") for context in self.index["context"]]
+        self._positions: Dict = {}
+        for position, (round_number, context) in enumerate(zip(self.index["round"].tolist(), self.contexts)):
+            self._positions.setdefault((round_number, context), position)
+            self._positions.setdefault((round_number, None), position)
+
+    @property
+    def rounds(self) -> np.ndarray:
+        """每条记录的轮次"""
+        return self.index["round"]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _view(self, offset: int, dtype: str, count: int) -> np.ndarray:
+        return self._map[offset:offset + count * np.dtype(dtype).itemsize].view(dtype)
+
+    def record(self, position: int) -> HistoryRecord:
+        """第 position 条记录 (支持负下标)"""
+        entry = self.index[position]
+        num_agents, num_reviews = len(self.agent_ids), int(entry["num_reviews"])
+        offset = int(entry["offset"])
+        vectors = [self._view(offset + 8 * num_agents * i, "<f8", num_agents) for i in range(3)]
+        offset += 24 * num_agents
+        reviewers = self._view(offset, "<i4", num_reviews)
+        reviewees = self._view(offset + 4 * num_reviews, "<i4", num_reviews)
+        scores = self._view(offset + 8 * num_reviews, "<f4", num_reviews)
+        return HistoryRecord(int(entry["round"]), self.contexts[position],
+                             ReviewBatch(reviewers, reviewees, scores), *vectors)
+
+    __getitem__ = record
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        return (self.record(position) for position in range(len(self)))
+
+    def find(self, round_number: int, context: str = None) -> int:
+        """(轮次, 上下文) 对应的记录号，context 缺省时取该轮的第一个任务"""
+        try:
+            return self._positions[(round_number, context)]
+        except KeyError:
+            raise KeyError(f"No history record for round {round_number}, context {context}") from None
+
+    def round(self, round_number: int, context: str = None) -> HistoryRecord:
+        return self.record(self.find(round_number, context))
+
+    def _stack(self, field: str, context: str = None) -> np.ndarray:
+        positions = [position for position, name in enumerate(self.contexts) if context is None or name == context]
+        if not positions:
+            return np.empty((0, len(self.agent_ids)), dtype=np.float64)
+        return np.stack([getattr(self.record(position), field) for position in positions])
+
+    def trust_matrix(self, context: str = None) -> np.ndarray:
+        """(记录数 × 智能体数) 的信任分矩阵，可只选取一个上下文的记录"""
+        return self._stack("trust", context)
+
+    def cis_matrix(self, context: str = None) -> np.ndarray:
+        """(记录数 × 智能体数) 的CIS矩阵，未收到评价为 NaN"""
+        return self._stack("cis", context)
+
+    def review_matrix(self, position: int, fill: float = np.nan) -> np.ndarray:
+        """第 position 条记录的稠密评审矩阵 (行为评审者、列为被评审者，按 agent_ids 的顺序)，未评审的位置为 fill"""
+        reviews = self.record(position).reviews
+        matrix = np.full((len(self.agent_ids), len(self.agent_ids)), fill, dtype=np.float64)
+        matrix[self._row_of[reviews.reviewers], self._row_of[reviews.reviewees]] = reviews.scores
+        return matrix
+
+    def cis_contributions(self, position: int, reviewer_trust: np.ndarray = None) -> np.ndarray:
+        """
+        每条评审对被评审者CIS的贡献 (与 record.reviews 对齐): 评审者信任 × 评分 / 该被评审者的评审者信任之和
+        按被评审者求和即为其CIS；reviewer_trust 缺省时使用记录中的 trust_before
+        """
+        record = self.record(position)
+        reviews = record.reviews
+        trust = record.trust_before if reviewer_trust is None else np.asarray(reviewer_trust, dtype=np.float64)
+        # 与 DecentralizedVerifier.calculate_cis_all 相同的权重与分组信任和
+        reviewer_trust = trust[self._row_of[reviews.reviewers]]
+        reviewee_rows = self._row_of[reviews.reviewees]
+        _, _, trust_sum = cis_by_reviewee(reviewer_trust, reviewee_rows, reviews.scores, len(self.agent_ids))
+        trust_sum = trust_sum[reviewee_rows]
+        contributions = np.zeros(len(reviews), dtype=np.float64)
+        nonzero = trust_sum != 0
+        contributions[nonzero] = reviewer_weights(reviewer_trust[nonzero]) * \
+            reviews.scores[nonzero].astype(np.float64) / trust_sum[nonzero]
+        return contributions
+
+    def rescore(self, position: int, reviewer_trust: np.ndarray = None) -> np.ndarray:
+        """
+        用记录中的评审重新计算各智能体的CIS (未收到评价为 NaN)，无需重新模拟
+        reviewer_trust: 与 agent_ids 对齐的评审者信任，缺省时使用 trust_before (结果与当时的CIS一致)
+        """
+        record = self.record(position)
+        reviews = record.reviews
+        trust = record.trust_before if reviewer_trust is None else np.asarray(reviewer_trust, dtype=np.float64)
+        cis, reviewed, _ = cis_by_reviewee(trust[self._row_of[reviews.reviewers]], self._row_of[reviews.reviewees],
+                                           reviews.scores, len(self.agent_ids))
+        return np.where(reviewed, cis, np.nan)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._map) + self.index.nbytes
@@ -0,0 +1,142 @@
+# /adapt_mas_project/adapt_mas/instrumentation.py
+
+import functools
+import inspect
+import json
+import logging
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 进程内LLM调用计数: 由客户端包装层在请求真正发往提供方时累加 (utils.rate_limit.RateLimitedChatModel)，
+# 命中响应缓存的调用单独计为缓存命中 (utils.llm_cache.CachedChatModel)，不计入调用数
+_llm_call_count = 0
+_llm_cache_hit_count = 0
+
+
+def record_llm_call(count: int = 1):
+    global _llm_call_count
+    _llm_call_count += count
+
+
+def llm_call_count() -> int:
+    return _llm_call_count
+
+
+def record_llm_cache_hit(count: int = 1):
+    global _llm_cache_hit_count
+    _llm_cache_hit_count += count
+
+
+def llm_cache_hit_count() -> int:
+    return _llm_cache_hit_count
+
+
+class NodeProfiler:
+    """
+    LangGraph节点的计时与内存统计
+    每个节点每轮生成一条记录: 墙钟时间、CPU时间、峰值内存分配 (tracemalloc)、LLM调用次数与缓存命中数、评审条数，
+    节点在 analysis_results["timings"] 中上报的子阶段耗时，以及聚合节点上报的策略耗时与token用量
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.records: List[Dict[str, Any]] = []
+
+    def _start(self):
+        traced = 0
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+        return time.perf_counter(), time.process_time(), llm_call_count(), llm_cache_hit_count(), traced
+
+    def _finish(self, name: str, state: Dict[str, Any], result: Dict[str, Any], started):
+        wall_start, cpu_start, llm_start, cache_hit_start, traced_start = started
+        record = {
+            "round": state.get("round_number"),
+            "node": name,
+            "wall_time": time.perf_counter() - wall_start,
+            "cpu_time": time.process_time() - cpu_start,
+            # 节点执行期间相对于开始时的峰值新增分配
+            "peak_alloc_bytes": tracemalloc.get_traced_memory()[1] - traced_start if self.trace_memory else None,
+            "llm_calls": llm_call_count() - llm_start,
+            "llm_cache_hits": llm_cache_hit_count() - cache_hit_start,
+            "reviews": len(result["reviews"]) if result and "reviews" in result else None,
+        }
+        timings = dict((result or {}).get("analysis_results", {}).get("timings", {}))
+        aggregation = (result or {}).get("aggregation_stats")
+        if aggregation:
+            timings[aggregation["strategy"]] = aggregation["latency"]
+            record["tokens"] = aggregation["prompt_tokens"] + aggregation["completion_tokens"]
+        for stage, seconds in timings.items():
+            record[f"stage_{stage}"] = seconds
+        self.records.append(record)
+        logger.debug("node %s finished in %.4fs", name, record["wall_time"])
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        """包装一个 (同步或异步) 节点函数"""
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(state):
+                started = self._start()
+                result = await fn(state)
+                self._finish(name, state, result, started)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(state):
+            started = self._start()
+            result = fn(state)
+            self._finish(name, state, result, started)
+            return result
+        return wrapper
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """按节点 (及子阶段) 汇总: 调用次数、总/平均耗时、耗时占比、峰值内存、LLM调用数与缓存命中数、token用量"""
+        totals = defaultdict(lambda: defaultdict(float))
+        for record in self.records:
+            node = totals[record["node"]]
+            node["calls"] += 1
+            node["wall_time"] += record["wall_time"]
+            node["cpu_time"] += record["cpu_time"]
+            node["llm_calls"] += record["llm_calls"]
+            node["llm_cache_hits"] += record["llm_cache_hits"]
+            node["tokens"] += record.get("tokens") or 0
+            if record["peak_alloc_bytes"] is not None:
+                node["peak_alloc_bytes"] = max(node["peak_alloc_bytes"], record["peak_alloc_bytes"])
+            for key, value in record.items():
+                if key.startswith("stage_"):
+                    totals[f"{record['node']}.{key[len('stage_'):]}"]["wall_time"] += value
+                    totals[f"{record['node']}.{key[len('stage_'):]}"]["calls"] += 1
+
+        total_wall = sum(stats["wall_time"] for name, stats in totals.items() if "." not in name) or 1.0
+        summary = {}
+        for name, stats in totals.items():
+            summary[name] = dict(stats)
+            summary[name]["mean_wall_time"] = stats["wall_time"] / stats["calls"]
+            summary[name]["share"] = stats["wall_time"] / total_wall
+        return summary
+
+    def report(self) -> str:
+        """生成可读的汇总表"""
+        lines = [f"{'node':<28}{'calls':>7}{'total_s':>11}{'mean_ms':>11}{'share':>8}{'llm':>8}{'cached':>8}{'tokens':>10}{'peak_MB':>10}"]
+        for name, stats in sorted(self.summary().items()):
+            peak = stats.get("peak_alloc_bytes")
+            lines.append(
+                f"{name:<28}{int(stats['calls']):>7}{stats['wall_time']:>11.3f}{stats['mean_wall_time'] * 1000:>11.2f}"
+                f"{stats['share']:>8.1%}{int(stats.get('llm_calls', 0)):>8}{int(stats.get('llm_cache_hits', 0)):>8}{int(stats.get('tokens', 0)):>10}"
+                f"{(peak / 2 ** 20 if peak else 0.0):>10.2f}"
+            )
+        return "\n".join(lines)
+
+    def to_jsonl(self, path: str):
+        """导出全部记录为JSON Lines"""
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
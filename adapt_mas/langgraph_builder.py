@@ -1,19 +1,67 @@
 # /adapt_mas_project/adapt_mas/langgraph_builder.py
 
-from langgraph.graph import StateGraph, END
+import logging
+import time
+
 from typing import TypedDict, List, Dict, Tuple, Any
 
+import numpy as np
+
+from .aggregation import AggregationEngine
+from .concurrency import gather_with_limit
+from .graph_analyzer import GraphAnalyzer
+from .review_planning import ReviewRequest, plan_reviews
+from .review_topology import ReviewTopology
+from .reviews import ReviewBatch
+from .verifier import DecentralizedVerifier
+
+logger = logging.getLogger(__name__)
+
+# 未指定任务上下文时使用的信任上下文
+DEFAULT_CONTEXT = "general_task"
+
 
 class AdaptMasState(TypedDict):
     """定义工作流的状态"""
     round_number: int
     task_prompt: str
+    context: str  # 本步任务的信任上下文，缺省为 DEFAULT_CONTEXT
     agents: List[Any]  # 智能体实例列表
     contributions: List[Dict]  # 智能体的贡献: [{'agent_id': id, 'content': '...'}, ...]
-    reviews: List[Tuple[int, int, float]]  # 同伴评审: [(reviewer, reviewee, score), ...]
+    reviews: ReviewBatch  # 同伴评审 (列式存储): reviewers / reviewees / scores 三个平行数组
     trust_manager: Any  # TrustManager 实例
+    graph_analyzer: Any  # 可选: 跨轮次保留的 GraphAnalyzer 实例 (增量模式需要)
+    review_topology: Any  # 可选: 跨轮次保留的 ReviewTopology 实例 (采样拓扑的随机状态需要跨轮次延续)
+    verifier: Any  # 可选: 跨轮次复用的 DecentralizedVerifier 实例
+    temporal_trust: Any  # 可选: 跨轮次保留的 TemporalTrustStore 实例 (滑动窗口CIS与变点检测)
+    executor: Any  # 可选: 多进程执行器 ShardedRoundExecutor (评审与CIS阶段按智能体ID区间分片并行)
+    history: Any  # 可选: 信任历史 HistoryWriter (逐轮记录评审、CIS与信任分)
+    analysis_scheduler: Any  # 可选: AnalysisScheduler (按间隔或廉价信号决定是否执行完整的图分析)
     analysis_results: Dict  # 存储分析结果，如合谋团伙
+    settings: Dict  # 可选: 显式传入的实验配置，缺省时读取 config 模块
     final_output: str  # 最终的聚合决策
+    aggregator: Any  # 可选: 跨轮次复用的 AggregationEngine 实例 (累计各策略的耗时与token用量)
+    aggregation_stats: Dict  # 本轮聚合的策略、耗时与token用量
+    schedule: List[Tuple[int, str, str]]  # 多轮模式: 本次调用依次执行的 (round, context, task_prompt)
+    step: int  # 多轮模式: 当前执行到 schedule 中的第几步
+
+
+def _setting(state: AdaptMasState, name: str):
+    """优先读取状态中显式传入的配置，缺省时回退到 config 模块"""
+    settings = state.get("settings")
+    if settings and name in settings:
+        return settings[name]
+    import config
+    return getattr(config, name)
+
+
+def round_prompt(round_number: int) -> str:
+    """每轮的任务提示"""
+    return f"This is round {round_number}. Please perform the task."
+
+
+def _context(state: AdaptMasState) -> str:
+    return state.get("context") or DEFAULT_CONTEXT
 
 
 # --- 定义工作流节点 ---
@@ -28,104 +76,344 @@ def contribution_node(state: AdaptMasState):
         content = agent.act(task_prompt, current_round)
         contributions.append({'agent_id': agent.id, 'content': content, 'round': current_round})
 
-    print(f"--- Round {current_round}: Contribution Node Finished ---")
+    logger.debug("Round %d: contribution node finished", current_round)
     return {"contributions": contributions}
 
 
+def _review_pairs(state: AdaptMasState) -> Tuple[np.ndarray, np.ndarray]:
+    """按评审拓扑生成本轮的 (评审者, 被评审者) 分配，缺省为全连接"""
+    agent_ids = [agent.id for agent in state["agents"]]
+    contribution_ids = [c['agent_id'] for c in state["contributions"]]
+    topology = state.get("review_topology") or ReviewTopology(
+        _setting(state, "REVIEW_TOPOLOGY"), _setting(state, "REVIEWS_PER_CONTRIBUTION"))
+    trust_scores = None
+    if topology.kind == "trust_weighted":
+        trust_scores = state["trust_manager"].get_trust_scores(agent_ids, _context(state))
+    return topology.assign(agent_ids, contribution_ids, trust_scores)
+
+
+# 队列模式下每次调用 review_matrix 的评审者数 (限制单个评分块的内存)
+_COHORT_CHUNK = 128
+
+
+def _cohort_reviews(state: AdaptMasState, reviewer_ids: np.ndarray, reviewee_ids: np.ndarray):
+    """
+    队列模式: 按评审者的类型分组，每组按块调用一次 review_matrix 计算评分块，再取出分配到的 (评审者, 被评审者) 对
+    返回 (scores, pending)，pending 为不支持批量评审的智能体 (如LLM智能体) 所在的评审下标，需逐个调用 review
+    """
+    scores = np.zeros(len(reviewer_ids), dtype=np.float32)
+    if len(reviewer_ids) == 0:
+        return scores, np.empty(0, dtype=np.int64)
+    agent_by_id = {agent.id: agent for agent in state["agents"]}
+    contributions = state["contributions"]
+    # 被评审者 agent_id -> 贡献下标
+    column_of = np.full(max(c['agent_id'] for c in contributions) + 1, -1, dtype=np.int64)
+    column_of[[c['agent_id'] for c in contributions]] = np.arange(len(contributions))
+
+    # 评审分配按评审者排序，每个评审者对应一段连续的下标
+    reviewers, starts, counts = np.unique(reviewer_ids, return_index=True, return_counts=True)
+    rows_by_class: Dict[type, List[int]] = {}
+    for row, reviewer_id in enumerate(reviewers.tolist()):
+        rows_by_class.setdefault(type(agent_by_id[reviewer_id]), []).append(row)
+
+    pending = []
+    for agent_class, rows in rows_by_class.items():
+        rows = np.asarray(rows, dtype=np.int64)
+        for chunk_start in range(0, len(rows), _COHORT_CHUNK):
+            chunk = rows[chunk_start:chunk_start + _COHORT_CHUNK]
+            # 本块评审者的全部评审下标，及其在评分块中的行号
+            ends = np.cumsum(counts[chunk])
+            local_rows = np.repeat(np.arange(len(chunk)), counts[chunk])
+            positions = np.arange(ends[-1]) + np.repeat(starts[chunk] - (ends - counts[chunk]), counts[chunk])
+            if not agent_class.supports_review_matrix():
+                pending.append(positions)
+                continue
+            # 评分块只包含本块实际评审到的贡献
+            columns, local_columns = np.unique(column_of[reviewee_ids[positions]], return_inverse=True)
+            block = agent_class.review_matrix([agent_by_id[reviewer_id] for reviewer_id in reviewers[chunk].tolist()],
+                                              [contributions[column] for column in columns.tolist()],
+                                              state["agents"])
+            scores[positions] = block[local_rows, local_columns]
+    pending = np.sort(np.concatenate(pending)) if pending else np.empty(0, dtype=np.int64)
+    return scores, pending
+
+
+def _plan_batched_reviews(state: AdaptMasState, reviewer_ids: np.ndarray, reviewee_ids: np.ndarray,
+                          pending: np.ndarray) -> Tuple[List[ReviewRequest], np.ndarray]:
+    """
+    评审规划: pending 中评审者支持批量评审 (如LLM智能体) 的评审对，按内容去重并打包为批量评审调用
+    返回 (批量评审调用, 其余仍需逐个调用 review 的评审下标)
+    """
+    if not _setting(state, "REVIEW_BATCHING") or len(pending) == 0:
+        return [], pending
+    agent_by_id = {agent.id: agent for agent in state["agents"]}
+    supported: Dict[type, bool] = {}
+    batched = np.fromiter(
+        (supported.setdefault(type(agent), type(agent).supports_review_batch())
+         for agent in (agent_by_id[reviewer] for reviewer in reviewer_ids[pending].tolist())),
+        dtype=bool,
+        count=len(pending)
+    )
+    requests = plan_reviews(state["contributions"], reviewer_ids, reviewee_ids, pending[batched],
+                            _setting(state, "REVIEW_BATCH_SIZE"))
+    if requests:
+        logger.debug("Round %d: %d reviews planned as %d batched review calls (%d unique items)",
+                     state["round_number"], int(batched.sum()), len(requests),
+                     sum(len(request.items) for request in requests))
+    return requests, pending[~batched]
+
+
+def review_scores(state: AdaptMasState, reviewer_ids: np.ndarray, reviewee_ids: np.ndarray) -> np.ndarray:
+    """
+    计算给定 (评审者, 被评审者) 对的评分 (同步): 队列模式下规则型智能体按类型批量评审，
+    LLM智能体按评审规划去重后批量评审，其余智能体逐个评审
+    """
+    agents = state["agents"]
+    agent_by_id = {agent.id: agent for agent in agents}
+    contribution_by_id = {c['agent_id']: c for c in state["contributions"]}
+    if _setting(state, "REVIEW_MODE") == "cohort":
+        scores, pending = _cohort_reviews(state, reviewer_ids, reviewee_ids)
+    else:
+        scores, pending = np.zeros(len(reviewer_ids), dtype=np.float32), np.arange(len(reviewer_ids))
+    requests, pending = _plan_batched_reviews(state, reviewer_ids, reviewee_ids, pending)
+    for request in requests:
+        request.fan_out(agent_by_id[request.reviewer].review_batch(request.items, agents), scores)
+    scores[pending] = np.fromiter(
+        (agent_by_id[reviewer].review(contribution_by_id[reviewee], agents)
+         for reviewer, reviewee in zip(reviewer_ids[pending].tolist(), reviewee_ids[pending].tolist())),
+        dtype=np.float32,
+        count=len(pending)
+    )
+    return scores
+
+
 def peer_review_node(state: AdaptMasState):
     """2. 同伴评审节点"""
-    reviews = []
-    contributions = state["contributions"]
+    # 直接生成列式评审数据，避免每轮分配 N·(N−1) 个元组
+    reviewer_ids, reviewee_ids = _review_pairs(state)
+    executor = state.get("executor")
+    if executor is not None:
+        # 多进程: 各工作进程按评审者ID区间计算评分
+        scores = executor.review(reviewer_ids, reviewee_ids, state["contributions"])
+    else:
+        scores = review_scores(state, reviewer_ids, reviewee_ids)
+    reviews = ReviewBatch(reviewer_ids, reviewee_ids, scores)
+
+    logger.debug("Round %d: peer review node finished (%d reviews)", state["round_number"], len(reviews))
+    return {"reviews": reviews}
+
+
+async def acontribution_node(state: AdaptMasState):
+    """1. 智能体贡献节点 (异步版本: 并发调用各智能体的LLM)"""
+    task_prompt = state["task_prompt"]
+    current_round = state["round_number"]
     agents = state["agents"]
-    for reviewer in agents:
-        for contribution in contributions:
-            # 智能体不评价自己
-            if reviewer.id != contribution['agent_id']:
-                score = reviewer.review(contribution, agents)
-                reviews.append((reviewer.id, contribution['agent_id'], score))
-
-    print("--- Peer Review Node Finished ---")
+    contents = await gather_with_limit(
+        [lambda agent=agent: agent.aact(task_prompt, current_round) for agent in agents],
+        limit=_setting(state, "LLM_CONCURRENCY"),
+        timeout=_setting(state, "LLM_CALL_TIMEOUT"),
+        max_retries=_setting(state, "LLM_MAX_RETRIES"),
+        backoff=_setting(state, "LLM_RETRY_BACKOFF")
+    )
+    # 结果顺序与智能体顺序一致
+    contributions = [{'agent_id': agent.id, 'content': content, 'round': current_round}
+                     for agent, content in zip(agents, contents)]
+
+    logger.debug("Round %d: contribution node finished", current_round)
+    return {"contributions": contributions}
+
+
+async def apeer_review_node(state: AdaptMasState):
+    """2. 同伴评审节点 (异步版本: 并发调用各智能体的LLM)"""
+    agents = state["agents"]
+    agent_by_id = {agent.id: agent for agent in agents}
+    contribution_by_id = {c['agent_id']: c for c in state["contributions"]}
+
+    reviewer_ids, reviewee_ids = _review_pairs(state)
+    if _setting(state, "REVIEW_MODE") == "cohort":
+        # 只有不支持批量评审的智能体 (如LLM智能体) 需要并发调用
+        scores, pending = _cohort_reviews(state, reviewer_ids, reviewee_ids)
+    else:
+        scores, pending = np.zeros(len(reviewer_ids), dtype=np.float32), np.arange(len(reviewer_ids))
+    requests, pending = _plan_batched_reviews(state, reviewer_ids, reviewee_ids, pending)
+    # 批量评审调用与逐个评审调用共用同一个并发限制
+    results = await gather_with_limit(
+        [lambda request=request: agent_by_id[request.reviewer].areview_batch(request.items, agents)
+         for request in requests] +
+        [lambda reviewer=agent_by_id[reviewer], contribution=contribution_by_id[reviewee]:
+         reviewer.areview(contribution, agents)
+         for reviewer, reviewee in zip(reviewer_ids[pending].tolist(), reviewee_ids[pending].tolist())],
+        limit=_setting(state, "LLM_CONCURRENCY"),
+        timeout=_setting(state, "LLM_CALL_TIMEOUT"),
+        max_retries=_setting(state, "LLM_MAX_RETRIES"),
+        backoff=_setting(state, "LLM_RETRY_BACKOFF")
+    )
+    for request, item_scores in zip(requests, results):
+        request.fan_out(item_scores, scores)
+    scores[pending] = results[len(requests):]
+    reviews = ReviewBatch(reviewer_ids, reviewee_ids, scores)
+
+    logger.debug("Round %d: peer review node finished (%d reviews)", state["round_number"], len(reviews))
     return {"reviews": reviews}
 
 
 def analysis_node(state: AdaptMasState):
     """3. ADAPT-MAS核心分析节点"""
-    from .graph_analyzer import GraphAnalyzer
-    from .verifier import DecentralizedVerifier
-
     reviews = state["reviews"]
     trust_manager = state["trust_manager"]
     contributions = state["contributions"]
 
-    # 初始化分析工具
-    graph_analyzer = GraphAnalyzer()
-    verifier = DecentralizedVerifier()
+    # 分析工具通常由会话创建并跨轮次传入，缺省时按配置临时创建
+    graph_analyzer = state.get("graph_analyzer") or GraphAnalyzer(
+        suspicion_threshold=_setting(state, "COMMUNITY_SUSPICION_THRESHOLD"))
+    verifier = state.get("verifier") or DecentralizedVerifier()
+    context = _context(state)
 
-    # a) 社交图谱分析
-    graph = graph_analyzer.build_graph(reviews)
-    colluding_groups = graph_analyzer.detect_collusion(graph)
+    # a) 社交图谱分析: 自适应调度时，未触发的轮次跳过图分析与团伙惩罚，只做CIS更新
+    started = time.perf_counter()
+    scheduler = state.get("analysis_scheduler")
+    trigger = "every_round"
+    if scheduler is not None:
+        trigger = scheduler.plan(state["round_number"], context, reviews, trust_manager)
+    colluding_groups = []
+    if trigger is not None:
+        graph = graph_analyzer.build_graph(reviews)
+        colluding_groups = graph_analyzer.detect_collusion(graph, reviews)
+    graph_analysis_time = time.perf_counter() - started
 
     # b) 对检测到的合谋团伙进行惩罚
     if colluding_groups:
-        from config import COLLECTIVE_PENALTY_FACTOR
-        print(f"Detected Colluding Groups: {colluding_groups}")
-        for group in colluding_groups:
-            trust_manager.penalize_group(group, "general_task", COLLECTIVE_PENALTY_FACTOR)
+        logger.info("Round %d: detected colluding groups %s", state["round_number"], colluding_groups)
+        trust_manager.penalize_groups(colluding_groups, context, _setting(state, "COLLECTIVE_PENALTY_FACTOR"))
 
     # c) 去中心化验证并更新信任
-    for contribution in contributions:
-        agent_id = contribution['agent_id']
-        # 计算CIS作为新证据
-        cis = verifier.calculate_cis(agent_id, reviews, trust_manager, "general_task")
-        # 更新信任分数
-        trust_manager.update_trust(agent_id, "general_task", cis)
-
-    print("--- Analysis Node Finished ---")
+    # 基于本轮开始时的信任快照一次性计算所有CIS作为新证据
+    started = time.perf_counter()
+    history = state.get("history")
+    if history is not None:
+        # 计算CIS所用的评审者信任 (合谋惩罚之后、本轮更新之前)
+        trust_before = trust_manager.get_trust_scores(history.agent_ids.tolist(), context)
+    executor = state.get("executor")
+    if executor is not None:
+        # 多进程: 各工作进程按被评审者ID区间计算CIS并暂存各自分片的信任更新，屏障后合并
+        cis_by_agent = executor.update_trust(reviews, context)
+    else:
+        cis_by_agent = verifier.calculate_cis_all(reviews, trust_manager, context)
+    # 批量更新信任分数；采样拓扑下未被抽中评审的贡献没有新证据，信任分保持不变
+    agent_ids = [contribution['agent_id'] for contribution in contributions
+                 if contribution['agent_id'] in cis_by_agent]
+    evidence = [cis_by_agent[agent_id] for agent_id in agent_ids]
+    if executor is None:
+        trust_manager.update_trust_many(agent_ids, context, evidence)
+
+    # d) 时序信任: 按 'cis' (收到的CIS) 与 'review' (给出的平均评分) 两个证据流检测行为突变
+    # 证据取相对本轮中位数的偏差，排除所有智能体共同的变化 (如评审者群体整体变严时受害者的CIS同时下降)
+    behavior_shifts = []
+    temporal_trust = state.get("temporal_trust")
+    if temporal_trust is not None and agent_ids:
+        cis = np.asarray(evidence, dtype=np.float64)
+        shifted = temporal_trust.record_many(agent_ids, context, cis - np.median(cis), stream="cis")
+        given_count = np.bincount(reviews.reviewers)
+        reviewer_ids = np.flatnonzero(given_count)
+        given = np.bincount(reviews.reviewers, weights=reviews.scores.astype(np.float64))[reviewer_ids] \
+            / given_count[reviewer_ids]
+        shifted += temporal_trust.record_many(reviewer_ids.tolist(), context, given - np.median(given), stream="review")
+        behavior_shifts = sorted(set(shifted))
+        if behavior_shifts:
+            logger.info("Round %d: behavior shift detected for agents %s", state["round_number"], behavior_shifts)
+            penalty = _setting(state, "TEMPORAL_SHIFT_PENALTY")
+            if penalty is not None:
+                trust_manager.penalize_group(behavior_shifts, context, penalty)
+
+    cis_time = time.perf_counter() - started
+
+    if history is not None:
+        history.append(state["round_number"], context, reviews, cis_by_agent, trust_before,
+                       trust_manager.get_trust_scores(history.agent_ids.tolist(), context))
+
+    logger.debug("Round %d: analysis node finished", state["round_number"])
     return {
         "trust_manager": trust_manager,
-        "analysis_results": {"colluding_groups": colluding_groups}
+        "analysis_results": {
+            "colluding_groups": colluding_groups,
+            "behavior_shifts": behavior_shifts,
+            # 本轮执行的分析模式 ('full' / 'cis_only')、触发原因与调度信号
+            "analysis_mode": "full" if trigger is not None else "cis_only",
+            "analysis_trigger": trigger,
+            "analysis_signals": dict(scheduler.last_signals) if scheduler is not None else {},
+            # 子阶段耗时，供 NodeProfiler 汇总
+            "timings": {"graph_analysis": graph_analysis_time, "cis_update": cis_time}
+        }
     }
 
 
 def aggregation_node(state: AdaptMasState):
-    """4. 加权聚合决策节点"""
+    """4. 加权聚合决策节点 (策略见 AggregationEngine: top1 / topk / synthesis)"""
     trust_manager = state["trust_manager"]
     contributions = state["contributions"]
+    aggregator = state.get("aggregator") or AggregationEngine(
+        _setting(state, "AGGREGATION_STRATEGY"), k=_setting(state, "AGGREGATION_TOP_K"))
+
+    trust_scores = trust_manager.get_trust_scores([c['agent_id'] for c in contributions], _context(state))
+    result = aggregator.aggregate(contributions, trust_scores, state["task_prompt"])
+    final_output = result.pop("output")
+
+    logger.debug("Round %d: final decision (%s): %s", state["round_number"], result["strategy"], final_output)
+    return {"final_output": final_output, "aggregation_stats": result}
 
-    weighted_contributions = []
-    for contrib in contributions:
-        agent_id = contrib['agent_id']
-        trust_score = trust_manager.get_trust_score(agent_id, "general_task")
-        # 只考虑信任度 > 0 的贡献
-        if trust_score > 0:
-            weighted_contributions.append((contrib['content'], trust_score))
-
-    # 按信任度排序，取最高分的贡献作为最终输出 (简化聚合逻辑)
-    if not weighted_contributions:
-        final_output = "No consensus reached due to low trust."
-    else:
-        # 在真实应用中，这里会用加权内容生成最终报告
-        sorted_contributions = sorted(weighted_contributions, key=lambda x: x[1], reverse=True)
-        final_output = sorted_contributions[0][0]
 
-    print("--- Aggregation Node Finished ---")
-    print(f"Final Decision: {final_output}\n")
-    return {"final_output": final_output}
+def next_round_node(state: AdaptMasState):
+    """5. 多轮模式: 进入 schedule 中的下一步 (同一轮的下一个任务或下一轮) 并清空中间结果"""
+    step = state["step"] + 1
+    round_number, context, task_prompt = state["schedule"][step]
+    return {
+        "step": step,
+        "round_number": round_number,
+        "context": context,
+        "task_prompt": task_prompt,
+        "contributions": [],
+        "reviews": ReviewBatch.empty(),
+        "analysis_results": {},
+        "final_output": "",
+        "aggregation_stats": {}
+    }
+
+
+def _continue_or_end(state: AdaptMasState):
+    from langgraph.graph import END
+    return "next_round" if state.get("step", 0) + 1 < len(state.get("schedule") or ()) else END
 
 
-def build_graph():
-    """构建LangGraph工作流"""
+def build_graph(use_async: bool = False, profiler=None, multi_round: bool = False):
+    """
+    构建LangGraph工作流
+    use_async: 使用并发调用LLM的异步贡献/评审节点，此时需通过 ainvoke 运行
+    profiler: 可选的 instrumentation.NodeProfiler，用于记录每个节点每轮的耗时与内存
+    multi_round: 聚合后若 schedule 中还有未执行的步骤则继续，一次调用即可运行多轮 (每轮可包含多个任务)
+    """
+    # langgraph 导入较慢，只在构建工作流时加载
+    from langgraph.graph import StateGraph, END
+
     workflow = StateGraph(AdaptMasState)
 
-    workflow.add_node("contribution", contribution_node)
-    workflow.add_node("peer_review", peer_review_node)
-    workflow.add_node("analysis", analysis_node)
-    workflow.add_node("aggregation", aggregation_node)
+    nodes = {
+        "contribution": acontribution_node if use_async else contribution_node,
+        "peer_review": apeer_review_node if use_async else peer_review_node,
+        "analysis": analysis_node,
+        "aggregation": aggregation_node,
+    }
+    for name, node in nodes.items():
+        workflow.add_node(name, profiler.wrap(name, node) if profiler is not None else node)
 
     workflow.set_entry_point("contribution")
     workflow.add_edge("contribution", "peer_review")
     workflow.add_edge("peer_review", "analysis")
     workflow.add_edge("analysis", "aggregation")
-    workflow.add_edge("aggregation", END)
+    if multi_round:
+        workflow.add_node("next_round", next_round_node)
+        workflow.add_conditional_edges("aggregation", _continue_or_end, ["next_round", END])
+        workflow.add_edge("next_round", "contribution")
+    else:
+        workflow.add_edge("aggregation", END)
 
     return workflow.compile()
\ No newline at end of file
@@ -0,0 +1,167 @@
+# /adapt_mas_project/adapt_mas/parallel.py
+
+import concurrent.futures
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from .reviews import ReviewBatch
+from .trust_manager import SharedArray, SharedTrustManager, attach_shared_array
+from .verifier import cis_by_reviewee
+
+# 工作进程内的状态: 智能体副本、agent_id -> 信任矩阵行号的查找表与已映射的共享内存
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(agents: List[Any], agent_ids: Sequence[int], settings: Dict[str, Any]):
+    agent_ids = np.asarray(agent_ids, dtype=np.int64)
+    row_of = np.full(agent_ids.max() + 1, -1, dtype=np.int64)
+    row_of[agent_ids] = np.arange(len(agent_ids))
+    _worker.update(agents=agents, settings=settings, row_of=row_of, segments={})
+
+
+def _attach(*specs) -> List[np.ndarray]:
+    """映射本次任务用到的共享数组，并释放已被创建方替换 (扩容) 的旧映射"""
+    segments = _worker["segments"]
+    names = {spec[0] for spec in specs}
+    for name in [name for name in segments if name not in names]:
+        segments.pop(name).close()
+    return [attach_shared_array(spec, segments) for spec in specs]
+
+
+def _review_shard(review_specs, contributions: List[Dict], start: int, end: int):
+    """评审阶段: 计算 [start, end) 段评审 (按评审者排序后即一个ID区间内的评审者) 的评分，写入共享的评分数组"""
+    from .langgraph_builder import review_scores
+
+    reviewers, reviewees, scores = (array[start:end] for array in _attach(*review_specs))
+    state = {"agents": _worker["agents"], "contributions": contributions, "settings": _worker["settings"]}
+    scores[:] = review_scores(state, reviewers, reviewees)
+
+
+def _cis_shard(review_specs, count: int, trust_spec, col: int, alpha: float, staging_spec, lo: int, hi: int):
+    """
+    CIS阶段: 计算被评审者ID位于 [lo, hi) 的CIS与EMA更新后的信任分，暂存到共享的 staging 数组
+    (CIS与 DecentralizedVerifier.calculate_cis_all 共用 cis_by_reviewee，
+    EMA更新与 ArrayTrustManager.update_trust_many 相同)
+    评审者信任直接从共享的信任矩阵读取；此阶段所有进程只读信任矩阵，更新在屏障后由主进程合并
+    """
+    reviewers, reviewees, scores, trust, staging = _attach(*review_specs, trust_spec, staging_spec)
+    reviewers, reviewees, scores = reviewers[:count], reviewees[:count], scores[:count]
+    selected = (reviewees >= lo) & (reviewees < hi)
+    if not selected.any():
+        return
+    row_of = _worker["row_of"]
+    cis, reviewed, _ = cis_by_reviewee(trust[row_of[reviewers[selected]], col], reviewees[selected] - lo,
+                                       scores[selected])
+    contribution_ids = np.flatnonzero(reviewed)
+    cis = cis[contribution_ids]
+
+    rows = row_of[contribution_ids + lo]
+    staging[0, rows] = cis
+    staging[1, rows] = (1 - alpha) * trust[rows, col] + alpha * np.clip(cis, -1.0, 1.0)
+    staging[2, rows] = 1.0
+
+
+class ShardedRoundExecutor:
+    """
+    多进程执行一轮中的评审与CIS阶段，智能体按ID区间分成 workers 个分片，每个工作进程负责一个区间
+    - 评审: 评审分配与评分位于共享内存，各进程计算其区间内评审者的评分
+    - CIS: 各进程零拷贝读取共享信任矩阵 (SharedTrustManager) 中的评审者信任，计算其区间内被评审者的CIS
+      与更新后的信任分并暂存；所有分片完成 (屏障) 后由主进程按行写回，合并结果与分片数无关
+    工作进程在首次使用时启动 (此时复制智能体)，智能体需可被pickle (规则型智能体)
+    """
+
+    def __init__(self, agents: List[Any], trust_manager: SharedTrustManager, workers: int,
+                 settings: Dict[str, Any] = None):
+        self.agents = agents
+        self.trust_manager = trust_manager
+        self.settings = settings or {}
+        agent_ids = np.sort(np.asarray([agent.id for agent in agents], dtype=np.int64))
+        # 按ID区间分片: [(lo, hi), ...]
+        self.bounds = [(int(shard[0]), int(shard[-1]) + 1)
+                       for shard in np.array_split(agent_ids, max(1, workers)) if len(shard)]
+        self._pool = None
+        self._reviews: List[SharedArray] = []
+        # 每个智能体一列: CIS、更新后的信任分、本轮是否有更新
+        self._staging = SharedArray((3, len(agents)), np.float64)
+
+    def _executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=len(self.bounds),
+                initializer=_init_worker,
+                initargs=(self.agents, self.trust_manager.agent_ids.tolist(), self.settings)
+            )
+        return self._pool
+
+    def _run_shards(self, fn, *args, ranges=None):
+        """对每个分片提交一个任务 (末尾参数为该分片的区间，缺省为ID区间) 并等待全部完成 (屏障)"""
+        futures = [self._executor().submit(fn, *args, lo, hi) for lo, hi in (ranges or self.bounds)]
+        for future in futures:
+            future.result()
+
+    def _write_reviews(self, reviewer_ids: np.ndarray, reviewee_ids: np.ndarray, scores: np.ndarray = None):
+        """将评审写入共享缓冲区 (容量不足时倍增)，返回各数组的 spec"""
+        count = len(reviewer_ids)
+        if not self._reviews or len(self._reviews[0].array) < count:
+            capacity = max(count, 2 * len(self._reviews[0].array) if self._reviews else 1024)
+            for shared in self._reviews:
+                shared.close()
+            self._reviews = [SharedArray(capacity, np.int32), SharedArray(capacity, np.int32),
+                             SharedArray(capacity, np.float32)]
+        reviewers, reviewees, shared_scores = (shared.array for shared in self._reviews)
+        reviewers[:count] = reviewer_ids
+        reviewees[:count] = reviewee_ids
+        if scores is not None:
+            shared_scores[:count] = scores
+        return [shared.spec for shared in self._reviews]
+
+    def review(self, reviewer_ids: np.ndarray, reviewee_ids: np.ndarray, contributions: List[Dict]) -> np.ndarray:
+        """并行计算各 (评审者, 被评审者) 对的评分"""
+        count = len(reviewer_ids)
+        if count == 0:
+            return np.empty(0, dtype=np.float32)
+        # 评审拓扑按评审者排序生成评审分配，此时每个ID区间对应一段连续的评审；否则先稳定排序
+        order = None
+        if np.any(reviewer_ids[1:] < reviewer_ids[:-1]):
+            order = np.argsort(reviewer_ids, kind="stable")
+            reviewer_ids, reviewee_ids = reviewer_ids[order], reviewee_ids[order]
+        cuts = np.searchsorted(reviewer_ids, [lo for lo, _ in self.bounds[1:]]).tolist()
+        specs = self._write_reviews(reviewer_ids, reviewee_ids)
+        self._run_shards(_review_shard, specs, contributions, ranges=list(zip([0] + cuts, cuts + [count])))
+
+        scores = self._reviews[2].array[:count].copy()
+        if order is not None:
+            restored = np.empty_like(scores)
+            restored[order] = scores
+            scores = restored
+        return scores
+
+    def update_trust(self, reviews: ReviewBatch, context: str) -> Dict[int, float]:
+        """
+        并行计算本轮所有贡献的CIS并更新信任分 (与 calculate_cis_all + update_trust_many 结果一致)
+        返回 {agent_id: cis}，只包含收到过评价的智能体
+        """
+        count = len(reviews)
+        if count == 0:
+            return {}
+        trust_manager = self.trust_manager
+        col = trust_manager._column(context)
+        specs = self._write_reviews(reviews.reviewers, reviews.reviewees, reviews.scores)
+        staging = self._staging.array
+        staging[2] = 0.0
+        self._run_shards(_cis_shard, specs, count, trust_manager.spec, col, trust_manager.alpha, self._staging.spec)
+
+        # 屏障之后合并: 各分片写入的行互不重叠
+        rows = np.flatnonzero(staging[2])
+        trust_manager.scores[rows, col] = staging[1, rows]
+        return dict(zip(trust_manager.agent_ids[rows].tolist(), staging[0, rows].tolist()))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for shared in self._reviews:
+            shared.close()
+        self._reviews = []
+        self._staging.close()
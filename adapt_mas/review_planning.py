@@ -0,0 +1,91 @@
+# /adapt_mas_project/adapt_mas/review_planning.py
+
+import hashlib
+import re
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+class ReviewRequest:
+    """
+    一次批量评审调用: 评审者 reviewer 对 items (去重后的贡献) 评分
+    positions 为本次调用覆盖的评审下标，item_index[i] 为 positions[i] 对应的条目下标 (用于把评分扇出回每个评审对)
+    """
+    __slots__ = ("reviewer", "items", "positions", "item_index")
+
+    def __init__(self, reviewer: int, items: List[Dict[str, Any]], positions: np.ndarray, item_index: np.ndarray):
+        self.reviewer = reviewer
+        self.items = items
+        self.positions = positions
+        self.item_index = item_index
+
+    def fan_out(self, item_scores, scores: np.ndarray):
+        """将本次调用返回的条目评分写回各评审对的评分"""
+        scores[self.positions] = np.asarray(item_scores, dtype=np.float32)[self.item_index]
+
+    def __repr__(self) -> str:
+        return f"ReviewRequest(reviewer={self.reviewer}, items={len(self.items)}, reviews={len(self.positions)})"
+
+
+def content_key(content: str) -> str:
+    """
+    贡献内容的哈希键: 只折叠完全相同的内容 (仅忽略首尾空白与连续空白的差异)
+    大小写、标点或措辞不同的近似重复不合并，仍各自评审一次: 合并它们会让评审者对未见过的文本给出评分，
+    批量评审就不再与逐条评审等价 (改写后的卧底/伪装内容因此不会被去重)
+    """
+    return hashlib.sha1(re.sub(r"\s+", " ", content).strip().encode("utf-8")).hexdigest()
+
+
+def plan_reviews(contributions: List[Dict[str, Any]], reviewer_ids: np.ndarray, reviewee_ids: np.ndarray,
+                 positions: np.ndarray, batch_size: int = None) -> List[ReviewRequest]:
+    """
+    评审规划: 为 positions 下标处的 (评审者, 被评审者) 对生成批量评审调用
+    每个评审者分配到的贡献按内容去重 (同一内容只评审一次，条目按首次出现的顺序排列；只合并完全相同的内容，见 content_key)，
+    再按 batch_size 打包 (None 表示每个评审者一次调用)
+    """
+    # 被评审者 agent_id -> 内容键的编号，每条贡献只哈希一次
+    key_ids: Dict[str, int] = {}
+    key_of_agent: Dict[int, int] = {}
+    representative: List[Dict[str, Any]] = []
+    for contribution in contributions:
+        key = content_key(contribution['content'])
+        if key not in key_ids:
+            key_ids[key] = len(key_ids)
+            representative.append(contribution)
+        key_of_agent[contribution['agent_id']] = key_ids[key]
+
+    positions = np.asarray(positions, dtype=np.int64)
+    if len(positions) == 0:
+        return []
+    order = positions[np.argsort(reviewer_ids[positions], kind="stable")]
+    reviewers, starts = np.unique(reviewer_ids[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+
+    requests = []
+    for reviewer, start, end in zip(reviewers.tolist(), starts.tolist(), ends.tolist()):
+        group = order[start:end]
+        authors = reviewee_ids[group]
+        keys = np.fromiter((key_of_agent[author] for author in authors.tolist()), dtype=np.int64, count=len(group))
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        # 条目按首次出现的顺序编号
+        rank = np.empty(len(unique_keys), dtype=np.int64)
+        rank[np.argsort(first, kind="stable")] = np.arange(len(unique_keys))
+        item_index = rank[inverse.reshape(-1)]
+        key_of_item = np.empty(len(unique_keys), dtype=np.int64)
+        key_of_item[rank] = unique_keys
+        # 每个条目的作者: 按条目下标排序后切分
+        authors_by_item = np.split(authors[np.argsort(item_index, kind="stable")],
+                                   np.cumsum(np.bincount(item_index, minlength=len(unique_keys)))[:-1])
+        items = []
+        for key, item_authors in zip(key_of_item.tolist(), authors_by_item):
+            contribution = representative[key]
+            items.append({'agent_ids': sorted(item_authors.tolist()), 'content': contribution['content'],
+                          'round': contribution.get('round')})
+
+        size = batch_size or len(items)
+        for batch_start in range(0, len(items), size):
+            selected = (item_index >= batch_start) & (item_index < batch_start + size)
+            requests.append(ReviewRequest(reviewer, items[batch_start:batch_start + size], group[selected],
+                                          item_index[selected] - batch_start))
+    return requests
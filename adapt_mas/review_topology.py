@@ -0,0 +1,117 @@
+# /adapt_mas_project/adapt_mas/review_topology.py
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class ReviewTopology:
+    """
+    同伴评审拓扑: 决定每轮由哪些智能体评审哪些贡献
+    'all': 全连接 (每个智能体评审除自己以外的全部贡献)，N·(N−1) 条评审
+    'k_random': 每个贡献随机抽取 k 个评审者
+    'trust_weighted': 每个贡献按评审者信任分 (下限 trust_floor) 加权抽取 k 个评审者
+    'expander': 固定的 k-正则扩展图 (随机排列上的循环图)，首次调用时生成并跨轮次保持不变
+    采样使用 seed 初始化的独立随机数生成器，同一 seed 下的评审分配序列可复现
+    """
+
+    KINDS = ("all", "k_random", "trust_weighted", "expander")
+
+    def __init__(self, kind: str = "all", k: int = 3, seed: int = None, trust_floor: float = 0.01):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown review topology: {kind}")
+        self.kind = kind
+        self.k = k
+        self.trust_floor = trust_floor
+        self.rng = np.random.default_rng(seed)
+        self._expander: Optional[Tuple[Tuple[int, ...], Dict[int, np.ndarray]]] = None
+
+    @property
+    def is_dense(self) -> bool:
+        return self.kind == "all"
+
+    def state_dict(self) -> Dict:
+        """随机数生成器状态与已生成的扩展图 (用于检查点)"""
+        return {"rng": self.rng.bit_generator.state, "expander": self._expander}
+
+    def load_state_dict(self, state: Dict):
+        self.rng.bit_generator.state = state["rng"]
+        self._expander = state["expander"]
+
+    def assign(self, reviewer_ids: Sequence[int], reviewee_ids: Sequence[int],
+               trust_scores: Sequence[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        生成本轮的评审分配，智能体不评审自己
+        reviewer_ids: 可参与评审的智能体；reviewee_ids: 本轮提交贡献的智能体
+        trust_scores: 与 reviewer_ids 对齐的信任分 ('trust_weighted' 需要)
+        返回按 (评审者, 被评审者在 reviewee_ids 中的顺序) 排序的两个平行 int32 数组
+        """
+        reviewers = np.asarray(reviewer_ids, dtype=np.int32)
+        reviewees = np.asarray(reviewee_ids, dtype=np.int32)
+        if self.kind == "all":
+            pair_reviewers = np.repeat(reviewers, len(reviewees))
+            pair_reviewees = np.tile(reviewees, len(reviewers))
+            keep = pair_reviewers != pair_reviewees
+            return pair_reviewers[keep], pair_reviewees[keep]
+
+        if self.kind == "expander":
+            columns = self._expander_columns(reviewers, reviewees)
+        else:
+            weights = None
+            if self.kind == "trust_weighted":
+                if trust_scores is None:
+                    raise ValueError("trust_weighted topology requires trust_scores")
+                weights = np.maximum(self.trust_floor, np.asarray(trust_scores, dtype=np.float64))
+            columns = self._sample_columns(reviewers, reviewees, weights)
+
+        # columns[j] 为评审第 j 个贡献的评审者下标 (指向 reviewers)
+        reviewer_index = np.concatenate(columns) if columns else np.empty(0, dtype=np.int64)
+        reviewee_index = np.repeat(np.arange(len(reviewees)), [len(column) for column in columns])
+        order = np.lexsort((reviewee_index, reviewer_index))
+        return reviewers[reviewer_index[order]], reviewees[reviewee_index[order]]
+
+    def _sample_columns(self, reviewers: np.ndarray, reviewees: np.ndarray, weights: np.ndarray = None):
+        """为每个贡献不放回地抽取 k 个评审者 (排除贡献者本人)"""
+        position = {agent_id: index for index, agent_id in enumerate(reviewers.tolist())}
+        num_reviewers = len(reviewers)
+        columns = []
+        for reviewee in reviewees.tolist():
+            own = position.get(reviewee)
+            pool = num_reviewers - (own is not None)
+            size = min(self.k, pool)
+            if size <= 0:
+                columns.append(np.empty(0, dtype=np.int64))
+                continue
+            p = None
+            if weights is not None:
+                p = weights if own is None else np.delete(weights, own)
+                p = p / p.sum()
+            chosen = self.rng.choice(pool, size=size, replace=False, p=p)
+            if own is not None:
+                # 跳过贡献者本人所在的位置
+                chosen = chosen + (chosen >= own)
+            columns.append(np.sort(chosen))
+        return columns
+
+    def _expander_columns(self, reviewers: np.ndarray, reviewees: np.ndarray):
+        """
+        扩展图分配: 将评审者随机排列成环，位于位置 p 的智能体由位置 p + s (mod N) 的智能体评审，
+        s 取自 k 个互不相同的非零位移。随机位移的循环图以高概率是良好的扩展图，每个智能体恰好评审 k 个贡献
+        智能体集合变化时重新生成
+        """
+        key = tuple(reviewers.tolist())
+        if self._expander is None or self._expander[0] != key:
+            num_reviewers = len(reviewers)
+            permutation = self.rng.permutation(num_reviewers)
+            size = min(self.k, max(num_reviewers - 1, 0))
+            shifts = self.rng.choice(np.arange(1, num_reviewers), size=size, replace=False) if size else np.empty(0, dtype=np.int64)
+            ring_position = np.empty(num_reviewers, dtype=np.int64)
+            ring_position[permutation] = np.arange(num_reviewers)
+            assignment = {
+                agent_id: np.sort(permutation[(ring_position[index] + shifts) % num_reviewers])
+                for index, agent_id in enumerate(key)
+            }
+            self._expander = (key, assignment)
+        assignment = self._expander[1]
+        # 不在评审者集合中的贡献者没有固定的评审者
+        return [assignment.get(reviewee, np.empty(0, dtype=np.int64)) for reviewee in reviewees.tolist()]
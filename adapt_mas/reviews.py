@@ -0,0 +1,70 @@
+# /adapt_mas_project/adapt_mas/reviews.py
+
+from typing import Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+
+class ReviewBatch:
+    """
+    列式存储的一轮同伴评审
+    三个平行数组: reviewers (int32), reviewees (int32), scores (float32)
+    第 i 条评审即 (reviewers[i], reviewees[i], scores[i])
+    """
+    __slots__ = ("reviewers", "reviewees", "scores")
+
+    def __init__(self, reviewers, reviewees, scores):
+        self.reviewers = np.asarray(reviewers, dtype=np.int32)
+        self.reviewees = np.asarray(reviewees, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        if not (len(self.reviewers) == len(self.reviewees) == len(self.scores)):
+            raise ValueError("reviewers, reviewees and scores must have the same length")
+
+    @classmethod
+    def empty(cls) -> "ReviewBatch":
+        return cls(np.empty(0, np.int32), np.empty(0, np.int32), np.empty(0, np.float32))
+
+    @classmethod
+    def from_tuples(cls, reviews: Iterable[Tuple[int, int, float]]) -> "ReviewBatch":
+        """兼容旧格式: [(reviewer, reviewee, score), ...]"""
+        reviews = list(reviews)
+        if not reviews:
+            return cls.empty()
+        reviewers, reviewees, scores = zip(*reviews)
+        return cls(reviewers, reviewees, scores)
+
+    def to_tuples(self) -> List[Tuple[int, int, float]]:
+        """转换回旧格式的元组列表"""
+        return list(zip(self.reviewers.tolist(), self.reviewees.tolist(), self.scores.tolist()))
+
+    def to_csr(self, num_agents: int = None):
+        """
+        转换为 scipy.sparse CSR 矩阵，行为评审者、列为被评审者
+        num_agents 缺省时取最大 agent_id + 1
+        """
+        from scipy.sparse import csr_matrix
+
+        if num_agents is None:
+            num_agents = int(max(self.reviewers.max(initial=-1), self.reviewees.max(initial=-1))) + 1
+        return csr_matrix((self.scores, (self.reviewers, self.reviewees)), shape=(num_agents, num_agents))
+
+    @property
+    def nbytes(self) -> int:
+        return self.reviewers.nbytes + self.reviewees.nbytes + self.scores.nbytes
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, float]]:
+        # 逐条迭代时退化为旧的元组形式，便于旧代码直接遍历
+        return iter(self.to_tuples())
+
+    def __repr__(self) -> str:
+        return f"ReviewBatch(n={len(self)})"
+
+
+def as_review_batch(reviews: Union[ReviewBatch, Iterable[Tuple[int, int, float]]]) -> ReviewBatch:
+    """将评审统一为 ReviewBatch (旧的元组列表会被转换)"""
+    if isinstance(reviews, ReviewBatch):
+        return reviews
+    return ReviewBatch.from_tuples(reviews)
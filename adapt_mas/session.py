@@ -0,0 +1,250 @@
+# /adapt_mas_project/adapt_mas/session.py
+
+import asyncio
+import random
+from typing import Any, Callable, Dict, List, Tuple
+
+from .aggregation import AggregationEngine
+from .analysis_scheduler import AnalysisScheduler
+from .graph_analyzer import GraphAnalyzer
+from .langgraph_builder import DEFAULT_CONTEXT, AdaptMasState, build_graph, round_prompt
+from .review_topology import ReviewTopology
+from .reviews import ReviewBatch
+from .temporal_trust import TemporalTrustStore
+from .trust_manager import create_trust_manager
+from .verifier import DecentralizedVerifier
+
+# 每个任务在工作流中经过的节点数 (contribution, peer_review, analysis, aggregation, next_round)
+_STEPS_PER_TASK = 5
+
+# 任务采样器: (round_number, rng) -> 本轮依次执行的 [(context, task_prompt), ...]
+# 随机数生成器由会话持有，以便检查点保存其状态
+TaskSampler = Callable[[int, random.Random], List[Tuple[str, str]]]
+
+
+def default_task_sampler(round_number: int, rng: random.Random) -> List[Tuple[str, str]]:
+    """每轮只执行一个任务，所有轮次共享同一个信任上下文"""
+    return [(DEFAULT_CONTEXT, round_prompt(round_number))]
+
+
+class AdaptMasSession:
+    """
+    长生命周期的ADAPT-MAS会话
+    信任模型、图分析器、验证器与编译后的工作流只构建一次并跨轮次保留，配置通过 settings 显式注入
+    task_sampler 决定每轮执行哪些任务，每个任务的信任在其自身的上下文中更新
+    rng: 任务采样使用的随机数生成器，缺省时由 seed 创建
+    aggregator: 聚合引擎，缺省时按 AGGREGATION_STRATEGY 创建 ('synthesis' 需由调用方传入带裁判模型的引擎)
+    history: 可选的 HistoryWriter，分析节点每个任务追加一条记录 (由调用方创建与关闭)
+    """
+
+    def __init__(self, agents: List[Any], settings: Dict[str, Any], seed: int = None, profiler=None,
+                 task_sampler: TaskSampler = None, rng: random.Random = None, aggregator: AggregationEngine = None,
+                 history=None):
+        self.agents = agents
+        self.settings = settings
+        self.seed = seed
+        self.profiler = profiler
+        self.task_sampler = task_sampler or default_task_sampler
+        self.rng = rng or random.Random(seed)
+        self._rng_states: Dict[int, Any] = {}  # 本次调用中每轮任务采样前的随机数状态
+        self._loop = None
+        parallel = (settings["PARALLEL_WORKERS"] or 1) > 1
+        if parallel and (settings["ASYNC_NODES"] or settings["AGENT_BACKEND"] != 'stub'):
+            raise ValueError("PARALLEL_WORKERS requires AGENT_BACKEND='stub' and ASYNC_NODES=False")
+        self.trust_manager = create_trust_manager(
+            agent_ids=[agent.id for agent in agents],
+            learning_rate=settings["TRUST_LEARNING_RATE"],
+            # 多进程执行时信任矩阵需位于共享内存
+            backend="shared" if parallel else settings["TRUST_BACKEND"],
+            related_contexts=settings["CONTEXT_PRIORS"]
+        )
+        self.executor = None
+        if parallel:
+            from .parallel import ShardedRoundExecutor
+            self.executor = ShardedRoundExecutor(agents, self.trust_manager, settings["PARALLEL_WORKERS"], settings)
+        self.review_topology = ReviewTopology(
+            kind=settings["REVIEW_TOPOLOGY"],
+            k=settings["REVIEWS_PER_CONTRIBUTION"],
+            seed=seed
+        )
+        self.graph_analyzer = GraphAnalyzer(
+            suspicion_threshold=settings["COMMUNITY_SUSPICION_THRESHOLD"],
+            incremental=settings["GRAPH_INCREMENTAL"],
+            decay=settings["GRAPH_DECAY"],
+            repartition_delta=settings["GRAPH_REPARTITION_DELTA"],
+            random_state=seed,
+            sparse_reviews=not self.review_topology.is_dense
+        )
+        self.verifier = DecentralizedVerifier()
+        self.temporal_trust = None
+        if settings["TEMPORAL_WINDOW"]:
+            self.temporal_trust = TemporalTrustStore(
+                agent_ids=[agent.id for agent in agents],
+                window=settings["TEMPORAL_WINDOW"],
+                drift=settings["TEMPORAL_CUSUM_DRIFT"],
+                threshold=settings["TEMPORAL_CUSUM_THRESHOLD"]
+            )
+        self.analysis_scheduler = None
+        thresholds = [settings["ANALYSIS_TRIGGER_SCORE_VARIANCE"], settings["ANALYSIS_TRIGGER_TRUST_DRIFT"],
+                      settings["ANALYSIS_TRIGGER_NEGATIVE_REVIEWS"]]
+        if settings["ANALYSIS_INTERVAL"] or any(threshold is not None for threshold in thresholds):
+            self.analysis_scheduler = AnalysisScheduler([agent.id for agent in agents], settings["ANALYSIS_INTERVAL"],
+                                                        *thresholds)
+        self.aggregator = aggregator or AggregationEngine(
+            strategy=settings["AGGREGATION_STRATEGY"],
+            k=settings["AGGREGATION_TOP_K"]
+        )
+        self.history = history
+        self.app = build_graph(use_async=settings["ASYNC_NODES"], profiler=profiler, multi_round=True)
+        self.round_number = 0  # 已完成的轮数
+
+    def _schedule(self, first_round: int, last_round: int) -> List[Tuple[int, str, str]]:
+        """
+        展开 [first_round, last_round] 内每轮的任务为 (round, context, task_prompt) 序列
+        同时记录每轮采样前的随机数状态，使轮次中途的检查点可以从该轮之后准确续跑
+        """
+        schedule = []
+        self._rng_states = {}
+        for round_number in range(first_round, last_round + 1):
+            self._rng_states[round_number] = self.rng.getstate()
+            schedule.extend((round_number, context, task_prompt)
+                            for context, task_prompt in self.task_sampler(round_number, self.rng))
+        self._rng_states[last_round + 1] = self.rng.getstate()
+        return schedule
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        会话在最近一个完成轮次结束时的状态 (用于检查点): 信任分、智能体参数、随机数状态、图分析器、时序信任与分析调度状态
+        只应在某轮的最后一个任务结束后调用 (on_round_end 中 result["round_complete"] 为真)
+        """
+        return {
+            "round_number": self.round_number,
+            "seed": self.seed,
+            "rng": self._rng_states.get(self.round_number + 1, self.rng.getstate()),
+            "trust_manager": self.trust_manager.state_dict(),
+            "agent_params": {agent.id: dict(agent.params) for agent in self.agents},
+            "agent_types": {agent.id: type(agent).__name__ for agent in self.agents},
+            "review_topology": self.review_topology.state_dict(),
+            "graph_analyzer": self.graph_analyzer.state_dict(),
+            "temporal_trust": self.temporal_trust.state_dict() if self.temporal_trust is not None else None,
+            "analysis_scheduler": self.analysis_scheduler.state_dict() if self.analysis_scheduler is not None else None,
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """
+        从检查点恢复，之后的 run_rounds 从 state["round_number"] + 1 轮继续
+        智能体需与保存时一致 (由检查点中的 seed 重建)，否则抛出 ValueError
+        """
+        agent_types = state.get("agent_types")
+        if agent_types is not None and agent_types != {agent.id: type(agent).__name__ for agent in self.agents}:
+            raise ValueError("Checkpoint was saved for a different agent setup (create the session with its seed)")
+        self.round_number = state["round_number"]
+        self.rng.setstate(state["rng"])
+        self.trust_manager.load_state_dict(state["trust_manager"])
+        for agent in self.agents:
+            agent.params = dict(state["agent_params"][agent.id])
+        self.review_topology.load_state_dict(state["review_topology"])
+        self.graph_analyzer.load_state_dict(state["graph_analyzer"])
+        if self.temporal_trust is not None and state.get("temporal_trust") is not None:
+            self.temporal_trust.load_state_dict(state["temporal_trust"])
+        if self.analysis_scheduler is not None and state.get("analysis_scheduler") is not None:
+            self.analysis_scheduler.load_state_dict(state["analysis_scheduler"])
+
+    def _initial_state(self, schedule: List[Tuple[int, str, str]]) -> AdaptMasState:
+        round_number, context, task_prompt = schedule[0]
+        return {
+            "round_number": round_number,
+            "context": context,
+            "task_prompt": task_prompt,
+            "schedule": schedule,
+            "step": 0,
+            "agents": self.agents,
+            "trust_manager": self.trust_manager,
+            "graph_analyzer": self.graph_analyzer,
+            "review_topology": self.review_topology,
+            "verifier": self.verifier,
+            "temporal_trust": self.temporal_trust,
+            "executor": self.executor,
+            "history": self.history,
+            "analysis_scheduler": self.analysis_scheduler,
+            "aggregator": self.aggregator,
+            "settings": self.settings,
+            "contributions": [],
+            "reviews": ReviewBatch.empty(),
+            "analysis_results": {},
+            "final_output": "",
+            "aggregation_stats": {}
+        }
+
+    def run_rounds(self, num_rounds: int, on_round_end: Callable[[Dict[str, Any]], None] = None,
+                   rounds_per_invocation: int = None) -> Dict[str, Any]:
+        """
+        继续运行 num_rounds 轮
+        rounds_per_invocation: 每次工作流调用内连续运行的轮数，缺省时一次调用跑完全部轮次
+        on_round_end: 每个任务结束时以 {"round", "context", "round_complete", "analysis_results", "final_output",
+                      "aggregation_stats"} 调用，
+                      round_complete 表示该轮的全部任务均已完成 (此时可保存检查点)
+        返回最后一个任务的结果
+        """
+        batch = rounds_per_invocation or num_rounds
+        target = self.round_number + num_rounds
+        result = {}
+        while self.round_number < target:
+            first_round = self.round_number + 1
+            last_round = min(target, self.round_number + batch)
+            result = self._invoke(first_round, last_round, on_round_end)
+        return result
+
+    def run_round(self, on_round_end: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+        return self.run_rounds(1, on_round_end)
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """异步模式下所有调用共用一个事件循环，使共享的异步HTTP连接池可以跨调用复用"""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop
+
+    def close(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.close()
+        if self.executor is not None:
+            self.executor.close()
+            self.trust_manager.close()
+
+    def _invoke(self, first_round: int, last_round: int, on_round_end) -> Dict[str, Any]:
+        schedule = self._schedule(first_round, last_round)
+        state = self._initial_state(schedule)
+        run_config = {"recursion_limit": _STEPS_PER_TASK * len(schedule) + _STEPS_PER_TASK}
+        progress = {"step": 0, "analysis_results": {}, "result": {}}
+
+        def handle(update: Dict[str, Any]):
+            # stream_mode="updates" 每一步产出 {节点名: 节点返回值}
+            for node, values in update.items():
+                if node == "analysis":
+                    progress["analysis_results"] = values["analysis_results"]
+                elif node == "aggregation":
+                    round_number, context, _ = schedule[progress["step"]]
+                    is_last = progress["step"] + 1 == len(schedule)
+                    result = {
+                        "round": round_number,
+                        "context": context,
+                        "round_complete": is_last or schedule[progress["step"] + 1][0] != round_number,
+                        "analysis_results": progress["analysis_results"],
+                        "final_output": values["final_output"],
+                        "aggregation_stats": values["aggregation_stats"]
+                    }
+                    self.round_number = round_number
+                    progress["step"] += 1
+                    progress["result"] = result
+                    if on_round_end is not None:
+                        on_round_end(result)
+
+        if self.settings["ASYNC_NODES"]:
+            async def consume():
+                async for update in self.app.astream(state, run_config, stream_mode="updates"):
+                    handle(update)
+            self._event_loop().run_until_complete(consume())
+        else:
+            for update in self.app.stream(state, run_config, stream_mode="updates"):
+                handle(update)
+        return progress["result"]
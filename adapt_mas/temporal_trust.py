@@ -0,0 +1,149 @@
+# /adapt_mas_project/adapt_mas/temporal_trust.py
+
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class TemporalTrustStore:
+    """
+    滑动窗口的时序信任证据存储，用于发现行为突变 (如卧底智能体潜伏期结束后开始攻击)
+    证据按 (上下文, 证据流) 分别保存，例如 'cis' (收到的CIS) 与 'review' (给出的评分)；
+    每个证据流为每个智能体保留最近 window 个证据的环形缓冲区 (agents × window 的稠密数组，内存有界)，
+    并以 O(1) 的增量方式维护窗口内的均值/方差与双侧CUSUM变点分数:
+        z = (x - 窗口均值) / max(窗口标准差, min_std)
+        S_low  = max(0, S_low  - z - drift)   # 证据持续低于近期水平 (转坏)
+        S_high = max(0, S_high + z - drift)   # 证据持续高于近期水平 (转好)
+    S_low 超过 threshold 时报警并将分数清零；窗口内的证据少于 warmup 个时只积累统计量
+    """
+
+    def __init__(self, agent_ids: List[int], window: int = 10, drift: float = 0.5, threshold: float = 5.0,
+                 min_std: float = 0.1, warmup: int = 3):
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.window = window
+        self.drift = drift
+        self.threshold = threshold
+        self.min_std = min_std
+        self.warmup = min(max(1, warmup), window)
+        self.agent_ids = np.asarray(agent_ids, dtype=np.int64)
+        self.agent_index: Dict[int, int] = {int(agent_id): row for row, agent_id in enumerate(agent_ids)}
+        # {(context, stream): {"buffer", "count", "mean", "m2", "cusum_low", "cusum_high"}}，首次出现时分配
+        self._streams: Dict[Tuple[str, str], Dict[str, np.ndarray]] = {}
+
+    def _rows(self, agent_ids: Iterable[int]) -> np.ndarray:
+        """agent_id 列表 -> 行号数组 (未知智能体抛出 KeyError)"""
+        index = self.agent_index
+        return np.fromiter((index[int(agent_id)] for agent_id in agent_ids), dtype=np.int64)
+
+    def _stream(self, context: str, stream: str) -> Dict[str, np.ndarray]:
+        state = self._streams.get((context, stream))
+        if state is None:
+            num_agents = len(self.agent_ids)
+            state = {
+                "buffer": np.zeros((num_agents, self.window), dtype=np.float64),
+                "count": np.zeros(num_agents, dtype=np.int64),  # 累计记录的证据数 (写入位置为 count % window)
+                "mean": np.zeros(num_agents, dtype=np.float64),
+                "m2": np.zeros(num_agents, dtype=np.float64),  # 窗口内离差平方和
+                "cusum_low": np.zeros(num_agents, dtype=np.float64),
+                "cusum_high": np.zeros(num_agents, dtype=np.float64),
+            }
+            self._streams[(context, stream)] = state
+        return state
+
+    def record_many(self, agent_ids: Sequence[int], context: str, evidence_vector: Sequence[float],
+                    stream: str = "cis") -> List[int]:
+        """
+        记录本轮的证据 (agent_ids 中不应有重复的智能体)，先以更新前的窗口统计量计算CUSUM，再写入环形缓冲区
+        返回本次触发向下变点报警的智能体
+        """
+        if len(agent_ids) == 0:
+            return []
+        state = self._stream(context, stream)
+        rows = self._rows(agent_ids)
+        x = np.asarray(evidence_vector, dtype=np.float64)
+        window = self.window
+
+        count = state["count"][rows]
+        filled = np.minimum(count, window)
+        mean = state["mean"][rows]
+        m2 = state["m2"][rows]
+
+        # 1) CUSUM: 以窗口内的近期水平为参照
+        std = np.sqrt(m2 / np.maximum(filled, 1))
+        z = (x - mean) / np.maximum(std, self.min_std)
+        ready = filled >= self.warmup
+        low = np.where(ready, np.maximum(0.0, state["cusum_low"][rows] - z - self.drift), 0.0)
+        high = np.where(ready, np.maximum(0.0, state["cusum_high"][rows] + z - self.drift), 0.0)
+        alarms = low > self.threshold
+        low[alarms] = 0.0
+        state["cusum_low"][rows] = low
+        state["cusum_high"][rows] = high
+
+        # 2) 滑动窗口统计量: 窗口未满时为Welford增量，已满时用移出的旧值做滑动更新
+        position = count % window
+        old = state["buffer"][rows, position]
+        full = count >= window
+        size = np.where(full, window, filled + 1)
+        new_mean = mean + np.where(full, x - old, x - mean) / size
+        m2 = m2 + np.where(full, (x - old) * (x - new_mean + old - mean), (x - mean) * (x - new_mean))
+        state["mean"][rows] = new_mean
+        state["m2"][rows] = np.maximum(m2, 0.0)  # 抵消浮点误差
+        state["buffer"][rows, position] = x
+        state["count"][rows] = count + 1
+
+        return self.agent_ids[rows[alarms]].tolist()
+
+    def _column(self, agent_ids: Sequence[int], context: str, stream: str, name: str) -> np.ndarray:
+        rows = self._rows(agent_ids)
+        state = self._streams.get((context, stream))
+        if state is None:
+            return np.zeros(len(rows), dtype=np.float64)
+        return state[name][rows]
+
+    def counts(self, agent_ids: Sequence[int], context: str, stream: str = "cis") -> np.ndarray:
+        """窗口内的证据个数"""
+        return np.minimum(self._column(agent_ids, context, stream, "count"), self.window).astype(np.int64)
+
+    def rolling_mean(self, agent_ids: Sequence[int], context: str, stream: str = "cis") -> np.ndarray:
+        """窗口内证据的均值 (没有证据时为 NaN)"""
+        mean = self._column(agent_ids, context, stream, "mean")
+        return np.where(self.counts(agent_ids, context, stream) > 0, mean, np.nan)
+
+    def rolling_std(self, agent_ids: Sequence[int], context: str, stream: str = "cis") -> np.ndarray:
+        """窗口内证据的总体标准差 (没有证据时为 NaN)"""
+        counts = self.counts(agent_ids, context, stream)
+        m2 = self._column(agent_ids, context, stream, "m2")
+        return np.where(counts > 0, np.sqrt(m2 / np.maximum(counts, 1)), np.nan)
+
+    def shift_scores(self, agent_ids: Sequence[int], context: str, stream: str = "cis") -> np.ndarray:
+        """向下变点分数 S_low (卧底检测指数)，越大表示近期证据越明显地低于此前水平"""
+        return self._column(agent_ids, context, stream, "cusum_low")
+
+    def rise_scores(self, agent_ids: Sequence[int], context: str, stream: str = "cis") -> np.ndarray:
+        """向上变点分数 S_high"""
+        return self._column(agent_ids, context, stream, "cusum_high")
+
+    def history(self, agent_id: int, context: str, stream: str = "cis") -> np.ndarray:
+        """窗口内的证据，按时间从旧到新排列"""
+        state = self._streams.get((context, stream))
+        if state is None:
+            return np.empty(0, dtype=np.float64)
+        row = self.agent_index[agent_id]
+        count = int(state["count"][row])
+        if count <= self.window:
+            return state["buffer"][row, :count].copy()
+        return np.roll(state["buffer"][row], -(count % self.window))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for state in self._streams.values() for array in state.values())
+
+    def state_dict(self) -> Dict:
+        """可序列化的状态 (用于检查点)"""
+        return {"streams": {key: {name: array.copy() for name, array in state.items()}
+                            for key, state in self._streams.items()}}
+
+    def load_state_dict(self, state: Dict):
+        self._streams = {key: {name: np.array(array) for name, array in arrays.items()}
+                         for key, arrays in state["streams"].items()}
@@ -1,7 +1,10 @@
 # /adapt_mas_project/adapt_mas/trust_manager.py
 
+import weakref
 from collections import defaultdict
-from typing import List
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
 
 class TrustManager:
     """实现动态信任模型"""
@@ -20,9 +23,18 @@ class TrustManager:
         new_ts = (1 - self.alpha) * current_ts + self.alpha * new_evidence_clipped
         self.trust_scores[agent_id][context] = new_ts
 
+    def update_trust_many(self, agent_ids: Sequence[int], context: str, evidence_vector: Sequence[float]):
+        """批量更新信任分 (逐个调用 update_trust)"""
+        for agent_id, new_evidence in zip(agent_ids, evidence_vector):
+            self.update_trust(agent_id, context, float(new_evidence))
+
     def get_trust_score(self, agent_id: int, context: str) -> float:
         return self.trust_scores[agent_id][context]
 
+    def get_trust_scores(self, agent_ids: Sequence[int], context: str) -> np.ndarray:
+        """批量获取信任分"""
+        return np.array([self.trust_scores[agent_id][context] for agent_id in agent_ids], dtype=np.float64)
+
     def penalize_group(self, agent_ids: List[int], context: str, factor: float):
         """对一个团体进行集体性的信任惩罚"""
         for agent_id in agent_ids:
@@ -30,5 +42,384 @@ class TrustManager:
                 current_score = self.get_trust_score(agent_id, context)
                 self.trust_scores[agent_id][context] = current_score * factor
 
+    def penalize_groups(self, groups: Iterable[List[int]], context: str, factor: float):
+        """对多个团体进行集体性的信任惩罚"""
+        for group in groups:
+            self.penalize_group(group, context, factor)
+
+    def get_all_scores(self):
+        return self.trust_scores
+
+    def state_dict(self) -> Dict:
+        """可序列化的信任状态 (用于检查点)"""
+        return {"trust_scores": {agent_id: dict(scores) for agent_id, scores in self.trust_scores.items()}}
+
+    def load_state_dict(self, state: Dict):
+        for agent_id, scores in state["trust_scores"].items():
+            self.trust_scores[agent_id] = defaultdict(lambda: 0.5, scores)
+
+
+class ArrayTrustManager:
+    """
+    基于NumPy稠密矩阵的信任模型 (agents × contexts)
+    与 TrustManager 接口兼容，另提供批量的向量化更新接口
+    """
+    def __init__(self, agent_ids: List[int], learning_rate: float, initial_trust: float = 0.5,
+                 contexts: List[str] = None):
+        self.alpha = learning_rate
+        self.initial_trust = initial_trust
+        self.agent_ids = np.asarray(agent_ids, dtype=np.int64)
+        # agent_id -> 行号, context -> 列号
+        self.agent_index: Dict[int, int] = {int(agent_id): row for row, agent_id in enumerate(agent_ids)}
+        self.context_index: Dict[str, int] = {}
+        # 预留列容量，新增上下文时按倍数扩容
+        self.scores = np.full((len(agent_ids), 4), initial_trust, dtype=np.float64)
+        for context in contexts or []:
+            self._column(context)
+
+    def _column(self, context: str) -> int:
+        """获取上下文对应的列号，不存在时新建"""
+        col = self.context_index.get(context)
+        if col is None:
+            col = len(self.context_index)
+            if col >= self.scores.shape[1]:
+                grown = np.full((self.scores.shape[0], max(4, 2 * self.scores.shape[1])),
+                                self.initial_trust, dtype=np.float64)
+                grown[:, :self.scores.shape[1]] = self.scores
+                self.scores = grown
+            self.context_index[context] = col
+        return col
+
+    def _rows(self, agent_ids: Iterable[int]) -> np.ndarray:
+        """agent_id 列表 -> 行号数组 (未知智能体抛出 KeyError)"""
+        index = self.agent_index
+        return np.fromiter((index[int(agent_id)] for agent_id in agent_ids), dtype=np.int64)
+
+    def update_trust(self, agent_id: int, context: str, new_evidence: float):
+        """
+        根据公式 TSi,c,t = (1 - α) * TSi,c,t-1 + α * NewEvidencet 更新信任分
+        new_evidence 范围应在 [-1, 1]
+        """
+        row = self.agent_index[agent_id]
+        col = self._column(context)
+        new_evidence_clipped = max(-1.0, min(1.0, new_evidence))  # 确保范围
+        self.scores[row, col] = (1 - self.alpha) * self.scores[row, col] + self.alpha * new_evidence_clipped
+
+    def update_trust_many(self, agent_ids: Sequence[int], context: str, evidence_vector: Sequence[float]):
+        """
+        批量更新信任分，EMA更新与裁剪均为单次向量运算
+        agent_ids 中不应有重复的智能体
+        """
+        rows = self._rows(agent_ids)
+        col = self._column(context)
+        evidence = np.clip(np.asarray(evidence_vector, dtype=np.float64), -1.0, 1.0)
+        self.scores[rows, col] = (1 - self.alpha) * self.scores[rows, col] + self.alpha * evidence
+
+    def get_trust_score(self, agent_id: int, context: str) -> float:
+        row = self.agent_index[agent_id]
+        col = self.context_index.get(context)
+        if col is None:
+            return self.initial_trust
+        return float(self.scores[row, col])
+
+    def get_trust_scores(self, agent_ids: Sequence[int], context: str) -> np.ndarray:
+        """批量获取信任分"""
+        rows = self._rows(agent_ids)
+        col = self.context_index.get(context)
+        if col is None:
+            return np.full(len(rows), self.initial_trust, dtype=np.float64)
+        return self.scores[rows, col]
+
+    def penalize_group(self, agent_ids: List[int], context: str, factor: float):
+        """对一个团体进行集体性的信任惩罚"""
+        self.penalize_groups([agent_ids], context, factor)
+
+    def penalize_groups(self, groups: Iterable[List[int]], context: str, factor: float):
+        """
+        对多个团体进行集体性的信任惩罚
+        未登记的智能体被忽略；同时属于多个团体的智能体会被多次惩罚
+        """
+        index = self.agent_index
+        rows = [index[agent_id] for group in groups for agent_id in group if agent_id in index]
+        if not rows:
+            return
+        col = self._column(context)
+        # multiply.at 保证重复行被逐次惩罚，与逐个调用的语义一致 (scores[:, col] 为视图，原地修改)
+        np.multiply.at(self.scores[:, col], np.asarray(rows, dtype=np.int64), factor)
+
+    def state_dict(self) -> Dict:
+        """可序列化的信任状态 (用于检查点)，只保存已使用的列"""
+        return {"contexts": list(self.context_index), "scores": self.scores[:, :len(self.context_index)].copy()}
+
+    def load_state_dict(self, state: Dict):
+        self.context_index = {}
+        self.scores = np.full((len(self.agent_ids), 4), self.initial_trust, dtype=np.float64)
+        for context in state["contexts"]:
+            self._column(context)
+        self.scores[:, :len(state["contexts"])] = state["scores"]
+
     def get_all_scores(self):
-        return self.trust_scores
\ No newline at end of file
+        """返回与 TrustManager 相同结构的 {agent_id: {context: trust_score}}"""
+        all_scores = {}
+        for agent_id, row in self.agent_index.items():
+            scores = defaultdict(lambda: self.initial_trust)
+            for context, col in self.context_index.items():
+                scores[context] = float(self.scores[row, col])
+            all_scores[agent_id] = scores
+        return all_scores
+
+
+
+
+class ContextTrustManager:
+    """
+    多上下文信任模型，按页惰性分配存储
+    每个上下文有一张页表 (agent行号 // page_size -> 页号)，页只在该上下文中首次触及其中的智能体时分配，
+    内存随实际触及的 (上下文, 智能体) 组合增长；查询为 O(1) 的两次数组下标访问。
+    页内未评估过的条目记为 NaN，读取时回退到跨上下文先验:
+        prior = initial + Σ w_k * (TS_k - initial)，k 为 related_contexts[context] 中的相关上下文
+    """
+    def __init__(self, agent_ids: List[int], learning_rate: float, initial_trust: float = 0.5,
+                 related_contexts: Dict[str, Dict[str, float]] = None, page_size: int = 64):
+        self.alpha = learning_rate
+        self.initial_trust = initial_trust
+        # {context: {related_context: weight}}，权重之和应不超过 1
+        self.related_contexts = related_contexts or {}
+        self.page_size = page_size
+        self.agent_ids = np.asarray(agent_ids, dtype=np.int64)
+        self.agent_index: Dict[int, int] = {int(agent_id): row for row, agent_id in enumerate(agent_ids)}
+        self.context_index: Dict[str, int] = {}
+        self._num_page_slots = (len(agent_ids) + page_size - 1) // page_size
+        self._page_tables: List[np.ndarray] = []
+        # 所有上下文共享的页池，按需倍增
+        self._pool = np.empty((0, page_size), dtype=np.float64)
+        self._num_pages = 0
+
+    def _rows(self, agent_ids: Iterable[int]) -> np.ndarray:
+        """agent_id 列表 -> 行号数组 (未知智能体抛出 KeyError)"""
+        index = self.agent_index
+        return np.fromiter((index[int(agent_id)] for agent_id in agent_ids), dtype=np.int64)
+
+    def _context(self, context: str) -> int:
+        col = self.context_index.get(context)
+        if col is None:
+            col = len(self._page_tables)
+            self._page_tables.append(np.full(self._num_page_slots, -1, dtype=np.int32))
+            self.context_index[context] = col
+        return col
+
+    def _stored(self, rows: np.ndarray, context: str) -> np.ndarray:
+        """已存储的值，未分配或未评估的条目为 NaN"""
+        col = self.context_index.get(context)
+        values = np.full(len(rows), np.nan)
+        if col is None:
+            return values
+        pages = self._page_tables[col][rows // self.page_size]
+        allocated = pages >= 0
+        values[allocated] = self._pool[pages[allocated], rows[allocated] % self.page_size]
+        return values
+
+    def _prior(self, rows: np.ndarray, context: str) -> np.ndarray:
+        """跨上下文先验 (只看相关上下文中已存储的值，避免循环依赖)"""
+        prior = np.full(len(rows), self.initial_trust)
+        for related, weight in self.related_contexts.get(context, {}).items():
+            related_values = self._stored(rows, related)
+            known = ~np.isnan(related_values)
+            prior[known] += weight * (related_values[known] - self.initial_trust)
+        return prior
+
+    def _read(self, rows: np.ndarray, context: str) -> np.ndarray:
+        values = self._stored(rows, context)
+        missing = np.isnan(values)
+        if missing.any():
+            values[missing] = self._prior(rows[missing], context)
+        return values
+
+    def _write(self, rows: np.ndarray, context: str, values: np.ndarray):
+        """写入值，必要时为涉及的页分配存储"""
+        table = self._page_tables[self._context(context)]
+        slots = rows // self.page_size
+        new_slots = np.unique(slots[table[slots] < 0])
+        if len(new_slots):
+            needed = self._num_pages + len(new_slots)
+            if needed > len(self._pool):
+                grown = np.empty((max(needed, 2 * len(self._pool), 4), self.page_size), dtype=np.float64)
+                grown[:len(self._pool)] = self._pool
+                self._pool = grown
+            self._pool[self._num_pages:needed] = np.nan
+            table[new_slots] = np.arange(self._num_pages, needed, dtype=np.int32)
+            self._num_pages = needed
+        self._pool[table[slots], rows % self.page_size] = values
+
+    def update_trust(self, agent_id: int, context: str, new_evidence: float):
+        """
+        根据公式 TSi,c,t = (1 - α) * TSi,c,t-1 + α * NewEvidencet 更新信任分
+        new_evidence 范围应在 [-1, 1]
+        """
+        self.update_trust_many([agent_id], context, [new_evidence])
+
+    def update_trust_many(self, agent_ids: Sequence[int], context: str, evidence_vector: Sequence[float]):
+        """批量更新信任分 (agent_ids 中不应有重复的智能体)"""
+        rows = self._rows(agent_ids)
+        evidence = np.clip(np.asarray(evidence_vector, dtype=np.float64), -1.0, 1.0)
+        self._write(rows, context, (1 - self.alpha) * self._read(rows, context) + self.alpha * evidence)
+
+    def get_trust_score(self, agent_id: int, context: str) -> float:
+        row = self.agent_index[agent_id]
+        col = self.context_index.get(context)
+        if col is not None:
+            page = self._page_tables[col][row // self.page_size]
+            if page >= 0:
+                value = self._pool[page, row % self.page_size]
+                if not np.isnan(value):
+                    return float(value)
+        return float(self._prior(np.array([row]), context)[0])
+
+    def get_trust_scores(self, agent_ids: Sequence[int], context: str) -> np.ndarray:
+        """批量获取信任分"""
+        return self._read(self._rows(agent_ids), context)
+
+    def penalize_group(self, agent_ids: List[int], context: str, factor: float):
+        """对一个团体进行集体性的信任惩罚"""
+        self.penalize_groups([agent_ids], context, factor)
+
+    def penalize_groups(self, groups: Iterable[List[int]], context: str, factor: float):
+        """
+        对多个团体进行集体性的信任惩罚
+        未登记的智能体被忽略；同时属于多个团体的智能体会被多次惩罚
+        """
+        index = self.agent_index
+        rows = np.asarray([index[agent_id] for group in groups for agent_id in group if agent_id in index],
+                          dtype=np.int64)
+        if not len(rows):
+            return
+        unique_rows, counts = np.unique(rows, return_counts=True)
+        self._write(unique_rows, context, self._read(unique_rows, context) * factor ** counts)
+
+    def state_dict(self) -> Dict:
+        """可序列化的信任状态 (用于检查点)，只保存已分配的页"""
+        return {
+            "contexts": list(self.context_index),
+            "page_tables": [table.copy() for table in self._page_tables],
+            "pages": self._pool[:self._num_pages].copy(),
+        }
+
+    def load_state_dict(self, state: Dict):
+        self.context_index = {context: col for col, context in enumerate(state["contexts"])}
+        self._page_tables = [table.copy() for table in state["page_tables"]]
+        self._pool = state["pages"].copy()
+        self._num_pages = len(self._pool)
+
+    @property
+    def nbytes(self) -> int:
+        """已分配的存储字节数 (页池 + 页表)"""
+        return self._num_pages * self.page_size * 8 + sum(table.nbytes for table in self._page_tables)
+
+    def get_all_scores(self):
+        """返回与 TrustManager 相同结构的 {agent_id: {context: trust_score}} (只包含已触及的上下文)"""
+        all_scores = {agent_id: defaultdict(lambda: self.initial_trust) for agent_id in self.agent_index}
+        ids = list(self.agent_index)
+        for context in self.context_index:
+            for agent_id, score in zip(ids, self.get_trust_scores(ids, context).tolist()):
+                all_scores[agent_id][context] = score
+        return all_scores
+
+
+class SharedArray:
+    """
+    位于共享内存 (multiprocessing.shared_memory) 中的NumPy数组，由创建它的进程负责释放
+    spec 为 (name, shape, dtype) 三元组，其他进程用 attach_shared_array 以零拷贝方式映射同一块内存
+    """
+    def __init__(self, shape, dtype=np.float64):
+        from multiprocessing import shared_memory
+
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self._finalizer = weakref.finalize(self, _release_shared_memory, self.shm)
+
+    @property
+    def spec(self):
+        return self.shm.name, self.array.shape, self.array.dtype.str
+
+    def close(self):
+        self.array = None
+        self._finalizer()
+
+
+def _release_shared_memory(shm):
+    try:
+        shm.close()
+    except BufferError:
+        # 仍有外部视图引用该内存时只删除名称，映射在视图释放后回收
+        pass
+    shm.unlink()
+
+
+def attach_shared_array(spec, segments: Dict = None) -> np.ndarray:
+    """
+    按 spec 映射其他进程创建的共享数组 (零拷贝)
+    segments: 可选的 {name: SharedMemory} 缓存，同一进程多次映射同一块内存时复用
+    """
+    from multiprocessing import shared_memory
+
+    name, shape, dtype = spec
+    segments = {} if segments is None else segments
+    shm = segments.get(name)
+    if shm is None:
+        # 工作进程与创建方共用同一个 resource_tracker，重复登记不会导致提前释放
+        shm = shared_memory.SharedMemory(name=name)
+        segments[name] = shm
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+class SharedTrustManager(ArrayTrustManager):
+    """
+    信任分矩阵 (agents × contexts) 位于共享内存中的 ArrayTrustManager
+    工作进程通过 spec 零拷贝读取评审者信任 (见 parallel.ShardedRoundExecutor)；
+    扩容 (新增上下文) 时换用新的共享内存块，spec 随之改变
+    """
+    def __init__(self, agent_ids: List[int], learning_rate: float, initial_trust: float = 0.5,
+                 contexts: List[str] = None):
+        self._shared = None
+        super().__init__(agent_ids, learning_rate, initial_trust, contexts)
+
+    @property
+    def scores(self) -> np.ndarray:
+        return self._shared.array
+
+    @scores.setter
+    def scores(self, value: np.ndarray):
+        # ArrayTrustManager 在初始化、扩容与恢复检查点时整体替换矩阵，此时将其移入新的共享内存块
+        shared = SharedArray(value.shape, value.dtype)
+        shared.array[...] = value
+        if self._shared is not None:
+            self._shared.close()
+        self._shared = shared
+
+    @property
+    def spec(self):
+        return self._shared.spec
+
+    def close(self):
+        if self._shared is not None:
+            self._shared.close()
+
+
+def create_trust_manager(agent_ids: List[int], learning_rate: float, backend: str = "dict",
+                         related_contexts: Dict[str, Dict[str, float]] = None):
+    """
+    根据配置选择信任模型的存储后端: 'dict'、'array'、'context' 或 'shared' (共享内存中的 'array'，供多进程执行使用)
+    related_contexts: 跨上下文先验，仅 'context' 后端支持
+    """
+    if backend == "dict":
+        return TrustManager(agent_ids, learning_rate)
+    elif backend == "array":
+        return ArrayTrustManager(agent_ids, learning_rate)
+    elif backend == "context":
+        return ContextTrustManager(agent_ids, learning_rate, related_contexts=related_contexts)
+    elif backend == "shared":
+        return SharedTrustManager(agent_ids, learning_rate)
+    else:
+        raise ValueError(f"Unknown trust backend: {backend}")
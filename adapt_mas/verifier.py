@@ -1,8 +1,40 @@
 # /adapt_mas_project/adapt_mas/verifier.py
 
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from .reviews import ReviewBatch, as_review_batch
 from .trust_manager import TrustManager
 
+# 评审者信任的下限，避免负信任分的过度影响
+MIN_REVIEWER_TRUST = 0.01
+
+
+def reviewer_weights(reviewer_trust: np.ndarray) -> np.ndarray:
+    """评审者信任 (加下限) 作为评分的权重"""
+    return np.maximum(MIN_REVIEWER_TRUST, reviewer_trust)
+
+
+def cis_by_reviewee(reviewer_trust: np.ndarray, reviewees: np.ndarray, scores: np.ndarray,
+                    minlength: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    CIS的分组归约: 按被评审者对评分做评审者信任加权平均 (所有CIS计算路径共用，保证结果逐位一致)
+    reviewer_trust: 与每条评审对齐的评审者信任；reviewees: 被评审者的非负整数下标
+    返回按下标 0..K-1 排列的 (cis, reviewed, trust_sum)，K = max(reviewees.max() + 1, minlength)；
+    未收到评价的下标 reviewed 为 False，cis 为 0.0
+    """
+    weights = reviewer_weights(reviewer_trust)
+    # 分组归约: bincount 按输入顺序逐个累加，与逐条循环的求和顺序一致
+    weighted_score_sum = np.bincount(reviewees, weights=weights * scores.astype(np.float64), minlength=minlength)
+    trust_sum = np.bincount(reviewees, weights=weights, minlength=minlength)
+    reviewed = np.bincount(reviewees, minlength=minlength) > 0
+
+    cis = np.zeros(len(trust_sum), dtype=np.float64)
+    nonzero = reviewed & (trust_sum != 0)
+    cis[nonzero] = weighted_score_sum[nonzero] / trust_sum[nonzero]
+    return cis, reviewed, trust_sum
+
 
 class DecentralizedVerifier:
     """实现去中心化同伴验证机制，计算CIS"""
@@ -10,38 +42,49 @@ class DecentralizedVerifier:
     def calculate_cis(
             self,
             contribution_id: int,
-            reviews: List[Tuple[int, int, float]],
+            reviews: Union[ReviewBatch, List[Tuple[int, int, float]]],
             trust_manager: TrustManager,
             context: str
     ) -> float:
         """
         计算一个贡献的影响力分数 (CIS)
         contribution_id: The ID of the agent who made the contribution.
-        reviews: A list of (reviewer_id, reviewee_id, score) tuples for this round.
+        reviews: A ReviewBatch (or a list of (reviewer_id, reviewee_id, score) tuples) for this round.
         trust_manager: The trust manager instance.
         context: The current task context.
         """
-
-        weighted_score_sum = 0.0
-        trust_sum = 0.0
+        reviews = as_review_batch(reviews)
 
         # 筛选出对当前贡献的评价
-        relevant_reviews = [r for r in reviews if r[1] == contribution_id]
+        relevant = reviews.reviewees == contribution_id
 
-        if not relevant_reviews:
+        if not relevant.any():
             return 0.0  # 没有收到任何评价
 
-        for reviewer_id, _, score in relevant_reviews:
-            reviewer_trust = trust_manager.get_trust_score(reviewer_id, context)
-
-            # 给予信任分数一个下限，避免负信任分的过度影响
-            reviewer_trust = max(0.01, reviewer_trust)
+        # 与 calculate_cis_all 共用同一归约路径，保证两者结果逐位一致
+        relevant_reviews = ReviewBatch(reviews.reviewers[relevant], reviews.reviewees[relevant], reviews.scores[relevant])
+        return self.calculate_cis_all(relevant_reviews, trust_manager, context).get(contribution_id, 0.0)
 
-            weighted_score_sum += reviewer_trust * score
-            trust_sum += reviewer_trust
+    def calculate_cis_all(
+            self,
+            reviews: Union[ReviewBatch, List[Tuple[int, int, float]]],
+            trust_manager: TrustManager,
+            context: str
+    ) -> Dict[int, float]:
+        """
+        一次性计算本轮所有贡献的CIS (按被评审者分组的信任加权平均)
+        reviews: A ReviewBatch (or a list of (reviewer_id, reviewee_id, score) tuples) for this round.
+        返回 {agent_id: cis}，只包含收到过评价的智能体
+        """
+        reviews = as_review_batch(reviews)
+        if len(reviews) == 0:
+            return {}
 
-        if trust_sum == 0:
-            return 0.0
+        # 每个评审者只查询一次信任分 (agent_id 为非负整数，直接作为下标)
+        reviewer_ids = np.flatnonzero(np.bincount(reviews.reviewers))
+        trust_by_id = np.zeros(reviewer_ids[-1] + 1, dtype=np.float64)
+        trust_by_id[reviewer_ids] = trust_manager.get_trust_scores(reviewer_ids.tolist(), context)
 
-        cis = weighted_score_sum / trust_sum
-        return cis
\ No newline at end of file
+        cis, reviewed, _ = cis_by_reviewee(trust_by_id[reviews.reviewers], reviews.reviewees, reviews.scores)
+        contribution_ids = np.flatnonzero(reviewed)
+        return dict(zip(contribution_ids.tolist(), cis[contribution_ids].tolist()))
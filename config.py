@@ -1,8 +1,9 @@
 # /adapt_mas_project/config.py
 
 # --- API & Model Configuration ---
-# 请在这里填入您的DeepSeek API密钥
-DEEPSEEK_API_KEY = "YOUR_DEEPSEEK_API_KEY"
+# DeepSeek API密钥: 优先从环境变量 DEEPSEEK_API_KEY (或 .env 文件) 读取，也可在这里直接填入
+# 代码中应通过 get_api_key("DEEPSEEK_API_KEY") 读取密钥，而不是直接使用本参数
+DEEPSEEK_API_KEY = None
 
 # 为不同角色选择模型
 # 建议：裁判模型使用能力最强的，智能体模型可以稍弱以节约成本
@@ -12,6 +13,81 @@ JUDGE_MODEL = "deepseek-chat" # 在真实场景中，建议使用更强的模型
 # --- Experiment Setup ---
 NUM_AGENTS = 10  # 智能体总数
 NUM_ROUNDS = 50  # 实验总轮数
+ROUNDS_PER_INVOCATION = None  # 每次工作流调用连续运行的轮数 (None 表示一次调用跑完全部轮次)
+
+# --- Tasks ---
+# 每轮从中抽取任务 (见 experiments/tasks.py)，每个任务使用独立的信任上下文
+# 为空时每轮执行同一个通用任务，所有轮次共享上下文 'general_task'
+TASKS = []  # 例如 ['code', 'investment']
+TASKS_PER_ROUND = 1
+
+# --- Experiment Log ---
+# 'parquet': 列式压缩，便于按列/按轮读取；'arrow': Arrow IPC流，进程崩溃时已写出的轮次仍可读取
+LOG_FORMAT = 'parquet'
+LOG_FLUSH_INTERVAL = 1  # 每隔多少轮写出一个record batch
+# 信任历史: 逐轮追加写入评审矩阵、CIS与信任分向量的内存映射二进制文件 (adapt_mas.history.HistoryReader 读取)
+RECORD_HISTORY = False
+HISTORY_PATH = None  # 缺省为日志旁的 {日志文件名}.history
+
+# --- Checkpoint & Resume ---
+# 每隔多少轮保存一次检查点 (信任分、智能体参数、随机数状态、图分析器状态与日志游标)；None 表示不保存
+# 使用 `python -m experiments run --resume` 从最近的检查点继续 (parquet 日志在运行期间先写入 {日志文件名}.partial 的Arrow IPC流，进程被杀后仍可续跑)
+CHECKPOINT_INTERVAL = None
+CHECKPOINT_PATH = None  # 缺省为日志旁的 {日志文件名}.ckpt.sqlite
+CHECKPOINT_KEEP = 3  # 保留最近的检查点个数
+
+# --- Logging & Profiling ---
+LOG_LEVEL = 'INFO'  # 'DEBUG' 会输出每个节点每轮的完成信息
+PROFILE_NODES = True  # 记录每个节点每轮的墙钟/CPU时间、LLM调用数 (实际发往提供方的请求) 与缓存命中数，并在实验结束时输出汇总
+PROFILE_MEMORY = False  # 同时用 tracemalloc 记录峰值内存分配 (有明显开销)
+PROFILE_PATH = None  # 节点耗时记录的导出路径，缺省为日志旁的 {日志文件名}.profile.jsonl
+
+# --- Agent Backend ---
+# 'stub': 规则型智能体; 'llm': 忠诚智能体由聊天模型驱动 (恶意智能体仍为规则型)
+AGENT_BACKEND = 'stub'
+AGENT_LLM_CONFIG = {"type": "deepseek", "model_name": AGENT_MODEL, "temperature": 0.7}
+
+# 评审执行方式: 'cohort' (规则型智能体按类型调用 review_matrix 批量生成评分块，LLM智能体仍逐个评审)
+# 或 'instance' (每个 (评审者, 贡献) 对调用一次 review)；两者结果逐位一致
+REVIEW_MODE = 'cohort'
+# 评审规划: 支持批量评审的智能体 (LLM智能体) 把分配到的贡献按内容哈希去重 (只合并完全相同的内容，近似重复仍各自评审)，
+# 每次调用用一个JSON格式的评审提示评审至多 REVIEW_BATCH_SIZE 条 (None 表示不限)，再把评分扇出回每个评审对
+REVIEW_BATCHING = True
+REVIEW_BATCH_SIZE = 20
+
+# 单次实验的多进程执行: 评审与CIS阶段按智能体ID区间分给 PARALLEL_WORKERS 个进程，信任矩阵位于共享内存
+# (此时信任后端固定为 'shared'，结果与 'array' 后端逐位一致)；None 或 1 表示单进程。仅支持规则型智能体与同步节点
+PARALLEL_WORKERS = None
+
+# --- Async LLM Fan-out ---
+ASYNC_NODES = False  # 贡献/评审节点是否并发调用LLM
+LLM_CONCURRENCY = 8  # 同时进行的LLM调用上限
+LLM_CALL_TIMEOUT = 60.0  # 单次调用超时 (秒)
+LLM_MAX_RETRIES = 3  # 瞬时错误 (超时、连接错误、限流) 后的最大重试次数，其他错误不重试
+LLM_RETRY_BACKOFF = 1.0  # 指数退避的初始等待 (秒)
+
+# --- LLM Client Registry ---
+# 按提供方 (AGENT_LLM_CONFIG 等中的 type) 共享的限流: 令牌桶速率/容量与并发上限，None 表示不限制
+LLM_PROVIDER_LIMITS = {
+    "deepseek": {"requests_per_second": 10, "burst": 20, "max_concurrency": 16},
+    "ollama": {"requests_per_second": 4, "burst": 4, "max_concurrency": 4},
+}
+LLM_HTTP_LIMITS = {"max_connections": 32, "max_keepalive_connections": 16}  # 每个服务地址共享的连接池大小
+
+# --- LLM Response Cache ---
+LLM_CACHE_PATH = None  # 例如 "llm_cache.sqlite"; None 表示不缓存
+LLM_CACHE_REPLAY = False  # 确定性回放: 只使用缓存中的响应，未命中即报错
+LLM_CACHE_MAX_ENTRIES = 200000  # LRU淘汰的条目数上限
+LLM_CACHE_MAX_BYTES = None  # LRU淘汰的缓存响应总字节数上限 (例如 512 * 1024 ** 2)，None 表示不限
+
+# --- Aggregation ---
+# 'top1': 取信任度最高的贡献; 'topk': 拼接信任度最高的k个贡献;
+# 'synthesis': 由裁判模型基于信任加权生成综合报告 (每轮一次LLM调用)
+AGGREGATION_STRATEGY = 'top1'
+AGGREGATION_TOP_K = 3
+AGGREGATION_TOKEN_BUDGET = 2000  # synthesis: 提示中贡献内容的token预算 (去重后按信任度从高到低截断)
+AGGREGATION_STREAM = True  # synthesis: 流式读取裁判模型的输出
+AGGREGATION_LLM_CONFIG = {"type": "deepseek", "model_name": JUDGE_MODEL, "temperature": 0.0}
 
 # --- Malicious Agent Configuration ---
 # 'sleeper', 'colluding', 'camouflage', or a mix e.g., ['sleeper', 'colluding']
@@ -27,21 +103,64 @@ SLEEPER_LATENT_PERIOD = 40 # 卧底潜伏期（在第几轮后开始攻击）
 # --- ADAPT-MAS Framework Parameters ---
 # 动态信任模型学习率 (alpha)
 TRUST_LEARNING_RATE = 0.3
+# 信任分存储后端: 'dict' (逐智能体字典)、'array' (NumPy稠密矩阵，适合大规模智能体)
+# 或 'context' (按页惰性分配的多上下文存储，支持跨上下文先验)；'shared' 为共享内存中的 'array' (见 PARALLEL_WORKERS)
+TRUST_BACKEND = 'dict'
+# 跨上下文先验 (仅 'context' 后端): {上下文: {相关上下文: 权重}}，权重之和不超过1
+# 例如 {'investment': {'code': 0.3}} 表示智能体首次参与 investment 任务时，初始信任部分借鉴其 code 信任
+CONTEXT_PRIORS = {}
+
+# 同伴评审拓扑: 'all' (全连接，N·(N−1) 条评审)、'k_random' (每个贡献随机抽取k个评审者)、
+# 'trust_weighted' (按信任分加权抽取k个评审者) 或 'expander' (固定的k-正则扩展图)
+REVIEW_TOPOLOGY = 'all'
+REVIEWS_PER_CONTRIBUTION = 3  # 采样拓扑下每个贡献的评审者数 k
+
+# 时序信任: 每个智能体保留最近 TEMPORAL_WINDOW 轮的CIS (环形缓冲区)，维护滑动均值/方差与CUSUM变点分数，
+# 用于发现卧底智能体在潜伏期后的行为突变 (例如 10)；None 表示不启用 (默认，启用后日志增加时序信任列)
+TEMPORAL_WINDOW = None
+TEMPORAL_CUSUM_DRIFT = 0.5  # CUSUM的容许偏移 (以窗口标准差为单位)
+TEMPORAL_CUSUM_THRESHOLD = 5.0  # 向下变点分数超过该值时报警
+TEMPORAL_SHIFT_PENALTY = None  # 报警时对该智能体信任分的惩罚因子 (例如 0.5)，None 表示只记录不惩罚
 
 # 社交图谱分析阈值
 COMMUNITY_SUSPICION_THRESHOLD = 0.7 # 社群可疑度阈值
 COLLECTIVE_PENALTY_FACTOR = 0.8   # 对合谋团体的集体惩罚因子
+# 增量社群检测: 跨轮次保留评审图，并以上一轮的划分热启动Louvain
+GRAPH_INCREMENTAL = False
+GRAPH_DECAY = 0.0  # 历史评审的指数衰减系数 (0 表示只使用本轮评审)
+GRAPH_REPARTITION_DELTA = 0.05  # 边权累积变化低于该值时跳过重新划分
+# 自适应分析调度: CIS更新每轮执行，完整图分析 (合谋检测与团伙惩罚) 每 ANALYSIS_INTERVAL 轮执行一次，
+# 或在廉价信号相对上次完整分析的变化超过阈值时提前执行；间隔与阈值全为 None 时每轮都执行完整分析
+# 可用 `python -m experiments schedule-benchmark` 比较不同设置的检测延迟与计算开销
+ANALYSIS_INTERVAL = None
+ANALYSIS_TRIGGER_SCORE_VARIANCE = None  # 本轮评分方差的变化量
+ANALYSIS_TRIGGER_TRUST_DRIFT = None  # 信任分的最大绝对变化
+ANALYSIS_TRIGGER_NEGATIVE_REVIEWS = None  # 负面评审占比的上升量
 
 
 
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 # --- API Keys ---
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+# 密钥优先从环境变量 (或 .env 文件) 读取，见 get_api_key；.env 只在首次需要密钥时加载，不拖慢导入
 DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+_dotenv_loaded = False
+
+
+def get_api_key(name: str, required: bool = False):
+    """
+    读取API密钥: 首次调用时加载 .env (不覆盖已有的环境变量)，环境中没有时回退到本文件中的同名参数
+    都未设置时返回 None；required=True 时抛出 ValueError
+    """
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+    key = os.getenv(name) or globals().get(name)
+    if key is None and required:
+        raise ValueError(f"{name} is not set: export it, add it to .env, or set it in config.py")
+    return key
 
 
 OLLAMA_BASE_URL = "http://10.10.206.138:11434"
@@ -0,0 +1,48 @@
+# /experiments/__main__.py
+"""
+ADAPT-MAS 命令行入口: python -m experiments <command> [options]
+各子命令的模块只在被选中时才导入
+"""
+
+import importlib
+import logging
+import sys
+
+import config
+
+COMMANDS = {
+    "run": ("experiments.run_experiment", "Run a single simulation (supports --resume)."),
+    "sweep": ("experiments.sweep", "Run a parallel, resumable parameter sweep."),
+    "benchmark": ("experiments.benchmark", "Offline round-throughput benchmark."),
+    "topology-benchmark": ("experiments.topology_benchmark", "Compare peer-review topologies."),
+    "schedule-benchmark": ("experiments.schedule_benchmark", "Compare adaptive analysis schedules."),
+    "import-budget": ("experiments.import_budget", "Check import time of entry modules."),
+}
+
+
+def usage() -> str:
+    lines = ["usage: python -m experiments <command> [options]", "", "commands:"]
+    lines += [f"  {name:<20}{description}" for name, (_, description) in COMMANDS.items()]
+    lines.append("\nRun 'python -m experiments <command> --help' for command options.")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+
+    module = importlib.import_module(COMMANDS[command][0])
+    # 子命令沿用各自模块的 argparse 定义
+    sys.argv = [f"python -m experiments {command}", *rest]
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    module.main()
+
+
+if __name__ == "__main__":
+    main()
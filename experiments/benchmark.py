@@ -0,0 +1,149 @@
+# /experiments/benchmark.py
+
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+import config
+from adapt_mas.instrumentation import NodeProfiler
+from experiments.run_experiment import create_session, load_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+DEFAULT_ATTACKS = ["sleeper", "colluding", "camouflage"]
+
+
+def _peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存 (MB)"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为KB，macOS 上为字节
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def run_benchmark_cell(num_agents: int, attack_type: str, rounds: int, seed: int = 0,
+                       overrides: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    用规则型智能体离线运行 rounds 轮完整工作流，返回吞吐、各阶段平均耗时与峰值RSS
+    (由 run_benchmarks 在独立子进程中调用，保证峰值RSS互不干扰)
+    """
+    settings = load_settings({
+        **(overrides or {}),
+        "NUM_AGENTS": num_agents,
+        "NUM_ROUNDS": rounds,
+        "ATTACK_TYPE": attack_type,
+        "AGENT_BACKEND": "stub",
+        "ASYNC_NODES": False,
+    })
+    profiler = NodeProfiler()
+    session = create_session(settings, seed, profiler)
+
+    started = time.perf_counter()
+    session.run_rounds(rounds)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "num_agents": num_agents,
+        "attack_type": attack_type,
+        "rounds": rounds,
+        "seed": seed,
+        "rounds_per_sec": rounds / elapsed,
+        "stage_ms": {name: stats["mean_wall_time"] * 1000 for name, stats in sorted(profiler.summary().items())},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_benchmarks(sizes: List[int], attacks: List[str], rounds: int, seed: int = 0,
+                   overrides: Dict[str, Any] = None) -> Dict[str, Any]:
+    """依次运行所有 (规模, 攻击类型) 组合，每个组合使用一个新的子进程"""
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for num_agents in sizes:
+        for attack_type in attacks:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_benchmark_cell, num_agents, attack_type, rounds, seed, overrides).result()
+            logger.info("N=%-6d %-11s %8.3f rounds/s  peak RSS %8.1f MB",
+                        num_agents, attack_type, result["rounds_per_sec"], result["peak_rss_mb"])
+            results.append(result)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "rounds": rounds,
+            "seed": seed,
+            "overrides": overrides or {},
+        },
+        "results": results,
+    }
+
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2) -> List[str]:
+    """
+    与基线比较，返回超出容差的退化项
+    吞吐下降、阶段耗时或峰值RSS上升超过 tolerance (相对比例) 即视为退化
+    """
+    def key(result):
+        return result["num_agents"], result["attack_type"]
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        base = baseline_results.get(key(result))
+        if base is None:
+            continue
+        label = f"N={result['num_agents']} {result['attack_type']}"
+        if result["rounds_per_sec"] < base["rounds_per_sec"] * (1 - tolerance):
+            regressions.append(f"{label}: rounds/sec {base['rounds_per_sec']:.3f} -> {result['rounds_per_sec']:.3f}")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{label}: peak RSS {base['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MB")
+        for stage, ms in result["stage_ms"].items():
+            base_ms = base["stage_ms"].get(stage)
+            if base_ms is not None and ms > base_ms * (1 + tolerance):
+                regressions.append(f"{label}: {stage} {base_ms:.2f} -> {ms:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline round-throughput benchmark for ADAPT-MAS (no LLM).")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--attacks", nargs="+", default=DEFAULT_ATTACKS)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trust-backend", choices=["dict", "array", "context"], default=None)
+    parser.add_argument("--output", default="benchmark_results.json", help="where to save this run as JSON")
+    parser.add_argument("--baseline", default=None, help="JSON baseline from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.trust_backend is not None:
+        overrides["TRUST_BACKEND"] = args.trust_backend
+
+    current = run_benchmarks(args.sizes, args.attacks, args.rounds, args.seed, overrides)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    logger.info("Benchmark results saved to %s", args.output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(current, baseline, args.tolerance)
+        for regression in regressions:
+            logger.warning("Regression: %s", regression)
+        if regressions:
+            sys.exit(1)
+        logger.info("No regressions beyond %.0f%% against %s", args.tolerance * 100, args.baseline)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main()
@@ -0,0 +1,84 @@
+# /experiments/import_budget.py
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 只在真正需要时才应加载的重依赖
+HEAVY_MODULES = [
+    "langgraph", "langchain_core", "langchain_openai", "langchain_community",
+    "pandas", "networkx", "community", "pyarrow", "scipy", "matplotlib", "dotenv",
+]
+
+# 入口模块及其导入时允许加载的重依赖 (未列出的重依赖一律不允许)
+ENTRY_MODULES = {
+    "config": [],
+    "utils.llm_clients": [],
+    "adapt_mas.langgraph_builder": [],
+    "adapt_mas.session": [],
+    "experiments.run_experiment": [],
+    "experiments.sweep": [],
+    "experiments.benchmark": [],
+    "experiments.__main__": [],
+}
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = {heavy!r}
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in heavy if name in sys.modules]}}))
+"""
+
+
+def measure_import(module: str, repeats: int = 3) -> Dict:
+    """在全新的解释器进程中导入模块，返回最短导入耗时与被加载的重依赖"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+    results = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                capture_output=True, text=True, check=True, cwd=root, env=env).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return min(results, key=lambda result: result["seconds"])
+
+
+def check_import_budget(budget: float, modules: Dict[str, List[str]] = None, repeats: int = 3) -> List[str]:
+    """检查各入口模块的导入耗时与重依赖，返回违规项 (空列表表示通过)"""
+    violations = []
+    for module, allowed in (modules or ENTRY_MODULES).items():
+        result = measure_import(module, repeats)
+        unexpected = sorted(set(result["loaded"]) - set(allowed))
+        logger.info("%-30s %7.1f ms  heavy: %s", module, result["seconds"] * 1000, result["loaded"] or "-")
+        if result["seconds"] > budget:
+            violations.append(f"{module}: import took {result['seconds'] * 1000:.1f} ms (budget {budget * 1000:.0f} ms)")
+        if unexpected:
+            violations.append(f"{module}: eagerly imports {', '.join(unexpected)}")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that entry modules import quickly and without heavy dependencies.")
+    parser.add_argument("--budget", type=float, default=0.5, help="max import time per module in seconds")
+    parser.add_argument("--repeats", type=int, default=3, help="fresh interpreters per module (the fastest counts)")
+    args = parser.parse_args()
+
+    violations = check_import_budget(args.budget, repeats=args.repeats)
+    for violation in violations:
+        logger.error("Import budget violation: %s", violation)
+    if violations:
+        sys.exit(1)
+    logger.info("All entry modules within the %.0f ms import budget", args.budget * 1000)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main()
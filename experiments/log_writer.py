@@ -0,0 +1,178 @@
+# /experiments/log_writer.py
+
+import os
+from typing import Any, Dict, List, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+# 实验日志的固定schema: 每行对应 (round, context, agent)
+LOG_SCHEMA = pa.schema([
+    ("round", pa.int32()),
+    ("context", pa.string()),
+    ("agent_id", pa.int32()),
+    ("is_malicious", pa.bool_()),
+    ("malicious_type", pa.string()),
+    ("trust_score", pa.float64()),
+    ("detected_colluding", pa.bool_()),
+    # 本轮执行的分析模式: 'full' (图分析 + CIS更新) 或 'cis_only' (自适应调度跳过了图分析)
+    ("analysis_mode", pa.string()),
+    # 时序信任 (未启用 TEMPORAL_WINDOW 时为空): 窗口内CIS相对本轮中位数偏差的均值/标准差、
+    # 收到的CIS与给出的评分两个证据流的向下变点分数，以及本轮是否报警
+    ("cis_deviation_mean", pa.float64()),
+    ("cis_deviation_std", pa.float64()),
+    ("cis_shift_score", pa.float64()),
+    ("review_shift_score", pa.float64()),
+    ("shift_alarm", pa.bool_()),
+])
+
+LOG_FORMATS = ("parquet", "arrow")
+_PARQUET_MAGIC = b"PAR1"
+
+
+class StreamingLogWriter:
+    """
+    流式实验日志写入器: 按轮次缓存日志行，每 flush_interval 轮写出一个Arrow record batch
+    fmt='parquet': 每次刷新写出一个row group，文件在 close() 时才完整
+    fmt='arrow': Arrow IPC流格式，进程崩溃时已刷新的批次仍可读取
+    crash_safe=True 且 fmt='parquet' 时 (开启检查点时使用)，运行期间先写入 {path}.partial 的Arrow IPC流，
+    close() 时再转换为Parquet，进程崩溃后仍可从检查点续跑
+    """
+
+    def __init__(self, path: str, fmt: str = "parquet", flush_interval: int = 1, schema: pa.Schema = LOG_SCHEMA,
+                 keep_rows: int = None, crash_safe: bool = False):
+        """
+        keep_rows: 断点续跑时使用，保留已有日志的前 keep_rows 行 (检查点记录的日志游标) 后继续追加；
+                   None 表示新建日志
+        """
+        if fmt not in LOG_FORMATS:
+            raise ValueError(f"Unknown log format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        # 运行期间实际写入的文件: parquet 日志或 Arrow IPC流 (arrow 日志本身，或 crash_safe 的 .partial)
+        self.stream_path = path + ".partial" if fmt == "parquet" and crash_safe else path
+        self._ipc = fmt == "arrow" or self.stream_path != path
+        kept = previous_path = None
+        if keep_rows is not None:
+            kept, previous_path = self._load_kept_rows(keep_rows)
+        self.flush_interval = max(1, flush_interval)
+        self.schema = schema
+        self._rows: List[Dict[str, Any]] = []
+        self._pending_rounds = 0
+        self.rows_written = 0
+        if not self._ipc:
+            self._writer = pq.ParquetWriter(path, schema)
+        else:
+            self._sink = pa.OSFile(self.stream_path, "wb")
+            self._writer = ipc.new_stream(self._sink, schema)
+        if kept is not None:
+            if kept.num_rows:
+                self._writer.write_table(kept.cast(schema))
+                self.rows_written = kept.num_rows
+            del kept
+            os.remove(previous_path)
+
+    def _load_kept_rows(self, keep_rows: int):
+        """
+        读取上次运行的日志 (优先读取崩溃后留下的 .partial 流) 的前 keep_rows 行
+        原日志先移到 .resume 再读取 (arrow 日志以内存映射方式读取，不能原地覆盖)；读取失败时移回原处
+        """
+        source = self.stream_path if os.path.exists(self.stream_path) or \
+            os.path.exists(self.stream_path + ".resume") else self.path
+        previous_path = source + ".resume"
+        # 上次续跑在移走日志后中断时，.resume 即为原日志
+        if os.path.exists(source):
+            os.replace(source, previous_path)
+        try:
+            kept = read_log_table(previous_path).slice(0, keep_rows)
+            if kept.num_rows != keep_rows:
+                raise ValueError(f"Log {source} has {kept.num_rows} rows, checkpoint expects {keep_rows}")
+        except BaseException:
+            os.replace(previous_path, source)
+            raise
+        return kept, previous_path
+
+    def write_round(self, rows: List[Dict[str, Any]]):
+        """追加一轮的日志行，达到刷新间隔时写出"""
+        self._rows.extend(rows)
+        self._pending_rounds += 1
+        if self._pending_rounds >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        batch = pa.RecordBatch.from_pylist(self._rows, schema=self.schema)
+        self._writer.write_batch(batch)
+        if self._ipc:
+            self._sink.flush()
+        self.rows_written += batch.num_rows
+        self._rows = []
+        self._pending_rounds = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        if self._ipc:
+            self._sink.close()
+        if self.stream_path != self.path:
+            # 逐批转换为Parquet，内存占用不随日志大小增长
+            with pa.memory_map(self.stream_path) as source, pq.ParquetWriter(self.path, self.schema) as writer:
+                for batch in ipc.open_stream(source):
+                    writer.write_batch(batch)
+            os.remove(self.stream_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _read_arrow_stream(path: str) -> pa.Table:
+    """读取IPC流中所有完整的批次 (容忍因崩溃而截断的结尾)"""
+    batches = []
+    with pa.memory_map(path) as source:
+        reader = ipc.open_stream(source)
+        try:
+            for batch in reader:
+                batches.append(batch)
+        except (pa.ArrowInvalid, OSError):
+            pass
+        return pa.Table.from_batches(batches, schema=reader.schema)
+
+
+def read_log_table(path: str, columns: Sequence[str] = None, rounds: Sequence[int] = None) -> pa.Table:
+    """
+    读取实验日志为Arrow表，可只加载指定的列与轮次
+    文件格式 (parquet / arrow) 根据文件头自动识别
+    """
+    with open(path, "rb") as f:
+        is_parquet = f.read(4) == _PARQUET_MAGIC
+
+    read_columns = None
+    if columns is not None:
+        read_columns = list(columns)
+        if rounds is not None and "round" not in read_columns:
+            read_columns.append("round")
+
+    if is_parquet:
+        filters = [("round", "in", list(rounds))] if rounds is not None else None
+        table = pq.read_table(path, columns=read_columns, filters=filters)
+    else:
+        table = _read_arrow_stream(path)
+        if rounds is not None:
+            table = table.filter(pc.is_in(table["round"], value_set=pa.array(list(rounds), pa.int32())))
+        if read_columns is not None:
+            table = table.select(read_columns)
+
+    if columns is not None:
+        table = table.select(list(columns))
+    return table
+
+
+def read_log(path: str, columns: Sequence[str] = None, rounds: Sequence[int] = None):
+    """读取实验日志为 pandas.DataFrame，参数同 read_log_table"""
+    return read_log_table(path, columns, rounds).to_pandas()
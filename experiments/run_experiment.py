@@ -1,91 +1,271 @@
 # /experiments/run_experiment.py
 
+import argparse
+import logging
 import random
-import pandas as pd
-from typing import List
+from typing import Any, Dict, List
 
 # 导入配置和模块
 import config
-from adapt_mas.agent import BaseAgent, HonestAgent, SleeperAgent, ColludingAgent, CamouflageAgent
-from adapt_mas.trust_manager import TrustManager
-from adapt_mas.langgraph_builder import build_graph, AdaptMasState
+from adapt_mas.agent import BaseAgent, HonestAgent, SleeperAgent, ColludingAgent, CamouflageAgent, LLMAgent
+from adapt_mas.aggregation import AggregationEngine
+from adapt_mas.checkpoint import SessionCheckpointer
+from adapt_mas.instrumentation import NodeProfiler
+from adapt_mas.session import AdaptMasSession
+from experiments.tasks import get_task
 
+logger = logging.getLogger(__name__)
 
-def setup_agents() -> List[BaseAgent]:
-    """根据配置初始化智能体"""
+
+def load_settings(overrides: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    读取 config.py 中的全部参数 (大写名称) 作为一份独立的配置字典，再应用 overrides
+    实验代码只读取该字典，不修改 config 模块的全局变量
+    """
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    for name, value in (overrides or {}).items():
+        if name not in settings:
+            raise ValueError(f"Unknown config parameter: {name}")
+        settings[name] = value
+    return settings
+
+
+def create_llm(settings: Dict[str, Any], llm_config: Dict[str, Any], role: str):
+    """按配置创建LLM客户端 (附带响应缓存配置)"""
+    from utils.llm_clients import get_llm_client
+    return get_llm_client({
+        **llm_config,
+        "role": role,
+        "rate_limit": settings["LLM_PROVIDER_LIMITS"].get(llm_config.get("type")),
+        "http_limits": settings["LLM_HTTP_LIMITS"],
+        "cache_path": settings["LLM_CACHE_PATH"],
+        "cache_replay": settings["LLM_CACHE_REPLAY"],
+        "cache_max_entries": settings["LLM_CACHE_MAX_ENTRIES"],
+        "cache_max_bytes": settings["LLM_CACHE_MAX_BYTES"],
+    })
+
+
+def create_aggregator(settings: Dict[str, Any]) -> AggregationEngine:
+    """按配置创建聚合引擎，'synthesis' 策略使用 AGGREGATION_LLM_CONFIG 指定的裁判模型"""
+    llm = None
+    if settings["AGGREGATION_STRATEGY"] == 'synthesis':
+        llm = create_llm(settings, settings["AGGREGATION_LLM_CONFIG"], "Judge")
+    return AggregationEngine(
+        strategy=settings["AGGREGATION_STRATEGY"],
+        k=settings["AGGREGATION_TOP_K"],
+        llm=llm,
+        token_budget=settings["AGGREGATION_TOKEN_BUDGET"],
+        stream=settings["AGGREGATION_STREAM"],
+    )
+
+
+def setup_agents(settings: Dict[str, Any] = None, rng: random.Random = None) -> List[BaseAgent]:
+    """根据配置初始化智能体 (rng 用于可复现地选择恶意智能体)"""
+    settings = settings or load_settings()
+    rng = rng or random.Random()
     agents = []
-    num_malicious = int(config.NUM_AGENTS * config.MALICIOUS_RATIO)
-    agent_ids = list(range(config.NUM_AGENTS))
-    malicious_ids = random.sample(agent_ids, num_malicious)
+    num_malicious = int(settings["NUM_AGENTS"] * settings["MALICIOUS_RATIO"])
+    agent_ids = list(range(settings["NUM_AGENTS"]))
+    malicious_ids = rng.sample(agent_ids, num_malicious)
+
+    attack_type = settings["ATTACK_TYPE"]
+    colluding_group = malicious_ids if 'colluding' in attack_type else []
 
-    colluding_group = malicious_ids if 'colluding' in config.ATTACK_TYPE else []
+    llm = None
+    if settings["AGENT_BACKEND"] == 'llm':
+        llm = create_llm(settings, settings["AGENT_LLM_CONFIG"], "Analyst")
 
-    for i in range(config.NUM_AGENTS):
+    for i in range(settings["NUM_AGENTS"]):
         if i in malicious_ids:
-            if config.ATTACK_TYPE == 'sleeper':
-                agents.append(SleeperAgent(i, latent_period=config.SLEEPER_LATENT_PERIOD))
-            elif config.ATTACK_TYPE == 'colluding':
+            if attack_type == 'sleeper':
+                agents.append(SleeperAgent(i, latent_period=settings["SLEEPER_LATENT_PERIOD"]))
+            elif attack_type == 'colluding':
                 agents.append(ColludingAgent(i, colluding_group=colluding_group))
-            elif config.ATTACK_TYPE == 'camouflage':
+            elif attack_type == 'camouflage':
                 agents.append(CamouflageAgent(i))
+        elif llm is not None:
+            agents.append(LLMAgent(i, llm))
         else:
             agents.append(HonestAgent(i))
-    print(f"Agents setup complete. Malicious IDs: {malicious_ids}")
+    logger.info("Agents setup complete. Malicious IDs: %s", malicious_ids)
     return agents
 
 
-def run_simulation():
-    """运行单次完整的模拟实验"""
+def make_task_sampler(settings: Dict[str, Any]):
+    """
+    根据 TASKS 构造会话的任务采样器: 每轮从 TASKS 中不放回地抽取 TASKS_PER_ROUND 个任务
+    TASKS 为空时返回 None (会话使用默认的单一通用任务)
+    """
+    names = settings["TASKS"]
+    if not names:
+        return None
+    tasks = [get_task(name) for name in names]
+    per_round = min(settings["TASKS_PER_ROUND"], len(tasks))
+
+    def sample(round_number: int, rng: random.Random):
+        return [(task.context, task.prompt) for task in rng.sample(tasks, per_round)]
+    return sample
+
+
+def create_session(settings: Dict[str, Any], seed: int = None, profiler=None) -> AdaptMasSession:
+    """
+    根据配置创建智能体并构建会话 (信任模型、图分析器等只构建一次)
+    seed 为 None 时抽取一个具体的种子并保存在会话中，检查点续跑时用它重建同样的恶意智能体分配
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    rng = random.Random(seed)
+    agents = setup_agents(settings, rng)
+    return AdaptMasSession(agents, settings, seed=seed, profiler=profiler,
+                           task_sampler=make_task_sampler(settings), rng=rng,
+                           aggregator=create_aggregator(settings))
+
+
+def run_simulation(settings: Dict[str, Any] = None, seed: int = None, log_filename: str = None,
+                   resume: bool = False) -> str:
+    """
+    运行单次完整的模拟实验
+    settings: load_settings() 返回的配置字典，缺省时使用 config.py 的当前值
+    seed: 随机种子 (恶意智能体选择与Louvain划分)，None 表示不固定
+    log_filename: 日志输出路径，缺省时按攻击类型与比例命名
+    resume: 从最近的检查点继续 (沿用检查点中的配置与种子)，结果与不中断运行逐位一致
+    返回日志文件路径
+    """
+    from experiments.log_writer import StreamingLogWriter  # pyarrow 只在真正写日志时加载
+
+    settings = settings or load_settings()
+    if log_filename is None:
+        log_filename = f"experiment_log_{settings['ATTACK_TYPE']}_{settings['MALICIOUS_RATIO']}.{settings['LOG_FORMAT']}"
+
+    # 每 CHECKPOINT_INTERVAL 轮保存一次检查点 (默认保存在日志旁的 .ckpt.sqlite)
+    checkpointer = None
+    if settings["CHECKPOINT_INTERVAL"] or resume:
+        checkpointer = SessionCheckpointer(settings["CHECKPOINT_PATH"] or f"{log_filename}.ckpt.sqlite",
+                                           keep_last=settings["CHECKPOINT_KEEP"])
+    checkpoint = checkpointer.load() if resume else None
+    if resume and checkpoint is None:
+        logger.warning("No checkpoint found for %s, starting from round 1", log_filename)
+    if checkpoint is not None:
+        settings, seed = checkpoint["settings"], checkpoint["session"]["seed"]
+
     # 1. 初始化
-    agents = setup_agents()
-    trust_manager = TrustManager(
-        agent_ids=[agent.id for agent in agents],
-        learning_rate=config.TRUST_LEARNING_RATE
-    )
-    adapt_mas_app = build_graph()
-
-    log_data = []
-
-    # 2. 运行 N 轮
-    for round_num in range(1, config.NUM_ROUNDS + 1):
-        # (简化) 每轮都用同一个任务
-        task = "investment"  # 'code' or 'investment'
-
-        initial_state: AdaptMasState = {
-            "round_number": round_num,
-            "task_prompt": f"This is round {round_num}. Please perform the task.",
-            "agents": agents,
-            "trust_manager": trust_manager,
-            "contributions": [],
-            "reviews": [],
-            "analysis_results": {},
-            "final_output": ""
-        }
-
-        # 运行ADAPT-MAS工作流
-        final_state = adapt_mas_app.invoke(initial_state)
-
-        # 3. 记录日志
-        trust_scores = final_state['trust_manager'].get_all_scores()
-        for agent in agents:
-            log_entry = {
-                "round": round_num,
+    profiler = NodeProfiler(trace_memory=settings["PROFILE_MEMORY"]) if settings["PROFILE_NODES"] else None
+    session = create_session(settings, seed, profiler)
+    agents = session.agents
+    if checkpoint is not None:
+        session.load_state_dict(checkpoint["session"])
+        logger.info("Resuming from checkpoint after round %d", session.round_number)
+
+    # 每轮的日志以record batch形式流式写出，内存占用不随轮数增长；续跑时保留检查点之前的日志行
+    # 开启检查点时以崩溃后仍可读取的方式写出 (parquet 日志在结束时才由Arrow IPC流转换)
+    log_writer = StreamingLogWriter(log_filename, fmt=settings["LOG_FORMAT"],
+                                    flush_interval=settings["LOG_FLUSH_INTERVAL"],
+                                    keep_rows=checkpoint["log_rows"] if checkpoint is not None else None,
+                                    crash_safe=checkpointer is not None)
+    # 信任历史同样按检查点中的记录游标截断后续写
+    history = None
+    if settings["RECORD_HISTORY"]:
+        from adapt_mas.history import HistoryWriter
+        history = HistoryWriter(settings["HISTORY_PATH"] or f"{log_filename}.history", [agent.id for agent in agents],
+                                keep_records=checkpoint.get("history_records") if checkpoint is not None else None)
+        session.history = history
+
+    # 每个任务结束时记录该任务上下文的信任分 (作为会话的回调)
+    agent_ids = [agent.id for agent in agents]
+
+    def log_round(result: Dict[str, Any]):
+        trust_scores = session.trust_manager.get_trust_scores(agent_ids, result["context"])
+        detected = {item for sublist in result['analysis_results']['colluding_groups'] for item in sublist}
+        analysis_mode = result['analysis_results']['analysis_mode']
+        rows = [
+            {
+                "round": result["round"],
+                "context": result["context"],
                 "agent_id": agent.id,
                 "is_malicious": agent.is_malicious,
                 "malicious_type": agent.malicious_type,
-                "trust_score": trust_scores[agent.id]["general_task"],
-                "detected_colluding": agent.id in [item for sublist in
-                                                   final_state['analysis_results']['colluding_groups'] for item in
-                                                   sublist]
+                "trust_score": float(trust_score),
+                "detected_colluding": agent.id in detected,
+                "analysis_mode": analysis_mode
             }
-            log_data.append(log_entry)
+            for agent, trust_score in zip(agents, trust_scores)
+        ]
+        temporal_trust = session.temporal_trust
+        if temporal_trust is not None:
+            # 窗口内尚无证据的智能体，均值/标准差为 NaN
+            context = result["context"]
+            shifted = set(result['analysis_results']['behavior_shifts'])
+            columns = zip(temporal_trust.rolling_mean(agent_ids, context).tolist(),
+                          temporal_trust.rolling_std(agent_ids, context).tolist(),
+                          temporal_trust.shift_scores(agent_ids, context).tolist(),
+                          temporal_trust.shift_scores(agent_ids, context, stream="review").tolist())
+            for row, (cis_mean, cis_std, cis_shift, review_shift) in zip(rows, columns):
+                row.update({
+                    "cis_deviation_mean": cis_mean,
+                    "cis_deviation_std": cis_std,
+                    "cis_shift_score": cis_shift,
+                    "review_shift_score": review_shift,
+                    "shift_alarm": row["agent_id"] in shifted
+                })
+        log_writer.write_round(rows)
+        logger.debug("Round %d/%d finished", result["round"], settings["NUM_ROUNDS"])
+
+        interval = settings["CHECKPOINT_INTERVAL"]
+        if interval and result["round_complete"] and result["round"] % interval == 0:
+            # 先写出缓存的日志行，使日志游标与检查点一致
+            log_writer.flush()
+            checkpointer.save(result["round"], {
+                "settings": settings,
+                "session": session.state_dict(),
+                "log_rows": log_writer.rows_written,
+                "history_records": history.records_written if history is not None else None,
+            })
+
+    # 2. 运行剩余的轮次 (每次工作流调用连续运行 ROUNDS_PER_INVOCATION 轮，每轮的任务由 TASKS 决定)
+    # 3. 关闭日志文件 (异常退出时同样关闭，保证已写出的轮次可读取、可续跑)
+    try:
+        session.run_rounds(settings["NUM_ROUNDS"] - session.round_number, on_round_end=log_round,
+                           rounds_per_invocation=settings["ROUNDS_PER_INVOCATION"])
+    finally:
+        session.close()
+        log_writer.close()
+        if history is not None:
+            history.close()
+        if checkpointer is not None:
+            checkpointer.close()
+    logger.info("Simulation finished. Log saved to %s", log_filename)
+    for strategy, stats in session.aggregator.summary().items():
+        logger.info("Aggregation [%s]: %d calls, mean %.1f ms, mean tokens %.0f prompt / %.0f completion",
+                    strategy, stats["calls"], stats["mean_latency"] * 1000,
+                    stats["mean_prompt_tokens"], stats["mean_completion_tokens"])
+    uses_llm = settings["AGENT_BACKEND"] == 'llm' or settings["AGGREGATION_STRATEGY"] == 'synthesis'
+    if uses_llm:
+        from utils.llm_clients import client_metrics
+        for provider, metrics in client_metrics().items():
+            logger.info("LLM provider [%s]: %d requests, %d errors, max in-flight %d, queue wait mean %.3fs / max %.3fs",
+                        provider, metrics["requests"], metrics["errors"], metrics["max_in_flight"],
+                        metrics["queue_wait_mean"], metrics["queue_wait_max"])
+    if settings["LLM_CACHE_PATH"] and uses_llm:
+        from utils.llm_clients import get_response_cache
+        logger.info("LLM cache stats: %s", get_response_cache(settings['LLM_CACHE_PATH']).stats())
+
+    # 4. 节点耗时汇总，记录导出到 PROFILE_PATH (默认为日志旁的 .profile.jsonl)
+    if profiler is not None:
+        profiler.to_jsonl(settings["PROFILE_PATH"] or f"{log_filename}.profile.jsonl")
+        logger.info("Per-node profile (%d rounds, %d agents):\n%s",
+                    settings["NUM_ROUNDS"], settings["NUM_AGENTS"], profiler.report())
+    return log_filename
+
 
-    # 4. 保存日志文件
-    log_df = pd.DataFrame(log_data)
-    log_filename = f"experiment_log_{config.ATTACK_TYPE}_{config.MALICIOUS_RATIO}.csv"
-    log_df.to_csv(log_filename, index=False)
-    print(f"\nSimulation finished. Log saved to {log_filename}")
+def main():
+    parser = argparse.ArgumentParser(description="Run a single ADAPT-MAS simulation.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log", default=None, help="log file path (defaults to experiment_log_{attack}_{ratio}.{fmt})")
+    parser.add_argument("--resume", action="store_true", help="continue from the latest checkpoint of this log")
+    args = parser.parse_args()
+    run_simulation(seed=args.seed, log_filename=args.log, resume=args.resume)
 
 
 if __name__ == "__main__":
-    run_simulation()
\ No newline at end of file
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main()
\ No newline at end of file
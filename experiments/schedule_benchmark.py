@@ -0,0 +1,146 @@
+# /experiments/schedule_benchmark.py
+
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, List, Set
+
+import numpy as np
+
+import config
+from adapt_mas.instrumentation import NodeProfiler
+from experiments.run_experiment import create_session, load_settings
+from experiments.topology_benchmark import trust_auc
+
+logger = logging.getLogger(__name__)
+
+# 检测延迟的判定标准
+DETECTION_COVERAGE = 0.5  # 被标记的智能体覆盖至少该比例的恶意智能体
+DETECTION_PRECISION = 0.5  # 且其中至少该比例确为恶意智能体 (排除把全体标记为一个团伙的情况)
+SEPARATION_AUC = 0.9  # 忠诚智能体与恶意智能体的信任AUC达到该值
+SHIFT_WINDOW = 10  # 测量行为突变报警延迟时使用的时序信任窗口 (配置中默认不启用时序信任)
+
+
+def is_detected(flagged: Set[int], malicious_ids: Set[int]) -> bool:
+    hits = len(flagged & malicious_ids)
+    return bool(malicious_ids) and hits >= DETECTION_COVERAGE * len(malicious_ids) \
+        and hits >= DETECTION_PRECISION * len(flagged)
+
+
+def run_schedule_cell(attack_type: str, num_agents: int, rounds: int, interval: int = None,
+                      triggers: Dict[str, float] = None, seed: int = 0,
+                      overrides: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    用规则型智能体按一种分析调度运行，返回计算开销 (完整分析次数、分析节点与图分析耗时)
+    与检测延迟 (首次满足判定标准的轮次，从未满足时为 None): 合谋团伙检测、时序信任的行为突变报警与信任分离
+    interval: 完整图分析的间隔，None 或 1 表示每轮都执行
+    triggers: {"score_variance" / "trust_drift" / "negative_reviews": 阈值}
+    行为突变报警需要时序信任，overrides 未给出 TEMPORAL_WINDOW 时使用 SHIFT_WINDOW
+    """
+    triggers = triggers or {}
+    settings = load_settings({
+        "TEMPORAL_WINDOW": SHIFT_WINDOW,
+        **(overrides or {}),
+        "NUM_AGENTS": num_agents,
+        "NUM_ROUNDS": rounds,
+        "ATTACK_TYPE": attack_type,
+        "AGENT_BACKEND": "stub",
+        "ASYNC_NODES": False,
+        "ANALYSIS_INTERVAL": interval if interval and interval > 1 else None,
+        "ANALYSIS_TRIGGER_SCORE_VARIANCE": triggers.get("score_variance"),
+        "ANALYSIS_TRIGGER_TRUST_DRIFT": triggers.get("trust_drift"),
+        "ANALYSIS_TRIGGER_NEGATIVE_REVIEWS": triggers.get("negative_reviews"),
+    })
+    profiler = NodeProfiler()
+    session = create_session(settings, seed, profiler)
+    agent_ids = [agent.id for agent in session.agents]
+    malicious = np.array([agent.is_malicious for agent in session.agents])
+    malicious_ids = {agent.id for agent in session.agents if agent.is_malicious}
+    stats = {"modes": {}, "triggers": {}, "collusion_latency": None, "shift_latency": None, "separation_latency": None}
+
+    def on_round_end(result: Dict[str, Any]):
+        analysis_results = result["analysis_results"]
+        mode, trigger = analysis_results["analysis_mode"], analysis_results["analysis_trigger"]
+        stats["modes"][mode] = stats["modes"].get(mode, 0) + 1
+        if trigger is not None:
+            stats["triggers"][trigger] = stats["triggers"].get(trigger, 0) + 1
+
+        flagged = {agent_id for group in analysis_results["colluding_groups"] for agent_id in group}
+        if stats["collusion_latency"] is None and is_detected(flagged, malicious_ids):
+            stats["collusion_latency"] = result["round"]
+        if stats["shift_latency"] is None and is_detected(set(analysis_results["behavior_shifts"]), malicious_ids):
+            stats["shift_latency"] = result["round"]
+        if stats["separation_latency"] is None:
+            trust = session.trust_manager.get_trust_scores(agent_ids, result["context"])
+            if trust_auc(trust[~malicious], trust[malicious]) >= SEPARATION_AUC:
+                stats["separation_latency"] = result["round"]
+
+    started = time.perf_counter()
+    session.run_rounds(rounds, on_round_end=on_round_end)
+    elapsed = time.perf_counter() - started
+
+    summary = profiler.summary()
+    return {
+        "attack_type": attack_type,
+        "num_agents": num_agents,
+        "rounds": rounds,
+        "seed": seed,
+        "interval": interval or 1,
+        "triggers": triggers,
+        "full_analyses": stats["modes"].get("full", 0),
+        "cis_only_analyses": stats["modes"].get("cis_only", 0),
+        "trigger_counts": stats["triggers"],
+        "seconds_per_round": elapsed / rounds,
+        "analysis_ms_per_round": summary["analysis"]["wall_time"] * 1000 / rounds,
+        "graph_ms_per_round": summary["analysis.graph_analysis"]["wall_time"] * 1000 / rounds,
+        "collusion_latency": stats["collusion_latency"],
+        "shift_latency": stats["shift_latency"],
+        "separation_latency": stats["separation_latency"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare adaptive analysis schedules: detection latency versus compute (no LLM).")
+    parser.add_argument("--attacks", nargs="+", default=["colluding", "sleeper"])
+    parser.add_argument("--intervals", nargs="+", type=int, default=[1, 2, 5, 10],
+                        help="full graph analysis every K rounds (1 = every round)")
+    parser.add_argument("--score-variance", type=float, default=config.ANALYSIS_TRIGGER_SCORE_VARIANCE)
+    parser.add_argument("--trust-drift", type=float, default=config.ANALYSIS_TRIGGER_TRUST_DRIFT)
+    parser.add_argument("--negative-reviews", type=float, default=config.ANALYSIS_TRIGGER_NEGATIVE_REVIEWS)
+    parser.add_argument("--num-agents", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--output", default="schedule_benchmark.json")
+    args = parser.parse_args()
+
+    # 每个间隔先不带触发条件运行；给出了任一阈值时，再带触发条件运行一次
+    triggers = {name: value for name, value in (("score_variance", args.score_variance),
+                                                 ("trust_drift", args.trust_drift),
+                                                 ("negative_reviews", args.negative_reviews)) if value is not None}
+    schedules = [(interval, {}) for interval in args.intervals]
+    if triggers:
+        schedules += [(interval, triggers) for interval in args.intervals if interval > 1]
+
+    results: List[Dict[str, Any]] = []
+    logger.info("%-11s %5s %9s %5s %6s %10s %10s %9s %9s %9s", "attack", "every", "triggers", "seed", "full",
+                "ms/rnd", "graph ms", "collude@", "shift@", "separate@")
+    for attack_type in args.attacks:
+        for interval, cell_triggers in schedules:
+            for seed in args.seeds:
+                result = run_schedule_cell(attack_type, args.num_agents, args.rounds, interval, cell_triggers, seed)
+                results.append(result)
+                logger.info("%-11s %5d %9s %5d %6d %10.2f %10.2f %9s %9s %9s", attack_type, result["interval"],
+                            "yes" if cell_triggers else "no", seed, result["full_analyses"],
+                            result["seconds_per_round"] * 1000, result["graph_ms_per_round"],
+                            result["collusion_latency"], result["shift_latency"], result["separation_latency"])
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"num_agents": args.num_agents, "rounds": args.rounds, "results": results}, f, indent=2)
+    logger.info("Schedule benchmark saved to %s", args.output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main()
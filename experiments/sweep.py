@@ -0,0 +1,152 @@
+# /experiments/sweep.py
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+import config
+from experiments.run_experiment import load_settings, run_simulation
+
+logger = logging.getLogger(__name__)
+
+# 单元格完成后写入的标记文件，续跑时据此跳过
+SUCCESS_MARKER = "_SUCCESS"
+LOG_NAME = "log.parquet"
+# 单元格的完整配置覆盖 (基础覆盖与网格参数合并) 与种子，其哈希决定单元格目录
+MANIFEST_NAME = "cell.json"
+
+
+def expand_grid(grid: Dict[str, List[Any]], seeds: List[int]) -> List[Dict[str, Any]]:
+    """
+    将参数网格展开为实验单元格列表
+    grid: {config参数名: 取值列表}，例如 {"ATTACK_TYPE": ["colluding"], "MALICIOUS_RATIO": [0.1, 0.3]}
+    每个单元格为 {"params": {...}, "seed": seed}
+    """
+    names = sorted(grid)
+    cells = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        for seed in seeds:
+            cells.append({"params": dict(zip(names, values)), "seed": seed})
+    return cells
+
+
+def cell_overrides(cell: Dict[str, Any], base_overrides: Dict[str, Any] = None) -> Dict[str, Any]:
+    """单元格运行时使用的配置覆盖: 基础覆盖 (所有单元格共用) 与网格参数合并"""
+    return {**(base_overrides or {}), **cell["params"]}
+
+
+def overrides_hash(overrides: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(overrides, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def cell_dir(output_dir: str, cell: Dict[str, Any], base_overrides: Dict[str, Any] = None) -> str:
+    """
+    单元格的分区目录: output_dir/overrides=<哈希>/attack_type=.../malicious_ratio=.../seed=...
+    哈希覆盖合并后的全部配置覆盖，基础覆盖不同的扫描不会复用彼此的结果
+    """
+    parts = [f"overrides={overrides_hash(cell_overrides(cell, base_overrides))}"]
+    parts.extend(f"{name.lower()}={value}" for name, value in sorted(cell["params"].items()))
+    parts.append(f"seed={cell['seed']}")
+    return os.path.join(output_dir, *parts)
+
+
+def is_completed(output_dir: str, cell: Dict[str, Any], base_overrides: Dict[str, Any] = None) -> bool:
+    return os.path.exists(os.path.join(cell_dir(output_dir, cell, base_overrides), SUCCESS_MARKER))
+
+
+def run_cell(output_dir: str, cell: Dict[str, Any], base_overrides: Dict[str, Any] = None) -> str:
+    """
+    在工作进程中运行一个单元格；日志先写入临时文件，完成后原子替换并写入完成标记
+    检查点、信任历史与节点耗时记录按最终的日志路径命名
+    """
+    overrides = cell_overrides(cell, base_overrides)
+    directory = cell_dir(output_dir, cell, base_overrides)
+    os.makedirs(directory, exist_ok=True)
+    log_path = os.path.join(directory, LOG_NAME)
+    settings = load_settings({
+        **overrides,
+        "LOG_FORMAT": "parquet",
+        "CHECKPOINT_PATH": f"{log_path}.ckpt.sqlite",
+        "HISTORY_PATH": f"{log_path}.history",
+        "PROFILE_PATH": f"{log_path}.profile.jsonl",
+    })
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump({"overrides": overrides, "seed": cell["seed"]}, f, indent=2, sort_keys=True, default=str)
+    tmp_path = log_path + ".tmp"
+    run_simulation(settings, seed=cell["seed"], log_filename=tmp_path)
+    os.replace(tmp_path, log_path)
+    open(os.path.join(directory, SUCCESS_MARKER), "w").close()
+    return directory
+
+
+def run_sweep(
+        grid: Dict[str, List[Any]],
+        seeds: List[int],
+        output_dir: str,
+        max_workers: int = None,
+        base_overrides: Dict[str, Any] = None
+) -> List[str]:
+    """
+    并行运行参数网格中的全部单元格，已完成的单元格会被跳过 (可续跑)
+    返回本次新完成的单元格目录
+    """
+    cells = expand_grid(grid, seeds)
+    pending = [cell for cell in cells if not is_completed(output_dir, cell, base_overrides)]
+    logger.info("Sweep: %d cells, %d already completed, %d to run", len(cells), len(cells) - len(pending), len(pending))
+
+    finished = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_cell, output_dir, cell, base_overrides): cell for cell in pending}
+        for future in as_completed(futures):
+            directory = future.result()
+            finished.append(directory)
+            logger.info("[%d/%d] finished %s", len(finished), len(pending), directory)
+    return finished
+
+
+def load_sweep_results(output_dir: str, columns: List[str] = None, rounds: List[int] = None):
+    """读取全部已完成单元格的日志 (可只加载指定的列与轮次)，并将分区键作为列加入"""
+    import pandas as pd
+    from experiments.log_writer import read_log
+
+    frames = []
+    for root, _, files in os.walk(output_dir):
+        if SUCCESS_MARKER not in files:
+            continue
+        frame = read_log(os.path.join(root, LOG_NAME), columns, rounds)
+        for part in os.path.relpath(root, output_dir).split(os.sep):
+            name, value = part.split("=", 1)
+            frame[name] = value
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a parallel, resumable ADAPT-MAS parameter sweep.")
+    parser.add_argument("--attacks", nargs="+", default=["sleeper", "colluding", "camouflage"])
+    parser.add_argument("--ratios", nargs="+", type=float, default=[0.1, 0.2, 0.3])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0, 1, 2])
+    parser.add_argument("--num-agents", type=int, default=None)
+    parser.add_argument("--rounds", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="sweep_results")
+    args = parser.parse_args()
+
+    base_overrides = {}
+    if args.num_agents is not None:
+        base_overrides["NUM_AGENTS"] = args.num_agents
+    if args.rounds is not None:
+        base_overrides["NUM_ROUNDS"] = args.rounds
+
+    grid = {"ATTACK_TYPE": args.attacks, "MALICIOUS_RATIO": args.ratios}
+    run_sweep(grid, args.seeds, args.output, max_workers=args.workers, base_overrides=base_overrides)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main()
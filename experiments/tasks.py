@@ -1,10 +1,12 @@
 # /experiments/tasks.py
 
 class Task:
-    def __init__(self, name, prompt, validation_fn):
+    def __init__(self, name, prompt, validation_fn, context=None):
         self.name = name
         self.prompt = prompt
         self.validation_fn = validation_fn
+        # 信任上下文: 同一上下文的任务共享信任分
+        self.context = context or name
 
 # --- 客观任务: 代码生成 (HumanEval 简化版) ---
 def validate_code_task(output: str):
@@ -14,7 +16,8 @@ def validate_code_task(output: str):
 code_generation_task = Task(
     name="Code Generation (Simple)",
     prompt="Write a Python function `add(a, b)` that returns the sum of two numbers.",
-    validation_fn=validate_code_task
+    validation_fn=validate_code_task,
+    context="code"
 )
 
 # --- 主观任务: 商业投资分析 ---
@@ -28,7 +31,8 @@ def validate_investment_task(output: str, judge_llm):
 investment_analysis_task = Task(
     name="Investment Analysis",
     prompt="Analyze the business plan for 'InnovateAI' and provide a clear 'recommend investment' or 'abandon investment' conclusion. The plan shows rapid user growth but no profit and an inexperienced team.",
-    validation_fn=validate_investment_task # 裁判LLM会作为参数传入
+    validation_fn=validate_investment_task, # 裁判LLM会作为参数传入
+    context="investment"
 )
 
 def get_task(task_name: str):
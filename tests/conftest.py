@@ -0,0 +1,32 @@
+# /adapt_mas_project/tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+# 测试从项目根目录导入 config、adapt_mas 与 experiments
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def run_session():
+    """
+    以规则型智能体运行一次会话，返回 (每轮的 (轮次, 上下文, 合谋团伙, 信任分), 最终的全部信任分)
+    用于比较不同执行路径的结果是否逐位一致
+    """
+    from experiments.run_experiment import create_session, load_settings
+
+    def run(overrides, seed=2):
+        settings = load_settings({"NUM_AGENTS": 24, "NUM_ROUNDS": 8, "PROFILE_NODES": False, **overrides})
+        session = create_session(settings, seed=seed)
+        agent_ids = [agent.id for agent in session.agents]
+        rounds = []
+        session.run_rounds(settings["NUM_ROUNDS"], on_round_end=lambda result: rounds.append(
+            (result["round"], result["context"], result["analysis_results"]["colluding_groups"],
+             session.trust_manager.get_trust_scores(agent_ids, result["context"]).tolist())))
+        trust = {agent_id: dict(scores) for agent_id, scores in session.trust_manager.get_all_scores().items()}
+        session.close()
+        return rounds, trust
+
+    return run
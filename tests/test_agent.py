@@ -0,0 +1,43 @@
+# /adapt_mas_project/tests/test_agent.py
+
+import asyncio
+
+import numpy as np
+
+from adapt_mas.agent import BaseAgent, ColludingAgent, HonestAgent, LLMAgent, SleeperAgent
+
+
+class StrictHonestAgent(HonestAgent):
+    """只重写了 review 的子类: 继承来的 HonestAgent.review_matrix 与之不一致"""
+
+    def review(self, contribution, all_agents):
+        return 0.1 if "misleading" in contribution['content'] else 0.9
+
+
+CONTRIBUTIONS = [{'agent_id': 0, 'content': "Honest contribution", 'round': 3},
+                 {'agent_id': 1, 'content': "Catastrophic and misleading information", 'round': 30}]
+
+
+def test_review_matrix_default_loops_over_review():
+    agents = [StrictHonestAgent(5), StrictHonestAgent(6)]
+    assert not StrictHonestAgent.supports_review_matrix()
+    matrix = BaseAgent.review_matrix.__func__(StrictHonestAgent, agents, CONTRIBUTIONS)
+    np.testing.assert_array_equal(matrix, [[0.9, 0.1], [0.9, 0.1]])
+    assert BaseAgent.review_matrix.__func__(StrictHonestAgent, agents, []).shape == (2, 0)
+
+
+def test_vectorized_review_matrix_matches_review():
+    agents = [HonestAgent(0), SleeperAgent(1, latent_period=20), ColludingAgent(2, colluding_group=[2, 3])]
+    for agent in agents:
+        assert type(agent).supports_review_matrix()
+        expected = [[agent.review(contribution, agents) for contribution in CONTRIBUTIONS]]
+        np.testing.assert_array_equal(type(agent).review_matrix([agent], CONTRIBUTIONS, agents), expected)
+
+
+def test_review_batch_default_loops_over_review():
+    agent = StrictHonestAgent(5)
+    assert not StrictHonestAgent.supports_review_batch() and LLMAgent.supports_review_batch()
+    items = [{'agent_ids': [contribution['agent_id']], 'content': contribution['content'],
+              'round': contribution['round']} for contribution in CONTRIBUTIONS]
+    assert agent.review_batch(items, [agent]) == [0.9, 0.1]
+    assert asyncio.run(agent.areview_batch(items, [agent])) == [0.9, 0.1]
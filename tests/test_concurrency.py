@@ -0,0 +1,46 @@
+# /adapt_mas_project/tests/test_concurrency.py
+
+import asyncio
+
+import pytest
+
+from adapt_mas.concurrency import call_with_retry, gather_with_limit
+from utils.llm_cache import CacheMissError
+
+
+def flaky(error: Exception, failures: int, calls: list, result=None):
+    """前 failures 次调用抛出 error，之后返回 result"""
+    async def call():
+        calls.append(asyncio.get_running_loop().time())
+        if len(calls) <= failures:
+            raise error
+        return result
+    return call
+
+
+def test_transient_errors_are_retried():
+    calls = []
+    assert asyncio.run(call_with_retry(flaky(ConnectionResetError(), 2, calls, "ok"), max_retries=3, backoff=0)) == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize("error", [CacheMissError("miss"), ValueError("bad request")])
+def test_non_transient_errors_are_raised_immediately(error):
+    calls = []
+    with pytest.raises(type(error)):
+        asyncio.run(call_with_retry(flaky(error, 1, calls), max_retries=3, backoff=0))
+    assert len(calls) == 1
+
+
+def test_semaphore_released_during_backoff():
+    """退避等待中的调用不占用并发名额: 其他调用不必等它的退避结束"""
+    calls, other_calls = [], []
+
+    async def main():
+        started = asyncio.get_running_loop().time()
+        await gather_with_limit([flaky(TimeoutError(), 1, calls, "retried"), flaky(None, 0, other_calls, "other")],
+                                limit=1, max_retries=1, backoff=0.2)
+        return other_calls[0] - started
+
+    assert asyncio.run(main()) < 0.1
+    assert len(calls) == 2
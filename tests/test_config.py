@@ -0,0 +1,28 @@
+# /adapt_mas_project/tests/test_config.py
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def no_dotenv(monkeypatch):
+    # 不读取项目根目录的 .env
+    monkeypatch.setattr(config, "_dotenv_loaded", True)
+    monkeypatch.delenv("DEEPSEEK_API_KEY", raising=False)
+
+
+def test_api_key_from_environment(no_dotenv, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "sk-env")
+    assert config.get_api_key("DEEPSEEK_API_KEY") == "sk-env"
+
+
+def test_api_key_falls_back_to_config(no_dotenv, monkeypatch):
+    monkeypatch.setattr(config, "DEEPSEEK_API_KEY", "sk-config")
+    assert config.get_api_key("DEEPSEEK_API_KEY") == "sk-config"
+
+
+def test_missing_api_key(no_dotenv):
+    assert config.get_api_key("DEEPSEEK_API_KEY") is None
+    with pytest.raises(ValueError, match="DEEPSEEK_API_KEY is not set"):
+        config.get_api_key("DEEPSEEK_API_KEY", required=True)
@@ -0,0 +1,62 @@
+# /adapt_mas_project/tests/test_graph_analyzer.py
+
+import numpy as np
+import pytest
+
+from adapt_mas.graph_analyzer import GraphAnalyzer
+from adapt_mas.reviews import ReviewBatch
+
+
+def reference_suspicion_score(G, members):
+    """向量化之前的逐社群实现 (遍历成员的出边)"""
+    internal_edges = 0
+    internal_weight = 0.0
+    external_edges = 0
+    external_eval_scores = []
+    for u in members:
+        if u not in G:
+            continue
+        for v, data in G[u].items():
+            weight = data.get('weight', 0.0)
+            if v in members:
+                internal_edges += 1
+                internal_weight += weight
+            else:
+                external_edges += 1
+                external_eval_scores.append(weight)
+    avg_internal_cohesion = (internal_weight / internal_edges) if internal_edges > 0 else 0
+    total_edges = internal_edges + external_edges
+    external_isolation_ratio = (internal_edges / total_edges) if total_edges > 0 else 1.0
+    avg_external_eval = (sum(external_eval_scores) / len(external_eval_scores)) if external_eval_scores else 0
+    eval_bias = avg_internal_cohesion - avg_external_eval
+    suspicion_score = 0.5 * external_isolation_ratio + 0.3 * avg_internal_cohesion + 0.2 * (eval_bias / 2.0)
+    return max(0.0, min(1.0, suspicion_score))
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_score_communities_matches_per_community(seed):
+    rng = np.random.default_rng(seed)
+    agent_ids = rng.permutation(80)[:int(rng.integers(2, 40))]
+    pairs = [(u, v) for u in agent_ids.tolist() for v in agent_ids.tolist() if u != v and rng.random() < 0.3]
+    rng.shuffle(pairs)
+    reviewers = np.array([u for u, _ in pairs], dtype=np.int32)
+    reviewees = np.array([v for _, v in pairs], dtype=np.int32)
+    reviews = ReviewBatch(reviewers, reviewees, rng.uniform(-1, 1, len(pairs)).astype(np.float32))
+    analyzer = GraphAnalyzer()
+    G = analyzer.build_graph(reviews)
+    partition = {node: int(rng.integers(0, 5)) for node in G.nodes}
+    if not partition:
+        return
+    members = {}
+    for node, community_id in partition.items():
+        members.setdefault(community_id, []).append(node)
+
+    expected = {community_id: reference_suspicion_score(G, group) for community_id, group in members.items()}
+    # 从图导出的边与直接使用本轮评审的两种输入
+    for edges in (analyzer._edge_arrays(G), (reviews.reviewers, reviews.reviewees, reviews.scores.astype(np.float64))):
+        scores = analyzer.score_communities(*edges, partition)
+        assert scores.keys() == expected.keys()
+        np.testing.assert_array_equal([scores[key] for key in expected], list(expected.values()))
+    subset = sorted(expected)[:2]
+    assert analyzer.score_communities(*analyzer._edge_arrays(G), partition, subset) == \
+        {key: analyzer.score_communities(*analyzer._edge_arrays(G), partition)[key] for key in subset}
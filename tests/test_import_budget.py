@@ -0,0 +1,13 @@
+# /adapt_mas_project/tests/test_import_budget.py
+
+from experiments.import_budget import check_import_budget
+
+# 测试环境的机器负载不一，耗时预算比命令行默认的 0.5 秒宽松；重依赖的检查不受影响
+BUDGET = 2.0
+
+
+def test_entry_modules_within_import_budget():
+    """入口模块在全新解释器中导入时不加载重依赖，且耗时在预算之内"""
+    violations = check_import_budget(BUDGET, repeats=1)
+    assert not [violation for violation in violations if "eagerly imports" in violation], violations
+    assert violations == []
@@ -0,0 +1,39 @@
+# /adapt_mas_project/tests/test_llm_cache.py
+
+from experiments.run_experiment import create_llm, load_settings
+from utils.llm_clients import get_response_cache
+
+
+def test_cache_size_limits_from_settings(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    settings = load_settings({"LLM_CACHE_PATH": path, "LLM_CACHE_MAX_ENTRIES": 50, "LLM_CACHE_MAX_BYTES": 300})
+    llm = create_llm(settings, {"type": "fake", "model_name": "fake", "temperature": 0.0}, "Agent")
+    for index in range(20):
+        llm.invoke(f"prompt {index}")
+
+    cache = get_response_cache(path)
+    assert (cache.max_entries, cache.max_bytes) == (50, 300)
+    total = cache._conn.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+    assert 0 < total <= 300 and len(cache) < 20
+
+
+def test_cache_hits_are_not_counted_as_llm_calls(tmp_path):
+    """LLM调用数只统计真正发往提供方的请求，命中缓存的调用单独计数"""
+    from adapt_mas.instrumentation import NodeProfiler
+    from experiments.run_experiment import create_session
+
+    settings = load_settings({"AGENT_BACKEND": "llm", "AGENT_LLM_CONFIG": {"type": "fake", "temperature": 0.0},
+                              "NUM_AGENTS": 6, "NUM_ROUNDS": 2, "LLM_CACHE_PATH": str(tmp_path / "cache.sqlite")})
+    totals = []
+    for _ in range(2):
+        profiler = NodeProfiler()
+        session = create_session(settings, seed=0, profiler=profiler)
+        session.run_rounds(settings["NUM_ROUNDS"])
+        session.close()
+        totals.append((sum(record["llm_calls"] for record in profiler.records),
+                       sum(record["llm_cache_hits"] for record in profiler.records)))
+
+    (first_calls, first_hits), (second_calls, second_hits) = totals
+    assert first_calls > 0
+    # 第二次运行的提示与第一次相同，全部命中缓存
+    assert second_calls == 0 and second_hits == first_calls + first_hits
@@ -0,0 +1,18 @@
+# /adapt_mas_project/tests/test_llm_clients.py
+
+from utils.llm_clients import client_metrics, get_client, get_limiter
+
+
+def test_clients_keyed_on_full_config():
+    base = {"base_url": "http://a/v1", "api_key": "k1", "rate_limit": {"requests_per_second": 5}}
+    client = get_client("fake", "m", 0.0, base)
+    assert get_client("fake", "m", 0.0, {**base, "role": "Judge", "cache_path": "x.sqlite"}) is client
+    assert get_client("fake", "m", 0.0, {**base, "rate_limit": {"requests_per_second": 5}}) is client
+    assert get_client("fake", "m", 0.0, {**base, "base_url": "http://b/v1"}) is not client
+    assert get_client("fake", "m", 0.0, {**base, "api_key": "k2"}) is not client
+    assert get_client("fake", "m", 0.0, {**base, "http_limits": {"max_connections": 4}}) is not client
+
+    other = get_client("fake", "m", 0.0, {**base, "rate_limit": {"requests_per_second": 1}})
+    assert other is not client and other.limiter is not client.limiter
+    assert other.limiter is get_limiter("fake", {"requests_per_second": 1})
+    assert len([name for name in client_metrics() if name.startswith("fake")]) >= 2
@@ -0,0 +1,11 @@
+# /adapt_mas_project/tests/test_parallel.py
+
+import pytest
+
+
+@pytest.mark.parametrize("attack_type", ["colluding", "sleeper"])
+@pytest.mark.parametrize("review_topology", ["all", "k_random"])
+def test_sharded_execution_matches_single_process(run_session, attack_type, review_topology):
+    """多进程分片执行评审与CIS阶段的结果与单进程逐位一致"""
+    common = {"ATTACK_TYPE": attack_type, "REVIEW_TOPOLOGY": review_topology}
+    assert run_session({**common, "PARALLEL_WORKERS": 3}) == run_session({**common, "PARALLEL_WORKERS": 1})
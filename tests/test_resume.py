@@ -0,0 +1,101 @@
+# /adapt_mas_project/tests/test_resume.py
+
+import json
+import os
+import subprocess
+import sys
+
+import pyarrow as pa
+import pytest
+
+from experiments.log_writer import read_log
+from experiments.run_experiment import create_session, load_settings, run_simulation
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程运行实验，在写入 KILL_ROUND 轮的日志时以 os._exit 直接退出 (模拟进程被杀，不执行任何清理)
+CRASHING_RUN = """
+import json, os, sys
+from experiments import log_writer
+from experiments.run_experiment import load_settings, run_simulation
+
+overrides, log, kill_round = json.loads(sys.argv[1]), sys.argv[2], int(sys.argv[3])
+write_round = log_writer.StreamingLogWriter.write_round
+
+def crashing_write_round(self, rows):
+    if rows and rows[0]["round"] == kill_round:
+        os._exit(1)
+    write_round(self, rows)
+
+log_writer.StreamingLogWriter.write_round = crashing_write_round
+run_simulation(load_settings(overrides), seed=0, log_filename=log)
+"""
+
+
+@pytest.mark.parametrize("attack_type", ["colluding", "sleeper"])
+def test_resume_without_seed_is_bit_identical(tmp_path, attack_type):
+    """未指定种子的实验从检查点续跑时，恶意智能体分配与不中断的运行一致"""
+    settings = load_settings({"ATTACK_TYPE": attack_type, "NUM_AGENTS": 12, "NUM_ROUNDS": 6,
+                              "CHECKPOINT_INTERVAL": 4, "PROFILE_NODES": False})
+    log = str(tmp_path / "log.parquet")
+    uninterrupted = read_log(run_simulation(settings, seed=None, log_filename=log))
+
+    # 检查点保存在第4轮之后，续跑重新执行第5、6轮
+    resumed = read_log(run_simulation(settings, seed=None, log_filename=log, resume=True))
+    assert resumed.equals(uninterrupted)
+
+
+def test_session_created_without_seed_restores_agents():
+    settings = load_settings({"ATTACK_TYPE": "colluding", "NUM_AGENTS": 12, "PROFILE_NODES": False})
+    session = create_session(settings, seed=None)
+    session.run_rounds(2)
+    state = session.state_dict()
+    assert state["seed"] is not None
+
+    restored = create_session(settings, seed=state["seed"])
+    restored.load_state_dict(state)
+    assert [type(agent) for agent in restored.agents] == [type(agent) for agent in session.agents]
+    restored.run_rounds(1)
+
+    # 用其他种子重建 (恶意智能体分配不同) 时拒绝恢复
+    types = [type(agent) for agent in session.agents]
+    other = next(candidate for candidate in (create_session(settings, seed=seed) for seed in range(100))
+                 if [type(agent) for agent in candidate.agents] != types)
+    with pytest.raises(ValueError):
+        other.load_state_dict(state)
+
+
+@pytest.mark.parametrize("log_format", ["parquet", "arrow"])
+def test_resume_after_hard_kill(tmp_path, log_format):
+    """进程在运行中被杀后，从最近的检查点续跑得到与不中断运行相同的日志"""
+    overrides = {"ATTACK_TYPE": "colluding", "NUM_AGENTS": 10, "NUM_ROUNDS": 8, "CHECKPOINT_INTERVAL": 2,
+                 "LOG_FORMAT": log_format, "PROFILE_NODES": False}
+    settings = load_settings(overrides)
+    expected = read_log(run_simulation(settings, seed=0, log_filename=str(tmp_path / f"full.{log_format}")))
+
+    log = str(tmp_path / f"log.{log_format}")
+    process = subprocess.run([sys.executable, "-c", CRASHING_RUN, json.dumps(overrides), log, "5"], cwd=ROOT,
+                             env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True)
+    assert process.returncode == 1, process.stderr
+
+    resumed = read_log(run_simulation(settings, seed=0, log_filename=log, resume=True))
+    assert resumed.equals(expected)
+    assert sorted(os.listdir(tmp_path)) == sorted([f"full.{log_format}", f"full.{log_format}.ckpt.sqlite",
+                                                   f"log.{log_format}", f"log.{log_format}.ckpt.sqlite"])
+
+
+def test_failed_resume_keeps_log(tmp_path):
+    """续跑读取日志失败时，原日志保持在原处，可以再次续跑"""
+    settings = load_settings({"ATTACK_TYPE": "colluding", "NUM_AGENTS": 10, "NUM_ROUNDS": 4,
+                              "CHECKPOINT_INTERVAL": 2, "PROFILE_NODES": False})
+    log = str(tmp_path / "log.parquet")
+    expected = read_log(run_simulation(settings, seed=0, log_filename=log))
+    with open(log, "r+b") as f:
+        f.truncate(os.path.getsize(log) - 8)
+
+    with pytest.raises(pa.ArrowInvalid):
+        run_simulation(settings, seed=0, log_filename=log, resume=True)
+    assert os.path.exists(log) and not os.path.exists(log + ".resume")
+    with pytest.raises(pa.ArrowInvalid):
+        run_simulation(settings, seed=0, log_filename=log, resume=True)
+    assert os.path.exists(log)
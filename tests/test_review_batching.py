@@ -0,0 +1,41 @@
+# /adapt_mas_project/tests/test_review_batching.py
+
+import logging
+
+import numpy as np
+import pytest
+
+from adapt_mas.review_planning import plan_reviews
+
+from experiments.run_experiment import create_session, load_settings
+
+
+def fake_llm_trust(batching: bool, async_nodes: bool):
+    settings = load_settings({"AGENT_BACKEND": "llm", "AGENT_LLM_CONFIG": {"type": "fake", "temperature": 0.0},
+                              "ATTACK_TYPE": "colluding", "NUM_AGENTS": 8, "NUM_ROUNDS": 3,
+                              "REVIEW_BATCHING": batching, "REVIEW_BATCH_SIZE": 3, "ASYNC_NODES": async_nodes,
+                              "PROFILE_NODES": False, "LLM_CACHE_PATH": None})
+    session = create_session(settings, seed=0)
+    session.run_rounds(settings["NUM_ROUNDS"])
+    return {agent_id: dict(scores) for agent_id, scores in session.trust_manager.get_all_scores().items()}
+
+
+@pytest.mark.parametrize("async_nodes", [False, True])
+def test_batched_reviews_match_unbatched(caplog, async_nodes):
+    """假LLM对批量评审提示与单条评审提示给出相同评分，批量与逐条评审得到相同的信任分"""
+    with caplog.at_level(logging.WARNING):
+        batched = fake_llm_trust(True, async_nodes)
+    assert not [record for record in caplog.records if "score" in record.getMessage().lower()]
+    unbatched = fake_llm_trust(False, async_nodes)
+    assert batched == unbatched
+
+
+def test_plan_reviews_collapses_only_exact_duplicates():
+    """只有空白不同的贡献合并为一个条目，大小写或标点不同的近似重复仍各自评审"""
+    contents = ["Buy ACME now.", "  Buy   ACME now. ", "buy acme now.", "Buy ACME now!"]
+    contributions = [{'agent_id': agent_id, 'content': content, 'round': 0}
+                     for agent_id, content in enumerate(contents, start=1)]
+    reviewee_ids = np.arange(1, len(contents) + 1)
+    requests = plan_reviews(contributions, np.zeros(len(contents), dtype=np.int64), reviewee_ids,
+                            np.arange(len(contents)))
+    assert [item['agent_ids'] for item in requests[0].items] == [[1, 2], [3], [4]]
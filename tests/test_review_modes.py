@@ -0,0 +1,11 @@
+# /adapt_mas_project/tests/test_review_modes.py
+
+import pytest
+
+
+@pytest.mark.parametrize("attack_type", ["colluding", "sleeper", "camouflage"])
+@pytest.mark.parametrize("async_nodes", [False, True])
+def test_cohort_mode_matches_instance_mode(run_session, attack_type, async_nodes):
+    """队列模式 (review_matrix 评分块) 与逐个调用 review 的结果逐位一致"""
+    common = {"ATTACK_TYPE": attack_type, "ASYNC_NODES": async_nodes}
+    assert run_session({**common, "REVIEW_MODE": "cohort"}) == run_session({**common, "REVIEW_MODE": "instance"})
@@ -0,0 +1,32 @@
+# /adapt_mas_project/tests/test_sweep.py
+
+import json
+import os
+
+from experiments.sweep import LOG_NAME, MANIFEST_NAME, cell_dir, is_completed, load_sweep_results, run_sweep
+
+GRID = {"ATTACK_TYPE": ["colluding"], "MALICIOUS_RATIO": [0.25]}
+
+
+def test_cells_keyed_on_base_overrides(tmp_path):
+    output_dir = str(tmp_path)
+    small = {"NUM_AGENTS": 8, "NUM_ROUNDS": 2, "CHECKPOINT_INTERVAL": 1, "RECORD_HISTORY": True}
+    larger = {**small, "NUM_AGENTS": 12}
+    cell = {"params": {"ATTACK_TYPE": "colluding", "MALICIOUS_RATIO": 0.25}, "seed": 0}
+
+    assert len(run_sweep(GRID, [0], output_dir, max_workers=1, base_overrides=small)) == 1
+    assert is_completed(output_dir, cell, small) and not is_completed(output_dir, cell, larger)
+    # 基础覆盖相同时跳过，不同时重新运行
+    assert run_sweep(GRID, [0], output_dir, max_workers=1, base_overrides=small) == []
+    assert len(run_sweep(GRID, [0], output_dir, max_workers=1, base_overrides=larger)) == 1
+
+    directory = cell_dir(output_dir, cell, small)
+    with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+        assert json.load(f) == {"overrides": {**small, **cell["params"]}, "seed": 0}
+    # 检查点、信任历史与节点耗时记录按最终的日志文件命名
+    files = set(os.listdir(directory))
+    assert {LOG_NAME, f"{LOG_NAME}.ckpt.sqlite", f"{LOG_NAME}.history", f"{LOG_NAME}.profile.jsonl"} <= files
+    assert not [name for name in files if ".tmp" in name]
+
+    results = load_sweep_results(output_dir, columns=["round", "agent_id"])
+    assert sorted(results.groupby("overrides")["agent_id"].nunique().tolist()) == [8, 12]
@@ -0,0 +1,52 @@
+# /adapt_mas_project/tests/test_trust_manager.py
+
+import numpy as np
+import pytest
+
+from adapt_mas.trust_manager import ArrayTrustManager, TrustManager
+from experiments.run_experiment import create_session, load_settings
+
+
+def all_scores(trust_manager):
+    return {agent_id: dict(scores) for agent_id, scores in trust_manager.get_all_scores().items()}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_array_backend_matches_dict_backend(seed):
+    """随机的更新/惩罚序列下，数组实现与字典实现的信任分逐位一致"""
+    rng = np.random.default_rng(seed)
+    agent_ids = rng.permutation(40)[:25].tolist()
+    contexts = ["finance", "medical", "legal"]
+    reference, array = TrustManager(agent_ids, 0.3), ArrayTrustManager(agent_ids, 0.3)
+    for _ in range(60):
+        context = contexts[rng.integers(len(contexts))]
+        operation = rng.integers(4)
+        if operation == 0:
+            agent_id, evidence = agent_ids[rng.integers(len(agent_ids))], float(rng.uniform(-2, 2))
+            for trust_manager in (reference, array):
+                trust_manager.update_trust(agent_id, context, evidence)
+        elif operation == 1:
+            selected = rng.permutation(agent_ids)[:rng.integers(1, len(agent_ids))].tolist()
+            evidence = rng.uniform(-1.5, 1.5, len(selected))
+            for trust_manager in (reference, array):
+                trust_manager.update_trust_many(selected, context, evidence)
+        else:
+            # 团伙可重叠，也可包含未登记的智能体
+            groups = [rng.choice(50, rng.integers(1, 6), replace=False).tolist() for _ in range(rng.integers(1, 4))]
+            for trust_manager in (reference, array):
+                trust_manager.penalize_groups(groups, context, 0.7)
+        np.testing.assert_array_equal(array.get_trust_scores(agent_ids, context),
+                                      reference.get_trust_scores(agent_ids, context))
+    assert all_scores(array) == all_scores(reference)
+
+
+@pytest.mark.parametrize("attack_type", ["colluding", "sleeper", "camouflage"])
+def test_session_trust_backends_agree(attack_type):
+    results = []
+    for backend in ("dict", "array"):
+        settings = load_settings({"ATTACK_TYPE": attack_type, "NUM_AGENTS": 20, "NUM_ROUNDS": 10,
+                                  "TRUST_BACKEND": backend, "PROFILE_NODES": False})
+        session = create_session(settings, seed=1)
+        session.run_rounds(settings["NUM_ROUNDS"])
+        results.append(all_scores(session.trust_manager))
+    assert results[0] == results[1]
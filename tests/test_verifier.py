@@ -0,0 +1,58 @@
+# /adapt_mas_project/tests/test_verifier.py
+
+import numpy as np
+import pytest
+
+from adapt_mas.reviews import ReviewBatch
+from adapt_mas.trust_manager import ArrayTrustManager
+from adapt_mas.verifier import DecentralizedVerifier
+
+
+def random_round(seed):
+    rng = np.random.default_rng(seed)
+    agent_ids = rng.permutation(60)[:30]
+    trust_manager = ArrayTrustManager(agent_ids.tolist(), 0.3)
+    # 包含负信任 (触发 0.01 的下限)
+    trust_manager.update_trust_many(agent_ids.tolist(), "ctx", rng.uniform(-1, 1, len(agent_ids)))
+    count = int(rng.integers(0, 300))
+    reviews = ReviewBatch(rng.choice(agent_ids, count), rng.choice(agent_ids[:20], count),
+                          rng.uniform(-1, 1, count).astype(np.float32))
+    return agent_ids, reviews, trust_manager
+
+
+def reference_cis(contribution_id, reviews, trust_manager, context):
+    """向量化之前的逐条循环实现"""
+    weighted_score_sum = 0.0
+    trust_sum = 0.0
+    relevant_reviews = [r for r in zip(reviews.reviewers.tolist(), reviews.reviewees.tolist(), reviews.scores.tolist())
+                        if r[1] == contribution_id]
+    if not relevant_reviews:
+        return 0.0
+    for reviewer_id, _, score in relevant_reviews:
+        reviewer_trust = max(0.01, trust_manager.get_trust_score(reviewer_id, context))
+        weighted_score_sum += reviewer_trust * score
+        trust_sum += reviewer_trust
+    if trust_sum == 0:
+        return 0.0
+    return weighted_score_sum / trust_sum
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_calculate_cis_all_matches_per_contribution(seed):
+    """一次性分组计算的CIS、逐个贡献计算的CIS与原来的逐条循环实现逐位一致"""
+    agent_ids, reviews, trust_manager = random_round(seed)
+    verifier = DecentralizedVerifier()
+    all_cis = verifier.calculate_cis_all(reviews, trust_manager, "ctx")
+    assert set(all_cis) == set(np.unique(reviews.reviewees).tolist())
+    for agent_id in agent_ids.tolist():
+        expected = reference_cis(agent_id, reviews, trust_manager, "ctx")
+        assert verifier.calculate_cis(agent_id, reviews, trust_manager, "ctx") == expected
+        assert all_cis.get(agent_id, 0.0) == expected
+
+
+def test_calculate_cis_accepts_tuples():
+    agent_ids, reviews, trust_manager = random_round(0)
+    tuples = list(zip(reviews.reviewers.tolist(), reviews.reviewees.tolist(), reviews.scores.tolist()))
+    verifier = DecentralizedVerifier()
+    assert verifier.calculate_cis_all(tuples, trust_manager, "ctx") == \
+        verifier.calculate_cis_all(reviews, trust_manager, "ctx")
@@ -0,0 +1,52 @@
+# /adapt_mas_project/utils/fake_llm.py
+
+import asyncio
+import json
+import re
+import time
+from typing import Callable, Iterator
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+def _default_responder(prompt: str) -> str:
+    # 评审提示返回固定评分 (批量评审提示返回每个条目的评分JSON，与单条评审一致)，其余提示返回回显内容
+    if "Rate the following contribution" in prompt:
+        return "0.8"
+    batch = re.search(r"Rate each of the following (\d+) contributions", prompt)
+    if batch is not None:
+        return json.dumps({str(key): 0.8 for key in range(1, int(batch.group(1)) + 1)})
+    return f"Fake response to: {prompt[:80]}"
+
+
+class FakeChatModel:
+    """
+    本地假聊天模型，接口与LangChain聊天模型的 invoke / ainvoke 一致
+    latency 为每次调用的人工延迟 (秒)，用于在无网络环境下测试并发、缓存等逻辑
+    """
+
+    def __init__(self, model_name: str = "fake", temperature: float = 0.0, latency: float = 0.0,
+                 responder: Callable[[str], str] = None):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.latency = latency
+        self.responder = responder or _default_responder
+        self.calls = 0
+
+    def invoke(self, prompt: str, **kwargs) -> AIMessage:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return AIMessage(content=self.responder(prompt))
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[AIMessageChunk]:
+        """按空格切分的片段流式返回"""
+        content = self.invoke(prompt, **kwargs).content
+        for piece in re.findall(r"\S+\s*", content):
+            yield AIMessageChunk(content=piece)
+
+    async def ainvoke(self, prompt: str, **kwargs) -> AIMessage:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return AIMessage(content=self.responder(prompt))
@@ -0,0 +1,166 @@
+# /adapt_mas_project/utils/llm_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from adapt_mas.instrumentation import record_llm_cache_hit
+
+
+class CacheMissError(KeyError):
+    """回放模式下缓存未命中"""
+
+
+def _prompt_text(prompt: Any) -> str:
+    """将 str 或消息列表形式的提示统一为文本，用于计算哈希"""
+    if isinstance(prompt, str):
+        return prompt
+    return json.dumps([[getattr(m, "type", type(m).__name__), getattr(m, "content", str(m))] for m in prompt],
+                      ensure_ascii=False)
+
+
+class LLMResponseCache:
+    """
+    基于SQLite的持久化LLM响应缓存 (按内容寻址)
+    键为 (模型名, 温度, 角色, 提示哈希) 的SHA-256；超出条目数或总字节数上限时按LRU淘汰
+    """
+
+    def __init__(self, path: str, max_entries: int = None, max_bytes: int = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, temperature REAL, role TEXT,"
+            " content TEXT, size INTEGER, last_access INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+        self._conn.commit()
+        # 单调递增的访问序号，用于LRU排序
+        self._clock = self._conn.execute("SELECT COALESCE(MAX(last_access), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, temperature: float, role: str, prompt: Any) -> str:
+        prompt_hash = hashlib.sha256(_prompt_text(prompt).encode("utf-8")).hexdigest()
+        raw = json.dumps([model, temperature, role, prompt_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (self._tick(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, content: str, model: str = "", temperature: float = 0.0, role: str = ""):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, temperature, role, content, len(content.encode("utf-8")), self._tick())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """按最近最少使用的顺序淘汰，直到满足条目数与字节数上限"""
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        if self.max_bytes is not None:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC")
+            stale = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+class CachedChatModel:
+    """
+    为聊天模型客户端加上响应缓存，接口与 invoke / ainvoke 一致
+    replay=True 时为确定性回放模式: 只从缓存读取，未命中时抛出 CacheMissError，不访问模型
+    """
+
+    def __init__(self, client: Any, cache: LLMResponseCache, model_name: str, temperature: float,
+                 role: str = "", replay: bool = False):
+        self.client = client
+        self.cache = cache
+        self.model_name = model_name
+        self.temperature = temperature
+        self.role = role
+        self.replay = replay
+
+    def _lookup(self, prompt: Any):
+        key = LLMResponseCache.make_key(self.model_name, self.temperature, self.role, prompt)
+        content = self.cache.get(key)
+        if content is None and self.replay:
+            raise CacheMissError(f"No cached response for model={self.model_name} role={self.role!r}")
+        if content is not None:
+            record_llm_cache_hit()
+        return key, content
+
+    def _store(self, key: str, content: str):
+        self.cache.put(key, content, self.model_name, self.temperature, self.role)
+
+    def invoke(self, prompt: Any, **kwargs) -> AIMessage:
+        key, content = self._lookup(prompt)
+        if content is None:
+            content = self.client.invoke(prompt, **kwargs).content
+            self._store(key, content)
+        return AIMessage(content=content)
+
+    def stream(self, prompt: Any, **kwargs) -> Iterator[AIMessageChunk]:
+        """命中时一次性返回缓存内容，未命中时转发模型的流式输出，结束后写入缓存"""
+        key, content = self._lookup(prompt)
+        if content is not None:
+            yield AIMessageChunk(content=content)
+            return
+        pieces = []
+        for chunk in self.client.stream(prompt, **kwargs):
+            pieces.append(chunk.content)
+            yield chunk
+        self._store(key, "".join(pieces))
+
+    async def ainvoke(self, prompt: Any, **kwargs) -> AIMessage:
+        key, content = self._lookup(prompt)
+        if content is None:
+            content = (await self.client.ainvoke(prompt, **kwargs)).content
+            self._store(key, content)
+        return AIMessage(content=content)
@@ -1,29 +1,181 @@
 # /adapt_mas_project/utils/llm_clients.py
 
-from langchain_openai import ChatOpenAI
-from langchain_community.chat_models import ChatOllama
-from config import DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL,OLLAMA_BASE_URL
+import json
+import threading
+
+from config import DEEPSEEK_BASE_URL, OLLAMA_BASE_URL, get_api_key
+
+# 按路径共享的响应缓存实例
+_response_caches = {}
+
+# --- 客户端注册表 ---
+# 规范化的客户端配置 -> 带限流的客户端；同一进程内配置相同的调用方共享
+_clients = {}
+# (base_url, http_limits) -> (httpx.Client, httpx.AsyncClient)，同一服务地址的客户端共享keep-alive连接池
+_http_pools = {}
+# (提供方 type, rate_limit) -> ProviderLimiter，同一提供方的所有模型共享速率与并发限额
+_limiters = {}
+_registry_lock = threading.Lock()
+
+# 未在 config 中指定时使用的HTTP连接池大小
+DEFAULT_HTTP_LIMITS = {"max_connections": 32, "max_keepalive_connections": 16}
+
+# 不影响底层客户端的配置项 (缓存包装在限流客户端之外，role 只参与缓存键)
+_WRAPPER_KEYS = ("role", "cache_path", "cache_replay", "cache_max_entries", "cache_max_bytes")
+
+
+def _config_key(config) -> str:
+    """配置的规范化键 (字典按键排序)，用于注册表的查找"""
+    return json.dumps(config, sort_keys=True, default=str)
 
-def get_llm_client(config: dict):
-    """
-    根据配置获取LLM客户端实例
-    """
-    model_type = config.get("type")
-    model_name = config.get("model_name")
-    temperature = config.get("temperature", 0.7)
 
+def _http_pool(base_url: str, http_limits: dict = None):
+    """获取 (或创建) 指定服务地址共享的同步/异步HTTP连接池"""
+    import httpx
+
+    http_limits = {**DEFAULT_HTTP_LIMITS, **(http_limits or {})}
+    key = (base_url, _config_key(http_limits))
+    if key not in _http_pools:
+        limits = httpx.Limits(**http_limits)
+        _http_pools[key] = (httpx.Client(limits=limits), httpx.AsyncClient(limits=limits))
+    return _http_pools[key]
+
+
+def _openai_compatible(model_name: str, temperature: float, base_url: str, api_key: str, config: dict):
+    """OpenAI兼容接口的客户端，使用按服务地址共享的连接池"""
+    from langchain_openai import ChatOpenAI
+
+    http_client, http_async_client = _http_pool(base_url, config.get("http_limits"))
+    return ChatOpenAI(
+        model=model_name,
+        api_key=api_key,
+        base_url=base_url,
+        temperature=temperature,
+        # 流式调用时也返回token用量
+        stream_usage=True,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+def _create_client(model_type: str, model_name: str, temperature: float, config: dict):
     if model_type == "deepseek":
-        return ChatOpenAI(
-            model=model_name,
-            api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL,
-            temperature=temperature,
-        )
+        return _openai_compatible(model_name, temperature, DEEPSEEK_BASE_URL, get_api_key("DEEPSEEK_API_KEY", required=True), config)
     elif model_type == "ollama":
+        # 通过Ollama的OpenAI兼容接口访问，以便复用连接池
+        return _openai_compatible(model_name, temperature, f"{OLLAMA_BASE_URL}/v1", "ollama", config)
+    elif model_type == "ollama_native":
+        # Ollama原生接口 (不共享连接池)
+        from langchain_community.chat_models import ChatOllama
         return ChatOllama(
             model=model_name,
             base_url=OLLAMA_BASE_URL,
             temperature=temperature,
         )
+    elif model_type == "openai":
+        # 任意OpenAI兼容服务 (如本地mock服务器)，需在配置中给出 base_url
+        return _openai_compatible(model_name, temperature, config["base_url"], config.get("api_key", "none"), config)
+    elif model_type == "fake":
+        # 本地假模型，用于离线测试
+        from utils.fake_llm import FakeChatModel
+        return FakeChatModel(
+            model_name=model_name or "fake",
+            temperature=temperature,
+            latency=config.get("latency", 0.0),
+        )
+    else:
+        raise ValueError(f"Unsupported model type: {model_type}")
+
+
+def get_limiter(provider: str, rate_limit: dict = None):
+    """
+    获取 (或创建) 提供方的限流器，提供方与限额都相同的调用方共享同一个限流器
+    rate_limit: {"requests_per_second", "burst", "max_concurrency"}
+    """
+    from utils.rate_limit import ProviderLimiter
+
+    key = (provider, _config_key(rate_limit or {}))
+    with _registry_lock:
+        if key not in _limiters:
+            _limiters[key] = ProviderLimiter(provider, **(rate_limit or {}))
+        return _limiters[key]
+
+
+def get_client(model_type: str, model_name: str, temperature: float, config: dict = None):
+    """
+    返回共享的带限流客户端，首次请求时创建
+    按 (type, model_name, temperature) 与其余影响客户端的配置 (base_url、api_key、限流与连接池等) 共享
+    """
+    from utils.rate_limit import RateLimitedChatModel
+
+    config = config or {}
+    key = (model_type, model_name, temperature,
+           _config_key({name: value for name, value in config.items()
+                        if name not in _WRAPPER_KEYS + ("type", "model_name", "temperature")}))
+    with _registry_lock:
+        client = _clients.get(key)
+    if client is None:
+        limiter = get_limiter(model_type, config.get("rate_limit"))
+        client = RateLimitedChatModel(_create_client(model_type, model_name, temperature, config), limiter)
+        with _registry_lock:
+            client = _clients.setdefault(key, client)
+    return client
+
+
+def client_metrics() -> dict:
+    """
+    各提供方的请求数、错误数、进行中请求数与排队等待时间
+    同一提供方有多组限额时，以 "type {限额}" 区分
+    """
+    with _registry_lock:
+        limiters = dict(_limiters)
+    providers = [provider for provider, _ in limiters]
+    return {provider if providers.count(provider) == 1 else f"{provider} {limits}": limiter.snapshot()
+            for (provider, limits), limiter in limiters.items()}
+
+
+def get_response_cache(path: str, max_entries: int = None, max_bytes: int = None):
+    """获取 (或创建) 指定路径的持久化响应缓存"""
+    from utils.llm_cache import LLMResponseCache
+
+    if path not in _response_caches:
+        _response_caches[path] = LLMResponseCache(path, max_entries=max_entries, max_bytes=max_bytes)
+    return _response_caches[path]
+
+
+def get_llm_client(config: dict):
+    """
+    根据配置获取LLM客户端实例 (底层客户端按缓存与 role 以外的配置共享，见 get_client)
+    可选的限流与连接池配置:
+      rate_limit: {"requests_per_second", "burst", "max_concurrency"}，按提供方 (type) 与限额共享
+      http_limits: {"max_connections", "max_keepalive_connections"}，按服务地址与连接池大小共享
+    可选的缓存配置:
+      cache_path: SQLite缓存文件路径，设置后客户端的响应会被持久化缓存
+      cache_replay: 为 True 时只从缓存读取 (确定性回放，离线重跑实验)
+      cache_max_entries / cache_max_bytes: LRU淘汰上限
+      role: 参与缓存键的智能体角色
+    """
+    model_type = config.get("type")
+    model_name = config.get("model_name")
+    temperature = config.get("temperature", 0.7)
+
+    cache_path = config.get("cache_path")
+    if cache_path and config.get("cache_replay"):
+        # 回放模式不需要真实客户端
+        client = None
     else:
-        raise ValueError(f"Unsupported model type: {model_type}")
\ No newline at end of file
+        client = get_client(model_type, model_name, temperature, config)
+    if not cache_path:
+        return client
+
+    # 缓存位于限流之外，命中缓存的调用不占用限额
+    from utils.llm_cache import CachedChatModel
+    cache = get_response_cache(cache_path, config.get("cache_max_entries"), config.get("cache_max_bytes"))
+    return CachedChatModel(
+        client,
+        cache,
+        model_name=f"{model_type}:{model_name}",
+        temperature=temperature,
+        role=config.get("role", ""),
+        replay=config.get("cache_replay", False),
+    )
@@ -0,0 +1,131 @@
+# /adapt_mas_project/utils/mock_openai_server.py
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """
+    本地的OpenAI兼容 /v1/chat/completions 模拟服务，用于在无网络环境下验证客户端注册表
+    latency: 每个请求的人工延迟 (秒)
+    max_concurrency: 同时处理的请求超过该值时返回429 (模拟服务端限流)，None 表示不限制
+    统计: requests / rejected / max_in_flight / connections (新建TCP连接数，用于观察keep-alive复用)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0), latency: float = 0.0, max_concurrency: int = None):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.max_concurrency = max_concurrency
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rejected": 0, "in_flight": 0, "max_in_flight": 0, "connections": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> threading.Thread:
+        """在后台线程中运行服务"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.stats["requests"] += 1
+            if server.max_concurrency is not None and server.stats["in_flight"] >= server.max_concurrency:
+                server.stats["rejected"] += 1
+                rejected = True
+            else:
+                rejected = False
+                server.stats["in_flight"] += 1
+                server.stats["max_in_flight"] = max(server.stats["max_in_flight"], server.stats["in_flight"])
+        if rejected:
+            self._send_json(429, {"error": {"message": "Too many requests", "type": "rate_limit_exceeded"}})
+            return
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            self._respond(request)
+        finally:
+            with server.lock:
+                server.stats["in_flight"] -= 1
+
+    def _respond(self, request: dict):
+        prompt = request["messages"][-1]["content"] if request.get("messages") else ""
+        content = f"Mock response to: {prompt[:80]}"
+        if "Rate the following contribution" in prompt:
+            content = "0.8"
+        batch = re.search(r"Rate each of the following (\d+) contributions", prompt)
+        if batch is not None:
+            content = json.dumps({str(key): 0.8 for key in range(1, int(batch.group(1)) + 1)})
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                 "total_tokens": len(prompt) // 4 + len(content) // 4}
+        created = int(time.time())
+        model = request.get("model", "mock")
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        # 流式响应 (SSE)，按词切分
+        events = []
+        for word in content.split(" "):
+            events.append({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                           "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]})
+        events.append({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if request.get("stream_options", {}).get("include_usage"):
+            events.append({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                           "model": model, "choices": [], "usage": usage})
+        body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of an OpenAI-compatible chat completions server.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    args = parser.parse_args()
+    server = MockOpenAIServer(("127.0.0.1", args.port), latency=args.latency, max_concurrency=args.max_concurrency)
+    print(f"Serving mock OpenAI API at {server.base_url}")
+    server.serve_forever()
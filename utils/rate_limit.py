@@ -0,0 +1,157 @@
+# /adapt_mas_project/utils/rate_limit.py
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Iterator
+
+from adapt_mas.instrumentation import record_llm_call
+
+
+class TokenBucket:
+    """
+    令牌桶限流 (线程安全)
+    rate: 每秒补充的令牌数; burst: 桶容量
+    reserve() 立即预订一个令牌并返回需要等待的秒数，令牌余额可以为负，等待者按预订顺序排队
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class ProviderLimiter:
+    """
+    单个LLM服务提供方的限流器: 令牌桶限制请求速率，并发上限限制同时进行的请求数
+    同时统计排队等待时间、进行中的请求数等指标
+    同步调用与异步调用共用同一组限额 (异步等待不阻塞事件循环)
+    """
+
+    # 异步调用等待并发名额时的轮询间隔 (秒)
+    POLL_INTERVAL = 0.005
+
+    def __init__(self, name: str, requests_per_second: float = None, burst: float = None,
+                 max_concurrency: int = None):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, float] = {
+            "requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0,
+            "queue_wait_total": 0.0, "queue_wait_max": 0.0,
+        }
+
+    def _enter(self, waited: float):
+        with self._lock:
+            metrics = self.metrics
+            metrics["requests"] += 1
+            metrics["in_flight"] += 1
+            metrics["max_in_flight"] = max(metrics["max_in_flight"], metrics["in_flight"])
+            metrics["queue_wait_total"] += waited
+            metrics["queue_wait_max"] = max(metrics["queue_wait_max"], waited)
+
+    def _exit(self, failed: bool):
+        with self._lock:
+            self.metrics["in_flight"] -= 1
+            if failed:
+                self.metrics["errors"] += 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def acquire(self):
+        """同步获取一个请求名额 (阻塞当前线程)"""
+        started = time.perf_counter()
+        if self._slots is not None:
+            self._slots.acquire()
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay:
+                time.sleep(delay)
+        self._enter(time.perf_counter() - started)
+
+    async def aacquire(self):
+        """异步获取一个请求名额"""
+        started = time.perf_counter()
+        if self._slots is not None:
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(self.POLL_INTERVAL)
+        try:
+            if self.bucket is not None:
+                delay = self.bucket.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+        except BaseException:
+            # 等待期间被取消 (如调用超时) 时归还并发名额
+            if self._slots is not None:
+                self._slots.release()
+            raise
+        self._enter(time.perf_counter() - started)
+
+    def release(self, failed: bool = False):
+        self._exit(failed)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            metrics = dict(self.metrics)
+        metrics["queue_wait_mean"] = metrics["queue_wait_total"] / metrics["requests"] if metrics["requests"] else 0.0
+        return metrics
+
+
+class RateLimitedChatModel:
+    """
+    为聊天模型客户端加上提供方级别的限流与并发上限，接口与 invoke / ainvoke / stream 一致
+    每个真正发往提供方的请求 (包括重试) 在这里计入LLM调用数 (见 adapt_mas.instrumentation)
+    """
+
+    def __init__(self, client: Any, limiter: ProviderLimiter):
+        self.client = client
+        self.limiter = limiter
+
+    def invoke(self, prompt: Any, **kwargs):
+        self.limiter.acquire()
+        failed = True
+        try:
+            record_llm_call()
+            result = self.client.invoke(prompt, **kwargs)
+            failed = False
+            return result
+        finally:
+            self.limiter.release(failed)
+
+    async def ainvoke(self, prompt: Any, **kwargs):
+        await self.limiter.aacquire()
+        failed = True
+        try:
+            record_llm_call()
+            result = await self.client.ainvoke(prompt, **kwargs)
+            failed = False
+            return result
+        finally:
+            self.limiter.release(failed)
+
+    def stream(self, prompt: Any, **kwargs) -> Iterator[Any]:
+        # 整个流式响应期间占用一个并发名额
+        self.limiter.acquire()
+        failed = True
+        try:
+            record_llm_call()
+            yield from self.client.stream(prompt, **kwargs)
+            failed = False
+        except GeneratorExit:
+            # 调用方提前结束读取不算失败
+            failed = False
+            raise
+        finally:
+            self.limiter.release(failed)